@@ -0,0 +1,176 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get('AI_CACHE_DIR', '.cache')
+DEFAULT_TTL_SECONDS = float(os.environ.get('AI_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+DEFAULT_MAX_ENTRIES = int(os.environ.get('AI_CACHE_MAX_ENTRIES', '500'))
+
+
+def normalize_text(text: str) -> str:
+    """
+    Drop line-ending, trailing-whitespace and blank-line differences from
+    prose such as a BRD, so copies that read the same give the same prompt.
+    Never apply it to patches or code, where that whitespace is content.
+    """
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(line.rstrip() for line in lines)).strip()
+
+
+def cache_key(prompt: str, model: str, generation_config: Dict[str, Any]) -> str:
+    """SHA-256 of the exact prompt, model name and generation settings."""
+    material = json.dumps({
+        'prompt': prompt,
+        'model': model,
+        'generationConfig': generation_config
+    }, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """Persistent SQLite cache of AI model responses, bounded by age and entry count."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Open (or create) the cache database under cache_dir."""
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, 'ai_responses.sqlite3')
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ai_responses (
+                    key TEXT PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ai_responses_access ON ai_responses (last_access)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if it is missing or older than the TTL."""
+        return self.get_any([key])[1]
+
+    def get_any(self, keys: Sequence[str]) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Return (key, response) for the first of keys with a live entry, or
+        (None, None). Counts as a single hit or miss.
+        """
+        now = time.time()
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    for key in keys:
+                        row = conn.execute("SELECT response, created_at FROM ai_responses WHERE key = ?",
+                                           (key,)).fetchone()
+                        if row is None:
+                            continue
+                        if now - row[1] > self.ttl_seconds:
+                            conn.execute("DELETE FROM ai_responses WHERE key = ?", (key,))
+                            self.expired += 1
+                            continue
+                        conn.execute("UPDATE ai_responses SET last_access = ? WHERE key = ?", (now, key))
+                        self.hits += 1
+                        return key, row[0]
+            except sqlite3.Error as e:
+                logger.warning(f"AI response cache read failed: {str(e)}")
+
+            self.misses += 1
+            return None, None
+
+    def record_bypass(self) -> None:
+        """Count a lookup skipped at the caller's request."""
+        with self._lock:
+            self.bypassed += 1
+
+    def put(self, key: str, model: str, response: str) -> None:
+        """Store a response, dropping expired entries and then the least recently used beyond max_entries."""
+        now = time.time()
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO ai_responses (key, model, response, created_at, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, model, response, now, now)
+                    )
+
+                    expired = conn.execute("DELETE FROM ai_responses WHERE created_at < ?",
+                                           (now - self.ttl_seconds,)).rowcount
+                    self.expired += expired
+
+                    count = conn.execute("SELECT COUNT(*) FROM ai_responses").fetchone()[0]
+                    if count > self.max_entries:
+                        excess = count - self.max_entries
+                        conn.execute("""
+                            DELETE FROM ai_responses WHERE key IN (
+                                SELECT key FROM ai_responses ORDER BY last_access ASC LIMIT ?
+                            )
+                        """, (excess,))
+                        self.evictions += excess
+            except sqlite3.Error as e:
+                logger.warning(f"AI response cache write failed: {str(e)}")
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM ai_responses")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/expiry/eviction/bypass counters and the current number of entries."""
+        with self._lock:
+            with self._connect() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM ai_responses").fetchone()[0]
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'evictions': self.evictions,
+            'bypassed': self.bypassed,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'ttl_seconds': self.ttl_seconds
+        }
+
+
+_default_cache: Optional[AIResponseCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> AIResponseCache:
+    """Return the process-wide AI response cache."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = AIResponseCache()
+        return _default_cache
@@ -1,14 +1,25 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
 from datetime import datetime, timedelta
 import os
 from werkzeug.utils import secure_filename
 import json
+import time
+import tempfile
+import uuid
 import logging
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from dependency_service import DependencyService
-from vcs_handler import generate_git_patch, generate_svn_patch
+from vcs_handler import generate_git_patches, generate_svn_patches
 from document_processor import extract_text_from_file
-from gemini_helper import analyze_brd_and_patch
+from document_cache import get_document_cache
+from gemini_helper import analyze_brd_and_patch, estimate_analysis
+from ai_response_cache import get_response_cache
+from job_queue import JobQueue, JOB_SUCCEEDED, JOB_FAILED
+from patch_store import PatchArtifactStore, open_artifact
 import dotenv
 dotenv.load_dotenv()
 logging.basicConfig(level=logging.INFO)
@@ -59,33 +70,269 @@ class Feature(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     file_path = db.Column(db.String(500))
-    stage_data = db.Column(db.Text, default='{}')
+    # Stages saved before the feature_stages table existed; read only until migrate_feature_stages.py moves them
+    stage_data = db.deferred(db.Column(db.Text, default='{}'))
     
     commit_id = db.Column(db.String(100))
     patch_file_path = db.Column(db.String(500))
     analysis_file_path = db.Column(db.String(500))
     release_version_id = db.Column(db.Integer, db.ForeignKey('release_versions.id'))
+    jobs = db.relationship('Job', backref='feature', lazy=True, cascade='all, delete-orphan')
+    patch_artifacts = db.relationship('FeaturePatchArtifact', backref='feature', lazy=True, cascade='all, delete-orphan')
+    stage_rows = db.relationship('FeatureStage', backref='feature', lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Feature {self.name}>'
     
-    def get_stage_data(self):
-        try:
-            return json.loads(self.stage_data or '{}')
-        except Exception as e:
-            logging.error(f"Error parsing stage_data for feature {self.id}: {str(e)}")
-            return {}
+    def _stage_cache(self):
+        # Parsed stages and their rows for the lifetime of this instance (one request or job)
+        if not hasattr(self, '_stages'):
+            self._stages = {}
+            self._stage_rows = {}
+        return self._stages
     
-    def set_stage_data(self, data):
+    def _legacy_stage_data(self):
+        if not hasattr(self, '_legacy_stages'):
+            try:
+                self._legacy_stages = json.loads(self.stage_data or '{}')
+            except Exception as e:
+                logging.error(f"Error parsing stage_data for feature {self.id}: {str(e)}")
+                self._legacy_stages = {}
+        return self._legacy_stages
+    
+    def _stage_row(self, stage_name):
+        self._stage_cache()
+        if stage_name not in self._stage_rows:
+            self._stage_rows[stage_name] = db.session.get(FeatureStage, (self.id, stage_name)) if self.id is not None else None
+        return self._stage_rows[stage_name]
+    
+    def get_stage(self, stage_name, default=None):
+        """Data saved for one stage, loading and parsing only that stage."""
+        cache = self._stage_cache()
+        if stage_name not in cache:
+            row = self._stage_row(stage_name)
+            cache[stage_name] = row.get_data() if row is not None else self._legacy_stage_data().get(stage_name)
+        
+        data = cache[stage_name]
+        return default if data is None else data
+    
+    def set_stage(self, stage_name, data):
+        """Replace one stage's data, leaving the other stages untouched."""
         try:
-            self.stage_data = json.dumps(data)
+            serialized = json.dumps(data)
         except (TypeError, ValueError) as e:
             logging.error(f"Error serializing stage_data for feature {self.id}: {str(e)}")
             logging.error(f"Attempted to serialize: {data}")
             raise ValueError(f"Cannot serialize stage data: {str(e)}")
+        
+        row = self._stage_row(stage_name)
+        if row is None and self.id is not None:
+            row = self._insert_stage_row(stage_name, serialized)
+        elif row is None:
+            row = FeatureStage(feature=self, stage_name=stage_name)
+            db.session.add(row)
+            self._stage_rows[stage_name] = row
+        row.data = serialized
+        row.updated_at = datetime.utcnow()
+        # The feature list is ordered by the last change to any stage
+        self.updated_at = row.updated_at
+        self._stages[stage_name] = data
+    
+    def _insert_stage_row(self, stage_name, serialized):
+        """
+        Insert the stage's row, or load the one another request or job
+        inserted since this instance looked (the key is feature and stage).
+        """
+        row = FeatureStage(feature_id=self.id, stage_name=stage_name, data=serialized, updated_at=datetime.utcnow())
+        try:
+            with db.session.begin_nested():
+                db.session.add(row)
+        except IntegrityError:
+            row = db.session.get(FeatureStage, (self.id, stage_name), populate_existing=True)
+            self._stages[stage_name] = row.get_data()
+        self._stage_rows[stage_name] = row
+        return row
+    
+    def update_stage(self, stage_name, **fields):
+        """Set some fields of one stage's data, keeping the rest."""
+        if self.id is not None and self._stage_row(stage_name) is None:
+            # Create the row before merging, so fields saved by a concurrent first write are kept
+            self._insert_stage_row(stage_name, json.dumps(self.get_stage(stage_name, {})))
+        data = dict(self.get_stage(stage_name, {}))
+        data.update(fields)
+        self.set_stage(stage_name, data)
+        return data
+    
+    def get_stage_data(self):
+        """Every stage's data, keyed by stage name."""
+        cache = self._stage_cache()
+        data = dict(self._legacy_stage_data())
+        if self.id is not None:
+            for row in FeatureStage.query.filter_by(feature_id=self.id).all():
+                data[row.stage_name] = row.get_data()
+                self._stage_rows[row.stage_name] = row
+        cache.update(data)
+        return data
+    
+    def set_stage_data(self, data):
+        for stage_name, stage in data.items():
+            self.set_stage(stage_name, stage)
 
-with app.app_context():
-    db.create_all()
+class FeatureStage(db.Model):
+    __tablename__ = 'feature_stages'
+    
+    feature_id = db.Column(db.Integer, db.ForeignKey('features.id'), primary_key=True)
+    stage_name = db.Column(db.String(50), primary_key=True)
+    data = db.Column(db.Text, nullable=False, default='{}')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FeatureStage {self.feature_id} {self.stage_name}>'
+    
+    def get_data(self):
+        try:
+            return json.loads(self.data or '{}')
+        except Exception as e:
+            logging.error(f"Error parsing data of stage {self.stage_name} for feature {self.feature_id}: {str(e)}")
+            return {}
+
+class StageData(Mapping):
+    """
+    Read-only view of a feature's stage data for templates and routes that
+    may look at other stages: each stage is loaded the first time it is read.
+    """
+    
+    def __init__(self, feature):
+        self.feature = feature
+    
+    def __getitem__(self, stage_name):
+        data = self.feature.get_stage(stage_name)
+        if data is None:
+            raise KeyError(stage_name)
+        return data
+    
+    def __iter__(self):
+        return iter(self.feature.get_stage_data())
+    
+    def __len__(self):
+        return len(self.feature.get_stage_data())
+
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    
+    id = db.Column(db.String(32), primary_key=True, default=lambda: uuid.uuid4().hex)
+    feature_id = db.Column(db.Integer, db.ForeignKey('features.id'), nullable=False, index=True)
+    stage_name = db.Column(db.String(50), nullable=False)
+    action = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True)
+    progress = db.Column(db.Integer, default=0)
+    message = db.Column(db.String(500))
+    result = db.Column(db.Text)
+    error = db.Column(db.Text)
+    details = db.Column(db.Text)
+    worker = db.Column(db.String(200))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.id} {self.action} {self.status}>'
+    
+    @property
+    def done(self):
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+    
+    def to_dict(self):
+        try:
+            result = json.loads(self.result) if self.result else None
+        except ValueError:
+            result = None
+        
+        try:
+            details = json.loads(self.details) if self.details else {}
+        except ValueError:
+            details = {}
+        
+        return {
+            'id': self.id,
+            'feature_id': self.feature_id,
+            'stage_name': self.stage_name,
+            'action': self.action,
+            'status': self.status,
+            'done': self.done,
+            'progress': self.progress,
+            'message': self.message,
+            'result': result,
+            'details': details,
+            'error': self.error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class PatchArtifact(db.Model):
+    __tablename__ = 'patch_artifacts'
+    
+    content_hash = db.Column(db.String(64), primary_key=True)
+    storage_path = db.Column(db.String(500), nullable=False)
+    compression = db.Column(db.String(10), default='none')
+    size = db.Column(db.BigInteger)
+    stored_size = db.Column(db.BigInteger)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PatchArtifact {self.content_hash[:12]}>'
+
+class PatchArtifactSource(db.Model):
+    __tablename__ = 'patch_artifact_sources'
+    __table_args__ = (db.UniqueConstraint('vcs_type', 'repo_url', 'revision'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    vcs_type = db.Column(db.String(10), nullable=False)
+    repo_url = db.Column(db.String(500), nullable=False)
+    revision = db.Column(db.String(100), nullable=False)
+    content_hash = db.Column(db.String(64), db.ForeignKey('patch_artifacts.content_hash'), nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<PatchArtifactSource {self.vcs_type} {self.revision}>'
+
+class FeaturePatchArtifact(db.Model):
+    __tablename__ = 'feature_patch_artifacts'
+    
+    feature_id = db.Column(db.Integer, db.ForeignKey('features.id'), primary_key=True)
+    content_hash = db.Column(db.String(64), db.ForeignKey('patch_artifacts.content_hash'), primary_key=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<FeaturePatchArtifact {self.feature_id} {self.content_hash[:12]}>'
+
+job_queue = JobQueue(app, db, Job)
+patch_store = PatchArtifactStore(db, PatchArtifact, PatchArtifactSource, FeaturePatchArtifact,
+                                 os.path.join(app.config['GENERATED_FOLDER'], 'artifacts'))
+
+def missing_columns():
+    """Model columns that the existing tables lack, i.e. migrations that have not been run yet."""
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        missing.extend(f'{table.name}.{column.name}' for column in table.columns if column.name not in existing)
+    return missing
+
+# PDF worker processes (spawn/forkserver) import the main module as __mp_main__; when that is
+# this file (python app.py) they must not create tables or recover jobs
+if __name__ != '__mp_main__':
+    with app.app_context():
+        db.create_all()
+        # The migrate_*.py scripts import this module, so startup must not query columns they are about to add
+        outdated = missing_columns()
+        if outdated:
+            logging.warning(f"Database schema is out of date (missing {', '.join(outdated)}); "
+                            f"run the migrate_*.py scripts. Interrupted jobs were not recovered.")
+        else:
+            job_queue.recover_interrupted()
 
 @app.route('/')
 def index():
@@ -112,8 +359,8 @@ def create_feature():
         
         if file and file.filename:
             filename = secure_filename(file.filename)
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}")
-            file.save(file_path)
+            file_path, _ = get_document_cache().save_upload(
+                file.stream, app.config['UPLOAD_FOLDER'], f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}")
         
         feature = Feature(
             name=name,
@@ -134,13 +381,343 @@ def create_feature():
 @app.route('/feature/<int:feature_id>/workflow')
 def workflow(feature_id):
     feature = Feature.query.get_or_404(feature_id)
-    stage_data = feature.get_stage_data()
+    stage_data = StageData(feature)
     
     return render_template('workflow.html', 
                          feature=feature, 
                          stages=WORKFLOW_STAGES,
                          stage_data=stage_data)
 
+# Partial dependency results kept in a job's progress snapshot
+PARTIAL_RESULTS_LIMIT = 50
+
+# Tail of a streamed AI analysis kept in a job's progress snapshot, and the
+# response length treated as "almost done" when estimating streaming progress
+STREAMED_TEXT_LIMIT = 4000
+STREAMED_PROGRESS_CHARACTERS = 20000
+
+# How often the event stream checks a job for changes, and how long one response stays open;
+# the browser reconnects after each (see 'retry'), so no request holds a worker thread for long
+EVENT_POLL_SECONDS = 0.5
+EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_SECONDS', '20'))
+
+def get_job_feature(feature_id):
+    """Load a feature inside a background job, failing the job if it was deleted meanwhile."""
+    feature = db.session.get(Feature, feature_id)
+    if feature is None:
+        raise Exception('Feature was deleted before the job finished')
+    return feature
+
+def run_dependency_analysis(progress, feature_id, stage_name, params):
+    """Background job for the Dependency Analyzer 'analyze' action."""
+    details = {
+        'phase': 'Listing commits',
+        'total_commits': 0,
+        'commits_scanned': 0,
+        'candidates': 0,
+        'dependencies_found': 0,
+        'dependencies': []
+    }
+    progress(5, f"Analyzing branch {params['branch']} in {params['repo_path']}", details)
+    
+    def on_progress(event, data):
+        if event == 'commits_listed':
+            details['total_commits'] = data['total_commits']
+            details['phase'] = 'Scanning commits'
+        elif event == 'candidates':
+            details['candidates'] = data['candidates']
+        elif event == 'commit_scanned':
+            details['commits_scanned'] = data['scanned']
+        elif event == 'dependency_found':
+            details['dependencies_found'] += 1
+            details['dependencies'] = (details['dependencies'] + [data['dependency']])[-PARTIAL_RESULTS_LIMIT:]
+        
+        scanned, candidates = details['commits_scanned'], details['candidates']
+        percent = 10 + 85 * scanned // candidates if candidates else 10
+        progress(percent, f"Scanned {scanned} of {candidates} commits, "
+                          f"{details['dependencies_found']} dependencies found", details)
+    
+    result = DependencyService.validate_and_analyze(
+        repo_path=params['repo_path'],
+        branch=params['branch'],
+        target_commit=params['target_commit'],
+        start_date=params['start_date'] if params['start_date'] else None,
+        end_date=params['end_date'] if params['end_date'] else None,
+        transitive=params['transitive'],
+        track_lines=params['track_lines'],
+        progress=on_progress
+    )
+    
+    if not result['success']:
+        raise Exception(result['error'])
+    
+    analysis_result = result['data']
+    details['phase'] = 'Saving results'
+    progress(95, 'Saving analysis results', details)
+    
+    feature = get_job_feature(feature_id)
+    feature.set_stage(stage_name, {
+        'completed': False,
+        'timestamp': datetime.utcnow().isoformat(),
+        'repo_path': params['repo_path'],
+        'branch': params['branch'],
+        'target_commit': params['target_commit'],
+        'start_date': params['start_date'],
+        'end_date': params['end_date'],
+        'transitive': params['transitive'],
+        'track_lines': params['track_lines'],
+        'analysis': analysis_result
+    })
+    db.session.commit()
+    
+    return {
+        'message': f'Analysis complete! Found {analysis_result["total_dependencies"]} dependencies.',
+        'total_dependencies': analysis_result['total_dependencies']
+    }
+
+def run_patch_generation(progress, feature_id, stage_name, vcs_type, repo_url, commit_hashes):
+    """Background job for the Patch Generation 'generate_patch' action."""
+    feature_name = get_job_feature(feature_id).name
+    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+    patch_files = []
+    details = {
+        'patches_total': len(commit_hashes),
+        'patches_done': 0,
+        'clone_phase': None,
+        'clone_percent': None
+    }
+    
+    artifacts = {}
+    for commit_hash in commit_hashes:
+        artifact = patch_store.lookup(vcs_type, repo_url, commit_hash)
+        if artifact is not None:
+            artifacts[commit_hash] = artifact
+    missing = [h for h in dict.fromkeys(commit_hashes) if h not in artifacts]
+    details['patches_reused'] = len(artifacts)
+    
+    # Reference artifacts as soon as they are found or stored, so garbage collection
+    # triggered by deleting another feature never sees them unreferenced
+    patch_store.add_reference(feature_id, [a.content_hash for a in artifacts.values()])
+    db.session.commit()
+    
+    if missing:
+        commit_list = ', '.join(h[:8] for h in missing)
+        
+        reported = {'percent': 0}
+        
+        def on_clone_progress(phase, percent):
+            details['clone_phase'] = phase
+            details['clone_percent'] = percent
+            # git restarts its percentage for every phase; keep the overall bar moving forward
+            reported['percent'] = max(reported['percent'], (percent or 0) * 0.9)
+            progress(reported['percent'], f'{phase} for {commit_list}', details)
+        
+        on_clone_progress('Starting', None)
+        
+        with tempfile.TemporaryDirectory(dir=app.config['GENERATED_FOLDER']) as temp_dir:
+            # One VCS session for all commits instead of one clone or svn round trip each
+            batch = [(h, os.path.join(temp_dir, f'{idx}.patch')) for idx, h in enumerate(missing)]
+            if vcs_type == 'git':
+                generate_git_patches(repo_url, batch, progress=on_clone_progress)
+            else:
+                generate_svn_patches(repo_url, batch)
+            
+            for commit_hash, temp_path in batch:
+                artifacts[commit_hash] = patch_store.add(vcs_type, repo_url, commit_hash, temp_path)
+                patch_store.add_reference(feature_id, [artifacts[commit_hash].content_hash])
+                db.session.commit()
+    
+    for commit_hash in commit_hashes:
+        if len(commit_hashes) > 1:
+            patch_filename = f"{feature_name.replace(' ', '_')}_{commit_hash[:8]}_{timestamp}.patch"
+        else:
+            patch_filename = f"{feature_name.replace(' ', '_')}_{timestamp}.patch"
+        
+        patch_files.append({
+            'commit_hash': commit_hash,
+            'patch_file': artifacts[commit_hash].storage_path,
+            'patch_filename': patch_filename,
+            'artifact_hash': artifacts[commit_hash].content_hash,
+            'reused': commit_hash not in missing
+        })
+    
+    details['patches_done'] = len(patch_files)
+    progress(100, f'Generated {len(missing)} and reused {details["patches_reused"]} patch file(s)', details)
+    
+    feature = get_job_feature(feature_id)
+    feature.set_stage(stage_name, {
+        'completed': False,
+        'timestamp': datetime.utcnow().isoformat(),
+        'vcs_type': vcs_type,
+        'repo_url': repo_url,
+        'commit_hashes': commit_hashes,
+        'commit_hash': commit_hashes[0],
+        'patch_files': patch_files,
+        'patch_file': patch_files[0]['patch_file'],
+        'patch_filename': patch_files[0]['patch_filename']
+    })
+    
+    feature.commit_id = ','.join(commit_hashes)
+    feature.patch_file_path = patch_files[0]['patch_file']
+    
+    db.session.commit()
+    
+    if len(commit_hashes) > 1:
+        message = f'Successfully generated {len(patch_files)} patch files for commits: {", ".join([h[:8] for h in commit_hashes])}'
+    else:
+        message = f'Patch generated successfully: {patch_files[0]["patch_filename"]}'
+    
+    return {'message': message, 'patch_files': [p['patch_filename'] for p in patch_files]}
+
+def read_patch_text(patch_file_path):
+    with open_artifact(patch_file_path, text=True) as f:
+        return f.read()
+
+def timed_call(timings, name, func, *args):
+    """Call func(*args), recording its duration in seconds as timings[name]."""
+    start = time.monotonic()
+    try:
+        return func(*args)
+    finally:
+        timings[name] = round(time.monotonic() - start, 3)
+
+def run_ai_analysis(progress, feature_id, stage_name, brd_path, brd_filename, patch_file_path, timestamp,
+                    use_cache=True):
+    """Background job for the AI Analysis 'analyze_ai' action."""
+    details = {'ai_phase': 'Preparing inputs', 'ai_model': None, 'ai_tokens': None, 'ai_characters': None,
+               'ai_cached': False, 'ai_estimated_tokens': None, 'ai_chunks_total': None, 'ai_chunks_done': None}
+    estimate = {}
+    timings = {}
+    started = time.monotonic()
+    # Chunked analysis spends 30-55% on the parts; the final (or only) request fills the rest up to 85%
+    request_percent = 30
+    
+    def on_ai_progress(event, data):
+        nonlocal request_percent
+        if 'model' in data:
+            details['ai_model'] = data['model']
+        if event == 'planned':
+            estimate.update(data)
+            details['ai_estimated_tokens'] = data['input_tokens']
+            progress(request_percent, f"Estimated ~{data['input_tokens']} input tokens "
+                                      f"in {data['requests']} request(s)", details)
+        elif event == 'chunk_analyzed':
+            details['ai_phase'] = 'Analyzing patch parts'
+            details['ai_chunks_total'] = data['total']
+            details['ai_chunks_done'] = data['done']
+            request_percent = 55
+            progress(30 + 25 * data['done'] / data['total'],
+                     f"Analyzed patch part {data['done']} of {data['total']}", details)
+        elif event == 'notes_combined':
+            details['ai_phase'] = 'Combining patch notes'
+            progress(55, f"Combined patch notes {data['done']} of {data['total']}", details)
+        elif event == 'requesting':
+            details['ai_phase'] = 'Waiting for the model'
+            progress(request_percent, f"Waiting for {data['model']}", details)
+        elif event == 'received':
+            details['ai_phase'] = 'Response received'
+            details['ai_tokens'] = data['tokens']
+            details['ai_characters'] = data['characters']
+            progress(85, f"Received {data['tokens'] or data['characters']} "
+                         f"{'tokens' if data['tokens'] else 'characters'} from {data['model']}", details)
+        elif event == 'streaming':
+            details['ai_phase'] = 'Streaming response'
+            details['ai_characters'] = data['characters']
+            progress(request_percent + (85 - request_percent) * min(1, data['characters'] / STREAMED_PROGRESS_CHARACTERS),
+                     f"Streaming from {data['model']}: {data['characters']} characters", details)
+        elif event == 'cached':
+            details['ai_phase'] = 'Loaded from cache'
+            details['ai_characters'] = data['characters']
+            details['ai_cached'] = True
+            progress(85, f"Reused the cached {data['model']} response", details)
+    
+    feature = get_job_feature(feature_id)
+    analysis_filename = f"{feature.name.replace(' ', '_')}_analysis_{timestamp}.md"
+    analysis_path = os.path.join(app.config['GENERATED_FOLDER'], analysis_filename)
+    streamed = []
+    
+    progress(10, f'Extracting text from {brd_filename} and loading the patch', details)
+    # BRD extraction and patch loading overlap; the AI calls start as soon as their inputs are ready
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix='ai-inputs') as executor:
+        brd_future = executor.submit(timed_call, timings, 'brd_extraction', extract_text_from_file, brd_path)
+        patch_future = executor.submit(timed_call, timings, 'patch_loading', read_patch_text, patch_file_path)
+        try:
+            with open(analysis_path, 'w', encoding='utf-8') as analysis_file:
+                def on_ai_chunk(text):
+                    # Write the analysis as it arrives and show its tail on the stage page
+                    analysis_file.write(text)
+                    analysis_file.flush()
+                    streamed.append(text)
+                    details['ai_partial'] = ''.join(streamed)[-STREAMED_TEXT_LIMIT:]
+                
+                analysis_result = analyze_brd_and_patch(brd_future, patch_future, progress=on_ai_progress,
+                                                        use_cache=use_cache, on_chunk=on_ai_chunk, timings=timings)
+        except Exception as e:
+            if os.path.exists(analysis_path):
+                os.remove(analysis_path)
+            if brd_future.done() and brd_future.exception() is e:
+                # Document errors are reported as they were before the AI call
+                raise
+            if "GEMINI_API_KEY" in str(e):
+                raise Exception('Gemini API key is not configured. Please add GEMINI_API_KEY to your environment secrets.')
+            raise Exception(f'Error during AI analysis: {str(e)}')
+    
+    progress(90, 'Saving analysis document', details)
+    feature = get_job_feature(feature_id)
+    
+    if ''.join(streamed) != analysis_result:
+        # e.g. an error message returned instead of a streamed answer
+        with open(analysis_path, 'w', encoding='utf-8') as f:
+            f.write(analysis_result)
+    
+    feature.set_stage(stage_name, {
+        'completed': False,
+        'timestamp': datetime.utcnow().isoformat(),
+        'brd_file': brd_path,
+        'brd_filename': brd_filename,
+        'patch_file': patch_file_path,
+        'analysis_file': analysis_path,
+        'analysis_filename': analysis_filename,
+        'analysis_preview': analysis_result[:500] + '...' if len(analysis_result) > 500 else analysis_result,
+        'ai_model': details['ai_model'],
+        'ai_cached': details['ai_cached'],
+        'ai_cache_stats': get_response_cache().stats(),
+        'ai_token_estimate': estimate,
+        'timings': dict(timings, total=round(time.monotonic() - started, 3))
+    })
+    
+    feature.analysis_file_path = analysis_path
+    
+    db.session.commit()
+    
+    return {'message': f'AI Analysis completed! Saved as {analysis_filename}', 'analysis_filename': analysis_filename}
+
+def enqueue_stage_job(feature, stage_name, action, func, *args):
+    """
+    Queue a long-running stage action unless one is already queued or running
+    for the same stage. Returns (job_id, queued).
+    """
+    active_job = job_queue.active_job(feature.id, stage_name)
+    if active_job:
+        return active_job.id, False
+    
+    return job_queue.submit(feature.id, stage_name, action, func, feature.id, stage_name, *args), True
+
+def stage_job_response(feature_id, stage_index, stage_name, job_id, queued):
+    """Answer a queued stage action with JSON for API clients, or redirect back to the stage page."""
+    if request.accept_mimetypes.best == 'application/json':
+        return jsonify({
+            'job_id': job_id,
+            'queued': queued,
+            'status_url': url_for('job_status', job_id=job_id)
+        }), 202 if queued else 409
+    
+    if queued:
+        flash(f'{stage_name} started in the background. This page will update when it finishes.', 'info')
+    else:
+        flash(f'{stage_name} is already running. Please wait for it to finish.', 'warning')
+    return redirect(url_for('process_stage', feature_id=feature_id, stage_index=stage_index))
+
 @app.route('/feature/<int:feature_id>/stage/<int:stage_index>', methods=['GET', 'POST'])
 def process_stage(feature_id, stage_index):
     feature = Feature.query.get_or_404(feature_id)
@@ -150,7 +727,8 @@ def process_stage(feature_id, stage_index):
         return redirect(url_for('workflow', feature_id=feature_id))
     
     stage_name = WORKFLOW_STAGES[stage_index]
-    stage_data = feature.get_stage_data()
+    # Only the stages this page reads are loaded
+    stage_data = StageData(feature)
     analysis_result = None
     repo_info = None
     
@@ -163,6 +741,8 @@ def process_stage(feature_id, stage_index):
             target_commit = request.form.get('target_commit', '').strip()
             start_date = request.form.get('start_date', '').strip()
             end_date = request.form.get('end_date', '').strip()
+            transitive = request.form.get('transitive') == 'on'
+            track_lines = request.form.get('track_lines') == 'on'
             
             if not repo_path:
                 flash('Repository path is required!', 'error')
@@ -171,31 +751,16 @@ def process_stage(feature_id, stage_index):
             elif not target_commit:
                 flash('Target commit hash is required!', 'error')
             else:
-                result = DependencyService.validate_and_analyze(
-                    repo_path=repo_path,
-                    branch=branch,
-                    target_commit=target_commit,
-                    start_date=start_date if start_date else None,
-                    end_date=end_date if end_date else None
-                )
-                
-                if result['success']:
-                    analysis_result = result['data']
-                    stage_data[stage_name] = {
-                        'completed': False,
-                        'timestamp': datetime.utcnow().isoformat(),
-                        'repo_path': repo_path,
-                        'branch': branch,
-                        'target_commit': target_commit,
-                        'start_date': start_date,
-                        'end_date': end_date,
-                        'analysis': analysis_result
-                    }
-                    feature.set_stage_data(stage_data)
-                    db.session.commit()
-                    flash(f'Analysis complete! Found {analysis_result["total_dependencies"]} dependencies.', 'success')
-                else:
-                    flash(result['error'], 'error')
+                job_id, queued = enqueue_stage_job(feature, stage_name, action, run_dependency_analysis, {
+                    'repo_path': repo_path,
+                    'branch': branch,
+                    'target_commit': target_commit,
+                    'start_date': start_date,
+                    'end_date': end_date,
+                    'transitive': transitive,
+                    'track_lines': track_lines
+                })
+                return stage_job_response(feature_id, stage_index, stage_name, job_id, queued)
         
         elif action == 'generate_patch' and stage_name == 'Patch Generation':
             vcs_type = request.form.get('vcs_type', '').strip()
@@ -204,71 +769,18 @@ def process_stage(feature_id, stage_index):
             
             if not vcs_type or not repo_url or not commit_hashes_input:
                 flash('All fields are required for patch generation!', 'error')
+            elif vcs_type not in ('git', 'svn'):
+                flash('Invalid VCS type!', 'error')
             else:
-                try:
-                    commit_hashes = [h.strip() for h in commit_hashes_input.split(',') if h.strip()]
-                    
-                    if not commit_hashes:
-                        flash('Please provide at least one commit hash!', 'error')
-                        return redirect(url_for('process_stage', feature_id=feature_id, stage_index=stage_index))
-                    
-                    timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                    patch_files = []
-                    
-                    for idx, commit_hash in enumerate(commit_hashes):
-                        if len(commit_hashes) > 1:
-                            patch_filename = f"{feature.name.replace(' ', '_')}_{commit_hash[:8]}_{timestamp}.patch"
-                        else:
-                            patch_filename = f"{feature.name.replace(' ', '_')}_{timestamp}.patch"
-                        
-                        patch_path = os.path.join(app.config['GENERATED_FOLDER'], patch_filename)
-                        
-                        if vcs_type == 'git':
-                            generate_git_patch(repo_url, commit_hash, patch_path)
-                        elif vcs_type == 'svn':
-                            generate_svn_patch(repo_url, commit_hash, patch_path)
-                        else:
-                            flash('Invalid VCS type!', 'error')
-                            return render_template('stage.html', 
-                                                 feature=feature, 
-                                                 stage_name=stage_name,
-                                                 stage_index=stage_index,
-                                                 stage_content=get_stage_content(stage_name, feature),
-                                                 stage_data=stage_data.get(stage_name, {}),
-                                                 total_stages=len(WORKFLOW_STAGES))
-                        
-                        patch_files.append({
-                            'commit_hash': commit_hash,
-                            'patch_file': patch_path,
-                            'patch_filename': patch_filename
-                        })
-                    
-                    stage_data[stage_name] = {
-                        'completed': False,
-                        'timestamp': datetime.utcnow().isoformat(),
-                        'vcs_type': vcs_type,
-                        'repo_url': repo_url,
-                        'commit_hashes': commit_hashes,
-                        'commit_hash': commit_hashes[0],
-                        'patch_files': patch_files,
-                        'patch_file': patch_files[0]['patch_file'],
-                        'patch_filename': patch_files[0]['patch_filename']
-                    }
-                    feature.set_stage_data(stage_data)
-                    
-                    feature.commit_id = ','.join(commit_hashes)
-                    feature.patch_file_path = patch_files[0]['patch_file']
-                    
-                    db.session.commit()
-                    
-                    if len(commit_hashes) > 1:
-                        flash(f'Successfully generated {len(patch_files)} patch files for commits: {", ".join([h[:8] for h in commit_hashes])}', 'success')
-                    else:
-                        flash(f'Patch generated successfully: {patch_files[0]["patch_filename"]}', 'success')
-                    
-                except Exception as e:
-                    logging.error(f"Error generating patch: {str(e)}")
-                    flash(f'Error generating patch: {str(e)}', 'error')
+                commit_hashes = [h.strip() for h in commit_hashes_input.split(',') if h.strip()]
+                
+                if not commit_hashes:
+                    flash('Please provide at least one commit hash!', 'error')
+                    return redirect(url_for('process_stage', feature_id=feature_id, stage_index=stage_index))
+                
+                job_id, queued = enqueue_stage_job(feature, stage_name, action, run_patch_generation,
+                                                   vcs_type, repo_url, commit_hashes)
+                return stage_job_response(feature_id, stage_index, stage_name, job_id, queued)
         
         elif action == 'analyze_ai' and stage_name == 'AI Analysis':
             if 'brd_file' not in request.files:
@@ -279,54 +791,22 @@ def process_stage(feature_id, stage_index):
                 if not brd_file.filename:
                     flash('No file selected!', 'error')
                 else:
-                    try:
-                        patch_generation_data = stage_data.get('Patch Generation', {})
-                        patch_file_path = patch_generation_data.get('patch_file')
+                    patch_generation_data = stage_data.get('Patch Generation', {})
+                    patch_file_path = patch_generation_data.get('patch_file')
+                    
+                    if not patch_file_path or not os.path.exists(patch_file_path):
+                        flash('No patch file found. Please complete Patch Generation stage first!', 'error')
+                    else:
+                        timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
+                        brd_filename = secure_filename(brd_file.filename)
+                        brd_path, _ = get_document_cache().save_upload(
+                            brd_file.stream, app.config['UPLOAD_FOLDER'], f"{timestamp}_{brd_filename}")
+                        use_cache = request.form.get('bypass_cache') != 'on'
                         
-                        if not patch_file_path or not os.path.exists(patch_file_path):
-                            flash('No patch file found. Please complete Patch Generation stage first!', 'error')
-                        else:
-                            timestamp = datetime.utcnow().strftime('%Y%m%d_%H%M%S')
-                            brd_filename = secure_filename(brd_file.filename)
-                            brd_path = os.path.join(app.config['UPLOAD_FOLDER'], f"{timestamp}_{brd_filename}")
-                            brd_file.save(brd_path)
-                            
-                            brd_content = extract_text_from_file(brd_path)
-                            
-                            with open(patch_file_path, 'r', encoding='utf-8') as f:
-                                patch_content = f.read()
-                            
-                            analysis_result = analyze_brd_and_patch(brd_content, patch_content)
-                            
-                            analysis_filename = f"{feature.name.replace(' ', '_')}_analysis_{timestamp}.md"
-                            analysis_path = os.path.join(app.config['GENERATED_FOLDER'], analysis_filename)
-                            
-                            with open(analysis_path, 'w', encoding='utf-8') as f:
-                                f.write(analysis_result)
-                            
-                            stage_data[stage_name] = {
-                                'completed': False,
-                                'timestamp': datetime.utcnow().isoformat(),
-                                'brd_file': brd_path,
-                                'brd_filename': brd_filename,
-                                'patch_file': patch_file_path,
-                                'analysis_file': analysis_path,
-                                'analysis_filename': analysis_filename,
-                                'analysis_preview': analysis_result[:500] + '...' if len(analysis_result) > 500 else analysis_result
-                            }
-                            feature.set_stage_data(stage_data)
-                            
-                            feature.analysis_file_path = analysis_path
-                            
-                            db.session.commit()
-                            flash(f'AI Analysis completed! Saved as {analysis_filename}', 'success')
-                            
-                    except Exception as e:
-                        logging.error(f"Error in AI analysis: {str(e)}")
-                        if "GEMINI_API_KEY" in str(e):
-                            flash('Gemini API key is not configured. Please add GEMINI_API_KEY to your environment secrets.', 'error')
-                        else:
-                            flash(f'Error during AI analysis: {str(e)}', 'error')
+                        job_id, queued = enqueue_stage_job(feature, stage_name, action, run_ai_analysis,
+                                                           brd_path, brd_filename, patch_file_path, timestamp,
+                                                           use_cache)
+                        return stage_job_response(feature_id, stage_index, stage_name, job_id, queued)
         
         elif action == 'manual_merge' and stage_name == 'Merging':
             patch_generation_data = stage_data.get('Patch Generation', {})
@@ -346,7 +826,6 @@ def process_stage(feature_id, stage_index):
             else:
                 import re
                 import subprocess
-                import os
                 
                 for commit_hash in commit_hashes:
                     if not re.match(r'^[a-zA-Z0-9]+$', str(commit_hash)):
@@ -390,7 +869,7 @@ def process_stage(feature_id, stage_index):
                                 has_conflicts = 'C' in merge_output or 'conflict' in merge_output.lower() or result.returncode != 0
                                 
                                 if has_conflicts:
-                                    stage_data[stage_name] = {
+                                    feature.set_stage(stage_name, {
                                         'completed': False,
                                         'timestamp': datetime.utcnow().isoformat(),
                                         'merge_status': 'conflict',
@@ -404,13 +883,13 @@ def process_stage(feature_id, stage_index):
                                         'repo_url': repo_url,
                                         'target_branch': working_copy_path,
                                         'method': 'manual_dry_run'
-                                    }
+                                    })
                                     if len(commit_hashes) > 1:
                                         flash(f'Conflicts detected in dry-run merge for {len(commit_hashes)} commits! Please use AI-assisted merge.', 'warning')
                                     else:
                                         flash('Conflicts detected in dry-run merge! Please use AI-assisted merge.', 'warning')
                                 else:
-                                    stage_data[stage_name] = {
+                                    feature.set_stage(stage_name, {
                                         'completed': False,
                                         'timestamp': datetime.utcnow().isoformat(),
                                         'merge_status': 'success',
@@ -424,13 +903,12 @@ def process_stage(feature_id, stage_index):
                                         'repo_url': repo_url,
                                         'target_branch': working_copy_path,
                                         'method': 'manual_dry_run'
-                                    }
+                                    })
                                     if len(commit_hashes) > 1:
                                         flash(f'Dry-run merge successful for {len(commit_hashes)} commits! No conflicts detected. Proceed with manual merge in {working_copy_path}.', 'success')
                                     else:
                                         flash(f'Dry-run merge successful! No conflicts detected. Proceed with manual merge in {working_copy_path}.', 'success')
                                 
-                                feature.set_stage_data(stage_data)
                                 db.session.commit()
                             
                         except subprocess.TimeoutExpired:
@@ -451,7 +929,7 @@ def process_stage(feature_id, stage_index):
                             elif not os.path.isdir(working_copy_path):
                                 flash(f'Working copy path is not a directory: {working_copy_path}', 'error')
                             else:
-                                stage_data[stage_name] = {
+                                feature.set_stage(stage_name, {
                                     'completed': False,
                                     'timestamp': datetime.utcnow().isoformat(),
                                     'merge_status': 'command_ready',
@@ -464,8 +942,7 @@ def process_stage(feature_id, stage_index):
                                     'repo_url': repo_url,
                                     'target_branch': working_copy_path,
                                     'method': 'manual'
-                                }
-                                feature.set_stage_data(stage_data)
+                                })
                                 db.session.commit()
                                 if len(commit_hashes) > 1:
                                     flash(f'Git merge commands generated for {len(commit_hashes)} commits in {working_copy_path}. Please run them in your local working copy.', 'info')
@@ -522,16 +999,15 @@ def process_stage(feature_id, stage_index):
                     playwright_prompt_path = stage_data.get(stage_name, {}).get('playwright_prompt_path')
                     playwright_prompt_filename = stage_data.get(stage_name, {}).get('playwright_prompt_filename')
                 
-                stage_data[stage_name] = {
+                feature.set_stage(stage_name, {
                     'completed': False,
                     'timestamp': datetime.utcnow().isoformat(),
                     'test_cases_path': test_cases_path,
                     'test_cases_filename': test_cases_filename,
                     'playwright_prompt_path': playwright_prompt_path,
                     'playwright_prompt_filename': playwright_prompt_filename
-                }
+                })
                 
-                feature.set_stage_data(stage_data)
                 db.session.commit()
                 
                 flash('Test documentation uploaded successfully!', 'success')
@@ -562,13 +1038,12 @@ def process_stage(feature_id, stage_index):
                 
                 feature.release_version_id = release_version.id
                 
-                stage_data[stage_name] = {
+                feature.set_stage(stage_name, {
                     'completed': False,
                     'timestamp': datetime.utcnow().isoformat(),
                     'version_number': version_number,
                     'release_notes': release_notes
-                }
-                feature.set_stage_data(stage_data)
+                })
                 db.session.commit()
                 
                 flash(f'Release notes saved for version {version_number}!', 'success')
@@ -595,13 +1070,12 @@ def process_stage(feature_id, stage_index):
                 
                 feature.release_version_id = release_version.id
                 
-                stage_data[stage_name] = {
+                feature.set_stage(stage_name, {
                     'completed': True,
                     'timestamp': datetime.utcnow().isoformat(),
                     'version_number': version_number,
                     'release_notes': release_notes
-                }
-                feature.set_stage_data(stage_data)
+                })
                 feature.current_stage = 'Completed'
                 db.session.commit()
                 
@@ -630,13 +1104,12 @@ def process_stage(feature_id, stage_index):
                 
                 feature.release_version_id = release_version.id
                 
-                stage_data[stage_name] = {
+                feature.set_stage(stage_name, {
                     'completed': True,
                     'timestamp': datetime.utcnow().isoformat(),
                     'version_number': version_number,
                     'release_notes': release_notes
-                }
-                feature.set_stage_data(stage_data)
+                })
                 feature.current_stage = 'Released'
                 
                 release_version.is_released = True
@@ -663,11 +1136,8 @@ def process_stage(feature_id, stage_index):
             return redirect(url_for('workflow', feature_id=feature_id))
         
         elif action == 'complete':
-            stage_data[stage_name] = stage_data.get(stage_name, {})
-            stage_data[stage_name]['completed'] = True
-            stage_data[stage_name]['timestamp'] = datetime.utcnow().isoformat()
-            stage_data[stage_name]['notes'] = request.form.get('notes', '')
-            feature.set_stage_data(stage_data)
+            feature.update_stage(stage_name, completed=True, timestamp=datetime.utcnow().isoformat(),
+                                 notes=request.form.get('notes', ''))
             
             if stage_index < len(WORKFLOW_STAGES) - 1:
                 feature.current_stage = WORKFLOW_STAGES[stage_index + 1]
@@ -693,6 +1163,8 @@ def process_stage(feature_id, stage_index):
     if stage_name == 'AI Analysis' and 'Patch Generation' in stage_data:
         patch_file_info = stage_data['Patch Generation'].get('patch_file')
     
+    stage_job = job_queue.latest_job(feature_id, stage_name)
+    
     return render_template('stage.html', 
                          feature=feature, 
                          stage_name=stage_name,
@@ -703,6 +1175,7 @@ def process_stage(feature_id, stage_index):
                          patch_file_info=patch_file_info,
                          analysis_result=analysis_result,
                          repo_info=repo_info,
+                         stage_job=stage_job,
                          total_stages=len(WORKFLOW_STAGES))
 
 def get_stage_content(stage_name, feature):
@@ -745,27 +1218,113 @@ def get_stage_content(stage_name, feature):
         'placeholder': 'Processing...'
     })
 
+def upload_in_use(path, exclude_feature_id):
+    """Whether another feature refers to an upload; identical uploads share one file."""
+    for other in Feature.query.filter(Feature.id != exclude_feature_id).all():
+        if other.file_path == path or other.get_stage('AI Analysis', {}).get('brd_file') == path:
+            return True
+    return False
+
 @app.route('/feature/<int:feature_id>/delete', methods=['POST'])
 def delete_feature(feature_id):
     feature = Feature.query.get_or_404(feature_id)
     name = feature.name
     
-    if feature.file_path and os.path.exists(feature.file_path):
+    if feature.file_path and os.path.exists(feature.file_path) and not upload_in_use(feature.file_path, feature.id):
         os.remove(feature.file_path)
     
     db.session.delete(feature)
     db.session.commit()
     
+    # Patches are shared between features; drop the ones nothing references any more.
+    # A running Patch Generation job may still be collecting artifacts, so leave that to a later delete.
+    if not job_queue.has_active('Patch Generation'):
+        patch_store.collect_garbage()
+    
     flash(f'Feature "{name}" deleted successfully!', 'success')
     return redirect(url_for('index'))
 
+@app.route('/feature/<int:feature_id>/ai/estimate')
+def ai_token_estimate(feature_id):
+    """Estimated AI Analysis token cost for the feature's patch and its last BRD, without calling the model."""
+    feature = Feature.query.get_or_404(feature_id)
+    patch_file_path = feature.get_stage('Patch Generation', {}).get('patch_file')
+    if not patch_file_path or not os.path.exists(patch_file_path):
+        return jsonify({'error': 'No patch file found. Please complete Patch Generation stage first!'}), 404
+    
+    brd_path = feature.get_stage('AI Analysis', {}).get('brd_file')
+    brd_content = extract_text_from_file(brd_path) if brd_path and os.path.exists(brd_path) else ''
+    patch_content = read_patch_text(patch_file_path)
+    
+    return jsonify(dict(estimate_analysis(brd_content, patch_content), brd_included=bool(brd_content)))
+
+@app.route('/ai/cache/stats')
+def ai_cache_stats():
+    return jsonify(get_response_cache().stats())
+
+@app.route('/documents/cache/stats')
+def document_cache_stats():
+    return jsonify(get_document_cache().stats())
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = Job.query.get_or_404(job_id)
+    return jsonify(job.to_dict())
+
+@app.route('/feature/<int:feature_id>/stage/<int:stage_index>/events')
+def stage_events(feature_id, stage_index):
+    """
+    Stream the progress of the stage's latest job as Server-Sent Events.
+    
+    Sends a 'progress' event whenever the job row changes and a final
+    'done' event once it succeeds or fails. Progress is read from the jobs
+    table, so it works whichever web process runs the job. The response
+    ends after EVENT_STREAM_MAX_SECONDS and EventSource reconnects, picking
+    up the job's current state.
+    """
+    Feature.query.get_or_404(feature_id)
+    if stage_index < 0 or stage_index >= len(WORKFLOW_STAGES):
+        return jsonify({'error': 'Invalid stage'}), 404
+    
+    stage_name = WORKFLOW_STAGES[stage_index]
+    
+    def generate():
+        last_seen = None
+        last_sent = time.monotonic()
+        deadline = last_sent + EVENT_STREAM_MAX_SECONDS
+        yield 'retry: 2000\n\n'
+        
+        while time.monotonic() < deadline:
+            job = job_queue.latest_job(feature_id, stage_name)
+            if job is None:
+                yield 'event: idle\ndata: {}\n\n'
+                return
+            
+            state = (job.id, job.status, job.updated_at)
+            if state != last_seen:
+                last_seen = state
+                last_sent = time.monotonic()
+                event = 'done' if job.done else 'progress'
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.done:
+                    return
+            elif time.monotonic() - last_sent > 15:
+                last_sent = time.monotonic()
+                yield ': keep-alive\n\n'
+            
+            # End the transaction so the next poll sees the job's latest commit
+            db.session.rollback()
+            time.sleep(EVENT_POLL_SECONDS)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/download/analysis/<int:feature_id>')
 def download_analysis(feature_id):
     from flask import send_file
     feature = Feature.query.get_or_404(feature_id)
-    stage_data = feature.get_stage_data()
     
-    analysis_data = stage_data.get('AI Analysis', {})
+    analysis_data = feature.get_stage('AI Analysis', {})
     analysis_file = analysis_data.get('analysis_file')
     
     if not analysis_file or not os.path.exists(analysis_file):
@@ -778,16 +1337,26 @@ def download_analysis(feature_id):
 def download_patch(feature_id):
     from flask import send_file
     feature = Feature.query.get_or_404(feature_id)
-    stage_data = feature.get_stage_data()
     
-    patch_data = stage_data.get('Patch Generation', {})
+    patch_data = feature.get_stage('Patch Generation', {})
     patch_file = patch_data.get('patch_file')
     
     if not patch_file or not os.path.exists(patch_file):
         flash('Patch file not found!', 'error')
         return redirect(url_for('workflow', feature_id=feature_id))
     
-    return send_file(patch_file, as_attachment=True, download_name=patch_data.get('patch_filename', 'patch.patch'))
+    return send_file(open_artifact(patch_file), as_attachment=True, download_name=patch_data.get('patch_filename', 'patch.patch'))
+
+@app.route('/download/artifact/<content_hash>')
+def download_patch_artifact(content_hash):
+    from flask import send_file, abort
+    artifact = PatchArtifact.query.get_or_404(content_hash)
+    
+    if not os.path.exists(artifact.storage_path):
+        abort(404)
+    
+    filename = secure_filename(request.args.get('filename', '')) or f'{content_hash[:12]}.patch'
+    return send_file(open_artifact(artifact.storage_path), as_attachment=True, download_name=filename)
 
 @app.route('/release/<int:version_id>/summary')
 def release_summary(version_id):
@@ -796,11 +1365,10 @@ def release_summary(version_id):
     
     features_data = []
     for feature in features:
-        stage_data = feature.get_stage_data()
-        release_doc = stage_data.get('Release Documentation', {})
-        ai_analysis = stage_data.get('AI Analysis', {})
-        patch_gen = stage_data.get('Patch Generation', {})
-        unit_testing = stage_data.get('Unit Testing', {})
+        release_doc = feature.get_stage('Release Documentation', {})
+        ai_analysis = feature.get_stage('AI Analysis', {})
+        patch_gen = feature.get_stage('Patch Generation', {})
+        unit_testing = feature.get_stage('Unit Testing', {})
         
         features_data.append({
             'feature': feature,
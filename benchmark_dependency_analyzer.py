@@ -0,0 +1,368 @@
+"""
+Benchmark harness for the Dependency Analyzer.
+
+Builds a synthetic git repository with a configurable number of commits,
+files, hunks per commit and rename rate, then times each phase of
+GitAnalyzer.analyze_dependencies and DependencyService.validate_and_analyze.
+Results are written as JSON so runs can be compared across versions:
+
+    python benchmark_dependency_analyzer.py --commits 2000 --files 200 --output before.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+from git import Repo
+
+from commit_cache import CommitChangeCache
+from commit_changes import CommitChanges
+from dependency_service import DependencyService
+from git_dependency_analyzer import GitAnalyzer, BACKENDS, BACKEND_GITPYTHON, BACKEND_GIT_LOG
+from line_range_index import build_line_index
+
+logger = logging.getLogger(__name__)
+
+# Synthetic commits are spaced evenly from this instant
+BASE_TIMESTAMP = int(datetime(2025, 1, 1, tzinfo=timezone.utc).timestamp())
+COMMIT_INTERVAL_SECONDS = 600
+BRANCH = 'main'
+
+
+def generate_synthetic_repo(repo_path: str, commits: int = 500, files: int = 50, lines_per_file: int = 400,
+                            hunks_per_commit: int = 4, files_per_commit: int = 2, rename_rate: float = 0.02,
+                            seed: int = 0) -> Dict[str, Any]:
+    """
+    Create a git repository at repo_path with a reproducible synthetic history.
+
+    Every commit edits hunks_per_commit small hunks spread over up to
+    files_per_commit files; with probability rename_rate it also renames one
+    of those files. The history is written with `git fast-import`, so even
+    tens of thousands of commits take seconds to build.
+    """
+    rng = random.Random(seed)
+    os.makedirs(repo_path, exist_ok=True)
+    subprocess.run(['git', 'init', '-q', '-b', BRANCH, repo_path], check=True)
+
+    contents: Dict[str, List[str]] = {
+        f'src/module_{i % 10}/file_{i}.py': [f'line {n} of file {i}\n' for n in range(lines_per_file)]
+        for i in range(files)
+    }
+    renames = 0
+    chunks: List[bytes] = []
+
+    def blob(lines: List[str]) -> bytes:
+        data = ''.join(lines).encode('utf-8')
+        return b'data %d\n%s\n' % (len(data), data)
+
+    for index in range(commits + 1):
+        timestamp = BASE_TIMESTAMP + index * COMMIT_INTERVAL_SECONDS
+        message = f'Synthetic commit {index}'.encode('utf-8')
+        chunks.append(b'commit refs/heads/%s\n' % BRANCH.encode('utf-8'))
+        chunks.append(b'committer Benchmark <benchmark@example.com> %d +0000\n' % timestamp)
+        chunks.append(b'data %d\n%s\n' % (len(message), message))
+
+        if index == 0:
+            # Root commit adds every file
+            for path, lines in contents.items():
+                chunks.append(b'M 100644 inline %s\n' % path.encode('utf-8'))
+                chunks.append(blob(lines))
+            continue
+
+        touched = rng.sample(sorted(contents), min(files_per_commit, len(contents)))
+
+        if rng.random() < rename_rate:
+            old_path = touched[0]
+            new_path = old_path.replace('.py', f'_r{index}.py')
+            contents[new_path] = contents.pop(old_path)
+            chunks.append(b'R %s %s\n' % (old_path.encode('utf-8'), new_path.encode('utf-8')))
+            touched[0] = new_path
+            renames += 1
+
+        for hunk in range(hunks_per_commit):
+            lines = contents[touched[hunk % len(touched)]]
+            position = rng.randrange(len(lines))
+            operation = rng.random()
+            if operation < 0.25:
+                lines.insert(position, f'inserted in commit {index}\n')
+            elif operation < 0.4 and len(lines) > lines_per_file // 2:
+                del lines[position]
+            else:
+                lines[position] = f'changed in commit {index}\n'
+
+        for path in touched:
+            chunks.append(b'M 100644 inline %s\n' % path.encode('utf-8'))
+            chunks.append(blob(contents[path]))
+
+    subprocess.run(['git', 'fast-import', '--quiet'], cwd=repo_path, input=b''.join(chunks), check=True)
+    subprocess.run(['git', 'checkout', '-q', BRANCH], cwd=repo_path, check=True)
+
+    head = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=repo_path, check=True,
+                          capture_output=True, text=True).stdout.strip()
+
+    return {
+        'path': repo_path,
+        'commits': commits + 1,
+        'files': files,
+        'lines_per_file': lines_per_file,
+        'hunks_per_commit': hunks_per_commit,
+        'files_per_commit': files_per_commit,
+        'rename_rate': rename_rate,
+        'renames': renames,
+        'seed': seed,
+        'head': head,
+        'start_date': datetime.fromtimestamp(BASE_TIMESTAMP).strftime('%Y-%m-%d'),
+        'end_date': datetime.fromtimestamp(BASE_TIMESTAMP + commits * COMMIT_INTERVAL_SECONDS).strftime('%Y-%m-%d')
+    }
+
+
+def _timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def _summarize(samples: List[float]) -> Dict[str, Any]:
+    return {
+        'runs': len(samples),
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+        'samples': samples
+    }
+
+
+def benchmark_phases(repo_info: Dict[str, Any], target_commit: str) -> Dict[str, float]:
+    """
+    Time the individual phases of a GitPython-backed analysis once.
+
+    Diffing covers generating patches for every commit in the window; hunk
+    parsing covers turning that patch text into per-file line ranges.
+    """
+    start_dt = datetime.strptime(repo_info['start_date'], '%Y-%m-%d')
+    end_dt = datetime.strptime(repo_info['end_date'], '%Y-%m-%d')
+    analyzer = GitAnalyzer(repo_info['path'], cache=None, backend=BACKEND_GITPYTHON)
+    analyzer.repo = Repo(repo_info['path'])
+    timings = {}
+
+    timings['commit_listing'], commits = _timed(lambda: analyzer.get_commits_in_range(BRANCH, start_dt, end_dt))
+
+    def diff_all():
+        patches = {}
+        for commit_info in commits:
+            commit = analyzer.repo.commit(commit_info['full_hash'])
+            if not commit.parents:
+                patches[commit.hexsha] = []
+                continue
+            patches[commit.hexsha] = [
+                (diff.a_path, diff.b_path, diff.diff)
+                for diff in commit.parents[0].diff(commit, create_patch=True)
+            ]
+        return patches
+
+    timings['diffing'], patches = _timed(diff_all)
+
+    def parse_all():
+        changes_by_hash = {}
+        for full_hash, diffs in patches.items():
+            file_changes = {}
+            for a_path, b_path, diff_bytes in diffs:
+                diff_text = diff_bytes.decode('utf-8', errors='ignore') if isinstance(diff_bytes, bytes) else str(diff_bytes)
+                line_ranges = analyzer._parse_diff_line_numbers(diff_text) if diff_bytes else []
+                for file_path in (a_path, b_path if b_path != a_path else None):
+                    if file_path:
+                        file_changes.setdefault(file_path, []).extend(line_ranges)
+            changes_by_hash[full_hash] = CommitChanges(file_changes, analyzer.paths)
+        return changes_by_hash
+
+    timings['hunk_parsing'], changes_by_hash = _timed(parse_all)
+
+    target_changes = changes_by_hash[target_commit]
+    target_date = next(c['date'] for c in commits if c['full_hash'] == target_commit)
+
+    def check_all():
+        target_index = build_line_index(target_changes)
+        dependencies = []
+        for commit_info in commits:
+            if commit_info['date'] >= target_date:
+                continue
+            overlap_info = analyzer._check_overlap(target_changes, changes_by_hash[commit_info['full_hash']], target_index)
+            if overlap_info['has_overlap']:
+                dependencies.append(analyzer._make_dependency(commit_info, overlap_info))
+        return dependencies
+
+    timings['overlap_checking'], dependencies = _timed(check_all)
+
+    def serialize():
+        data = {
+            'dependencies': dependencies,
+            'total_dependencies': len(dependencies),
+            'total_commits': len(commits),
+            'target_file_list': list(target_changes.keys())
+        }
+        return json.dumps(DependencyService._make_json_serializable(data))
+
+    timings['json_serialization'], _ = _timed(serialize)
+
+    # The git-log backend lists, diffs and parses in a single streamed pass
+    streaming = GitAnalyzer(repo_info['path'], cache=None, backend=BACKEND_GIT_LOG)
+    timings['git_log_streaming'], _ = _timed(lambda: streaming.get_commits_with_changes(BRANCH, start_dt, end_dt))
+
+    return timings
+
+
+def benchmark_end_to_end(repo_info: Dict[str, Any], target_commit: str, backend: str, workers: int,
+                         cache_dir: Optional[str]) -> Dict[str, Any]:
+    """Time one full GitAnalyzer.analyze_dependencies call and return its size counters."""
+    start_dt = datetime.strptime(repo_info['start_date'], '%Y-%m-%d')
+    end_dt = datetime.strptime(repo_info['end_date'], '%Y-%m-%d')
+    cache = CommitChangeCache(cache_dir) if cache_dir else None
+    analyzer = GitAnalyzer(repo_info['path'], cache=cache, backend=backend, workers=workers)
+
+    seconds, analysis = _timed(lambda: analyzer.analyze_dependencies(BRANCH, target_commit, start_dt, end_dt))
+    return {
+        'seconds': seconds,
+        'commits': len(analysis.commits),
+        'dependencies': len(analysis.dependencies),
+        'prefilter_stats': analysis.prefilter_stats
+    }
+
+
+def benchmark_service(repo_info: Dict[str, Any], target_commit: str, backend: str, cache_dir: str) -> Dict[str, Any]:
+    """Time DependencyService.validate_and_analyze with a cold and then a warm commit cache."""
+    DependencyService._commit_cache = CommitChangeCache(cache_dir)
+    DependencyService._commit_cache.clear()
+
+    results = {}
+    for label in ('cold_cache', 'warm_cache'):
+        seconds, result = _timed(lambda: DependencyService.validate_and_analyze(
+            repo_info['path'], BRANCH, target_commit, repo_info['start_date'], repo_info['end_date'], backend=backend
+        ))
+        if not result['success']:
+            raise RuntimeError(result['error'])
+        results[label] = {
+            'seconds': seconds,
+            'dependencies': result['data']['total_dependencies'],
+            'json_bytes': len(json.dumps(result['data']))
+        }
+
+    DependencyService._commit_cache = None
+    return results
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Build (or reuse) the synthetic repository and run every benchmark."""
+    if args.repo_dir and os.path.exists(args.repo_dir) and os.listdir(args.repo_dir):
+        raise SystemExit(f'{args.repo_dir} is not empty; choose a new or empty directory')
+
+    work_dir = tempfile.mkdtemp(prefix='dependency-benchmark-')
+    repo_path = args.repo_dir or os.path.join(work_dir, 'repo')
+
+    try:
+        build_seconds, repo_info = _timed(lambda: generate_synthetic_repo(
+            repo_path, commits=args.commits, files=args.files, lines_per_file=args.lines_per_file,
+            hunks_per_commit=args.hunks, files_per_commit=args.files_per_commit,
+            rename_rate=args.rename_rate, seed=args.seed
+        ))
+        repo_info['build_seconds'] = build_seconds
+        target_commit = repo_info['head']
+        logger.info(f"Built synthetic repository with {repo_info['commits']} commits in {build_seconds:.2f}s")
+
+        phase_samples: Dict[str, List[float]] = {}
+        for _ in range(args.repeat):
+            for phase, seconds in benchmark_phases(repo_info, target_commit).items():
+                phase_samples.setdefault(phase, []).append(seconds)
+
+        end_to_end = {}
+        for backend in args.backends:
+            samples = [benchmark_end_to_end(repo_info, target_commit, backend, args.workers, None)
+                       for _ in range(args.repeat)]
+            end_to_end[backend] = {
+                **_summarize([sample['seconds'] for sample in samples]),
+                'commits': samples[-1]['commits'],
+                'dependencies': samples[-1]['dependencies'],
+                'prefilter_stats': samples[-1]['prefilter_stats']
+            }
+
+        service = benchmark_service(repo_info, target_commit, args.backends[0], os.path.join(work_dir, 'cache'))
+
+        return {
+            'benchmark': 'dependency_analyzer',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'code_version': _code_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'workers': args.workers,
+            'repo': repo_info,
+            'phases': {phase: _summarize(samples) for phase, samples in phase_samples.items()},
+            'end_to_end': end_to_end,
+            'service': service
+        }
+    finally:
+        if args.keep_repo:
+            logger.info(f"Synthetic repository kept at {repo_path}")
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            if args.repo_dir:
+                shutil.rmtree(args.repo_dir, ignore_errors=True)
+
+
+def _code_version() -> Optional[str]:
+    """Return the commit of this checkout, so results can be matched to a version."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the Dependency Analyzer on a synthetic git repository.')
+    parser.add_argument('--commits', type=int, default=500, help='number of commits after the root commit')
+    parser.add_argument('--files', type=int, default=50, help='number of files in the repository')
+    parser.add_argument('--lines-per-file', type=int, default=400, help='initial lines per file')
+    parser.add_argument('--hunks', type=int, default=4, help='hunks edited per commit (hunk density)')
+    parser.add_argument('--files-per-commit', type=int, default=2, help='files each commit touches')
+    parser.add_argument('--rename-rate', type=float, default=0.02, help='probability that a commit renames a file')
+    parser.add_argument('--seed', type=int, default=0, help='random seed for the synthetic history')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement')
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for the gitpython backend')
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS),
+                        help='backends to time end to end')
+    parser.add_argument('--repo-dir', help='build the repository here instead of a temporary directory')
+    parser.add_argument('--keep-repo', action='store_true', help='keep the synthetic repository afterwards')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write, or - for stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        logger.info(f"Benchmark results written to {args.output}")
+
+    for phase, summary in results['phases'].items():
+        logger.info(f"{phase}: median {summary['median']:.4f}s")
+    for backend, summary in results['end_to_end'].items():
+        logger.info(f"analyze_dependencies[{backend}]: median {summary['median']:.4f}s, "
+                    f"{summary['dependencies']} dependencies")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,218 @@
+"""
+Benchmark harness for spreadsheet extraction in the document processor.
+
+Times extract_text_from_excel with each available engine against the
+previous implementation (one pd.read_excel per sheet rendered with
+DataFrame.to_string), on the .xlsx files in uploads/ and on a synthetic
+workbook with a configurable number of rows and columns. Results are
+written as JSON so runs can be compared across versions:
+
+    python benchmark_document_processor.py --rows 100000 --cols 20 --output before.json
+"""
+import os
+import sys
+import glob
+import json
+import time
+import shutil
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import zipfile
+from datetime import datetime, timedelta
+from typing import Dict, List, Any, Callable, Optional, Tuple
+
+import openpyxl
+from openpyxl.utils import get_column_letter
+import pandas as pd
+
+import document_processor
+from document_processor import extract_text_from_excel
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ('openpyxl', 'pandas', 'calamine')
+
+
+def generate_synthetic_workbook(path: str, rows: int = 20000, cols: int = 20, sheets: int = 2) -> Dict[str, Any]:
+    """Write a workbook of mixed text, number and date cells with openpyxl's streaming writer."""
+    workbook = openpyxl.Workbook(write_only=True)
+    base_date = datetime(2025, 1, 1)
+
+    for sheet_index in range(sheets):
+        sheet = workbook.create_sheet(f'Sheet {sheet_index + 1}')
+        sheet.append([f'COLUMN_{col}' for col in range(cols)])
+        for row in range(rows):
+            values: List[Any] = []
+            for col in range(cols):
+                kind = col % 4
+                if kind == 0:
+                    values.append(f'item {row}-{col}')
+                elif kind == 1:
+                    values.append(row * cols + col)
+                elif kind == 2:
+                    values.append(row / 7.0)
+                else:
+                    values.append(base_date + timedelta(days=row % 365))
+            sheet.append(values)
+
+    workbook.save(path)
+    _add_dimensions(path, f'A1:{get_column_letter(cols)}{rows + 1}')
+    return {'path': path, 'rows': rows, 'cols': cols, 'sheets': sheets, 'bytes': os.path.getsize(path)}
+
+
+def _add_dimensions(path: str, ref: str) -> None:
+    """
+    Add the <dimension> element Excel writes to every sheet.
+
+    openpyxl's write-only mode leaves it out, and without it read-only
+    loading scans the whole sheet up front, which saved files never need.
+    """
+    rewritten = path + '.tmp'
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(rewritten, 'w', zipfile.ZIP_DEFLATED) as target:
+        for item in source.infolist():
+            data = source.read(item.filename)
+            if item.filename.startswith('xl/worksheets/sheet'):
+                data = data.replace(b'<sheetViews>', b'<dimension ref="%s"/><sheetViews>' % ref.encode('ascii'), 1)
+            target.writestr(item, data)
+    os.replace(rewritten, path)
+
+
+def legacy_extract_excel(file_path: str) -> str:
+    """The extraction used before the single-open rewrite, kept as the baseline."""
+    excel_file = pd.ExcelFile(file_path)
+    text = ""
+
+    for sheet_name in excel_file.sheet_names:
+        df = pd.read_excel(file_path, sheet_name=sheet_name)
+        text += f"\n=== Sheet: {sheet_name} ===\n"
+        text += df.to_string(index=False)
+        text += "\n"
+
+    return text
+
+
+def _timed(func: Callable[[], Any]) -> Tuple[float, Any]:
+    started = time.perf_counter()
+    result = func()
+    return time.perf_counter() - started, result
+
+
+def _summarize(samples: List[float]) -> Dict[str, Any]:
+    return {
+        'runs': len(samples),
+        'min': min(samples),
+        'median': statistics.median(samples),
+        'max': max(samples),
+        'samples': samples
+    }
+
+
+def _available_engines() -> List[str]:
+    return [engine for engine in ENGINES if engine != 'calamine' or document_processor.python_calamine is not None]
+
+
+def benchmark_file(path: str, repeat: int, max_rows: int, max_cols: int, legacy: bool) -> Dict[str, Any]:
+    """Time every extractor on one file and record the size of the text it produces."""
+    extractors: Dict[str, Callable[[], str]] = {}
+    if legacy:
+        extractors['legacy'] = lambda: legacy_extract_excel(path)
+    for engine in _available_engines():
+        extractors[engine] = lambda engine=engine: extract_text_from_excel(path, max_rows, max_cols, engine)
+        extractors[f'{engine}_uncapped'] = lambda engine=engine: extract_text_from_excel(path, 0, 0, engine)
+
+    results = {}
+    for name, extract in extractors.items():
+        samples = []
+        for _ in range(repeat):
+            seconds, text = _timed(extract)
+            samples.append(seconds)
+        results[name] = {**_summarize(samples), 'chars': len(text)}
+
+    return {'path': path, 'bytes': os.path.getsize(path), 'extractors': results}
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """Build the synthetic workbook and benchmark it along with the uploaded samples."""
+    work_dir = tempfile.mkdtemp(prefix='document-benchmark-')
+
+    try:
+        synthetic_path = os.path.join(work_dir, 'synthetic.xlsx')
+        build_seconds, workbook_info = _timed(lambda: generate_synthetic_workbook(
+            synthetic_path, rows=args.rows, cols=args.cols, sheets=args.sheets
+        ))
+        workbook_info['build_seconds'] = build_seconds
+        logger.info(f"Built synthetic workbook with {args.sheets} x {args.rows} rows in {build_seconds:.2f}s")
+
+        files = {}
+        for path in sorted(glob.glob(os.path.join(args.uploads, '*.xlsx'))):
+            files[os.path.basename(path)] = benchmark_file(path, args.repeat, args.max_rows, args.max_cols, True)
+        files['synthetic'] = benchmark_file(synthetic_path, args.repeat, args.max_rows, args.max_cols,
+                                            not args.skip_legacy)
+
+        return {
+            'benchmark': 'document_processor',
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'code_version': _code_version(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'pandas': pd.__version__,
+            'openpyxl': openpyxl.__version__,
+            'engines': _available_engines(),
+            'max_rows': args.max_rows,
+            'max_cols': args.max_cols,
+            'workbook': {key: value for key, value in workbook_info.items() if key != 'path'},
+            'files': files
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _code_version() -> Optional[str]:
+    """Return the commit of this checkout, so results can be matched to a version."""
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (subprocess.CalledProcessError, OSError):
+        return None
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark Excel extraction on uploaded and synthetic workbooks.')
+    parser.add_argument('--rows', type=int, default=20000, help='data rows per synthetic sheet')
+    parser.add_argument('--cols', type=int, default=20, help='columns per synthetic sheet')
+    parser.add_argument('--sheets', type=int, default=2, help='sheets in the synthetic workbook')
+    parser.add_argument('--max-rows', type=int, default=document_processor.EXCEL_MAX_ROWS,
+                        help='row cap for the capped runs')
+    parser.add_argument('--max-cols', type=int, default=document_processor.EXCEL_MAX_COLS,
+                        help='column cap for the capped runs')
+    parser.add_argument('--uploads', default='uploads', help='directory with sample .xlsx files')
+    parser.add_argument('--skip-legacy', action='store_true',
+                        help='do not time the previous implementation on the synthetic workbook')
+    parser.add_argument('--repeat', type=int, default=3, help='runs per measurement')
+    parser.add_argument('--output', default='benchmark_results.json', help='JSON file to write, or - for stdout')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    results = run_benchmarks(args)
+    output = json.dumps(results, indent=2)
+
+    if args.output == '-':
+        print(output)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+        logger.info(f"Benchmark results written to {args.output}")
+
+    for name, info in results['files'].items():
+        for extractor, summary in info['extractors'].items():
+            logger.info(f"{name}[{extractor}]: median {summary['median']:.4f}s, {summary['chars']} chars")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,137 @@
+import os
+import json
+import sqlite3
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Tuple, Optional, Any, Iterator, Mapping
+
+from commit_changes import CommitChanges, PathTable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get('COMMIT_CACHE_DIR', '.cache')
+DEFAULT_MAX_ENTRIES = int(os.environ.get('COMMIT_CACHE_MAX_ENTRIES', '50000'))
+
+# Part of every cache key; bump it whenever diff parsing or the stored change
+# format changes, so entries written by older code are never read back
+CHANGES_VERSION = 2
+
+
+class CommitChangeCache:
+    """Persistent SQLite cache of per-commit file/line changes keyed by full SHA and format version."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 version: int = CHANGES_VERSION):
+        """Open (or create) the cache database under cache_dir and drop entries of other versions."""
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.version = version
+        self.db_path = os.path.join(cache_dir, 'commit_changes.sqlite3')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS commit_changes (
+                    sha TEXT PRIMARY KEY,
+                    changes TEXT NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_commit_changes_access ON commit_changes (last_access)")
+            stale = conn.execute("DELETE FROM commit_changes WHERE sha NOT LIKE ?", (f'%:v{version}',)).rowcount
+        if stale:
+            logger.info(f"Dropped {stale} commit cache entries from other format versions")
+
+    @staticmethod
+    def entry_key(sha: str, version: int) -> str:
+        """Return the row key for a full commit SHA under a change format version."""
+        return f'{sha}:v{version}'
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, sha: str, paths: Optional[PathTable] = None) -> Optional[CommitChanges]:
+        """Return the cached changes for a full commit SHA, or None on a miss; paths interns their file paths."""
+        key = self.entry_key(sha, self.version)
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT changes FROM commit_changes WHERE sha = ?", (key,)).fetchone()
+                    if row is None:
+                        self.misses += 1
+                        return None
+                    conn.execute("UPDATE commit_changes SET last_access = ? WHERE sha = ?", (time.time(), key))
+            except sqlite3.Error as e:
+                logger.warning(f"Commit cache read failed for {sha}: {str(e)}")
+                self.misses += 1
+                return None
+
+            self.hits += 1
+
+        return CommitChanges(json.loads(row[0]), paths)
+
+    def put(self, sha: str, changes: Mapping[str, List[Tuple[int, int]]]) -> None:
+        """Store the changes for a full commit SHA, evicting the least recently used entries."""
+        self.put_many({sha: changes})
+
+    def put_many(self, entries: Dict[str, Mapping[str, List[Tuple[int, int]]]]) -> None:
+        """Store changes for several commits in one transaction."""
+        if not entries:
+            return
+
+        now = time.time()
+        rows = [(self.entry_key(sha, self.version), json.dumps(dict(changes), separators=(',', ':')), now)
+                for sha, changes in entries.items()]
+
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO commit_changes (sha, changes, last_access) VALUES (?, ?, ?)",
+                        rows
+                    )
+
+                    count = conn.execute("SELECT COUNT(*) FROM commit_changes").fetchone()[0]
+                    if count > self.max_entries:
+                        excess = count - self.max_entries
+                        conn.execute("""
+                            DELETE FROM commit_changes WHERE sha IN (
+                                SELECT sha FROM commit_changes ORDER BY last_access ASC LIMIT ?
+                            )
+                        """, (excess,))
+                        self.evictions += excess
+            except sqlite3.Error as e:
+                logger.warning(f"Commit cache write failed for {len(rows)} commit(s): {str(e)}")
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock:
+            with self._connect() as conn:
+                conn.execute("DELETE FROM commit_changes")
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters and the current number of entries."""
+        with self._lock:
+            with self._connect() as conn:
+                entries = conn.execute("SELECT COUNT(*) FROM commit_changes").fetchone()[0]
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': entries,
+            'max_entries': self.max_entries,
+            'version': self.version
+        }
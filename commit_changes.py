@@ -0,0 +1,149 @@
+import threading
+from array import array
+from bisect import bisect_left
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with pandas
+    np = None
+
+from line_range_index import LineRangeIndex
+
+# Below this many ranges a plain bisect loop beats building NumPy views
+VECTORIZE_MIN_RANGES = 16
+
+
+class PathTable:
+    """
+    Table interning file paths to small integer ids.
+
+    One table is shared by the CommitChanges of one analysis (see
+    GitAnalyzer.paths), so it is freed along with them instead of growing
+    for the life of the process.
+    """
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._paths: List[str] = []
+        self._lock = threading.Lock()
+
+    def intern(self, path: str) -> int:
+        """Return the id for path, assigning a new one on first use."""
+        path_id = self._ids.get(path)
+        if path_id is None:
+            with self._lock:
+                path_id = self._ids.get(path)
+                if path_id is None:
+                    path_id = len(self._paths)
+                    self._paths.append(path)
+                    self._ids[path] = path_id
+        return path_id
+
+    def lookup(self, path: str) -> int:
+        """Return the id for path, or -1 if it was never interned."""
+        return self._ids.get(path, -1)
+
+    def path(self, path_id: int) -> str:
+        return self._paths[path_id]
+
+
+class CommitChanges(Mapping):
+    """
+    Compact, read-only {path: [(start, end), ...]} mapping for one commit.
+
+    Paths are interned to ids in a PathTable (a private one unless paths
+    is given) and every range lives in two shared int32 buffers, with
+    offsets marking where each file's ranges begin, so a hunk costs 8 bytes
+    instead of a tuple and two ints. The ids are also kept sorted, so a
+    lookup is a binary search. It behaves like the dict returned by
+    GitAnalyzer.get_commit_file_changes, so existing callers and JSON
+    conversion are unaffected.
+    """
+
+    __slots__ = ('paths', 'path_ids', 'offsets', 'starts', 'ends', 'sorted_ids', 'sorted_positions')
+
+    def __init__(self, file_changes: Optional[Mapping] = None, paths: Optional[PathTable] = None):
+        self.paths = paths if paths is not None else PathTable()
+        self.path_ids = array('I')
+        self.offsets = array('I', [0])
+        self.starts = array('i')
+        self.ends = array('i')
+
+        for file_path, ranges in (file_changes or {}).items():
+            self.path_ids.append(self.paths.intern(file_path))
+            for start, end in ranges:
+                self.starts.append(start)
+                self.ends.append(end)
+            self.offsets.append(len(self.starts))
+
+        order = sorted(range(len(self.path_ids)), key=self.path_ids.__getitem__)
+        self.sorted_ids = array('I', (self.path_ids[position] for position in order))
+        self.sorted_positions = array('I', order)
+
+    @classmethod
+    def from_dict(cls, file_changes: Mapping, paths: Optional[PathTable] = None) -> 'CommitChanges':
+        """Wrap a changes mapping, returning it unchanged if it is already compact (and uses paths, if given)."""
+        if isinstance(file_changes, cls) and (paths is None or file_changes.paths is paths):
+            return file_changes
+        return cls(file_changes, paths)
+
+    def _ranges(self, position: int) -> List[Tuple[int, int]]:
+        lo, hi = self.offsets[position], self.offsets[position + 1]
+        return list(zip(self.starts[lo:hi], self.ends[lo:hi]))
+
+    def to_dict(self) -> Dict[str, List[Tuple[int, int]]]:
+        return {self.paths.path(path_id): self._ranges(position) for position, path_id in enumerate(self.path_ids)}
+
+    def __reduce__(self):
+        # Path ids are only meaningful inside one process
+        return (CommitChanges, (self.to_dict(),))
+
+    def _position(self, file_path: str) -> int:
+        path_id = self.paths.lookup(file_path)
+        if path_id < 0:
+            return -1
+        i = bisect_left(self.sorted_ids, path_id)
+        if i < len(self.sorted_ids) and self.sorted_ids[i] == path_id:
+            return self.sorted_positions[i]
+        return -1
+
+    def __getitem__(self, file_path: str) -> List[Tuple[int, int]]:
+        position = self._position(file_path)
+        if position < 0:
+            raise KeyError(file_path)
+        return self._ranges(position)
+
+    def __contains__(self, file_path: object) -> bool:
+        return isinstance(file_path, str) and self._position(file_path) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return (self.paths.path(path_id) for path_id in self.path_ids)
+
+    def __len__(self) -> int:
+        return len(self.path_ids)
+
+    def __repr__(self):
+        return f'<CommitChanges files={len(self.path_ids)} ranges={len(self.starts)}>'
+
+    def overlap_spans(self, file_path: str, index: LineRangeIndex) -> List[Tuple[int, int]]:
+        """Return the spans where this commit's ranges for file_path overlap index."""
+        position = self._position(file_path)
+        if position < 0:
+            return []
+        lo, hi = self.offsets[position], self.offsets[position + 1]
+
+        if np is None or hi - lo < VECTORIZE_MIN_RANGES:
+            spans = []
+            for i in range(lo, hi):
+                spans.extend(index.overlaps(self.starts[i], self.ends[i]))
+            return spans
+
+        # Test every range at once, then compute exact spans only for the hits
+        starts = np.frombuffer(self.starts, dtype=np.int32)[lo:hi]
+        ends = np.frombuffer(self.ends, dtype=np.int32)[lo:hi]
+        spans = []
+        for i in np.flatnonzero(index.overlap_mask(starts, ends)):
+            spans.extend(index.overlaps(int(starts[i]), int(ends[i])))
+        return spans
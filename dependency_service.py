@@ -1,7 +1,9 @@
 import logging
 from datetime import datetime, timedelta
+from collections.abc import Mapping
 from typing import Dict, Any, List, Optional
-from git_dependency_analyzer import GitAnalyzer
+from git_dependency_analyzer import GitAnalyzer, ProgressCallback
+from commit_cache import CommitChangeCache
 import json
 
 logger = logging.getLogger(__name__)
@@ -9,13 +11,22 @@ logger = logging.getLogger(__name__)
 class DependencyService:
     """Service layer for Git dependency analysis."""
     
+    _commit_cache: Optional[CommitChangeCache] = None
+    
+    @staticmethod
+    def get_commit_cache() -> CommitChangeCache:
+        """Return the process-wide commit change cache shared by every analysis."""
+        if DependencyService._commit_cache is None:
+            DependencyService._commit_cache = CommitChangeCache()
+        return DependencyService._commit_cache
+    
     @staticmethod
     def _make_json_serializable(obj: Any) -> Any:
         """
         Recursively convert data structures to be JSON serializable.
         Converts tuples to lists and handles nested structures.
         """
-        if isinstance(obj, dict):
+        if isinstance(obj, Mapping):
             return {key: DependencyService._make_json_serializable(value) for key, value in obj.items()}
         elif isinstance(obj, list):
             return [DependencyService._make_json_serializable(item) for item in obj]
@@ -29,15 +40,27 @@ class DependencyService:
     @staticmethod
     def validate_and_analyze(repo_path: str, branch: str, target_commit: str, 
                             start_date: Optional[str] = None, 
-                            end_date: Optional[str] = None) -> Dict[str, Any]:
+                            end_date: Optional[str] = None,
+                            backend: Optional[str] = None,
+                            transitive: bool = False,
+                            track_lines: bool = False,
+                            progress: Optional[ProgressCallback] = None) -> Dict[str, Any]:
         """
         Validate inputs and perform dependency analysis.
         
+        The optional backend selects how GitAnalyzer reads history
+        ('gitpython' or 'git-log'); it defaults to DEPENDENCY_ANALYZER_BACKEND.
+        With transitive=True the result also contains the full dependency DAG
+        and a cherry-pick order under 'dependency_graph'. With track_lines=True
+        overlaps are checked after shifting earlier changes into the target
+        parent's line numbers, following renames. progress is passed on to
+        GitAnalyzer.analyze_dependencies to observe the scan as it runs.
+        
         Returns:
             Dictionary with 'success', 'data', and 'error' keys
         """
         try:
-            analyzer = GitAnalyzer(repo_path)
+            analyzer = GitAnalyzer(repo_path, cache=DependencyService.get_commit_cache(), backend=backend)
             
             if not analyzer.is_valid_repo():
                 return {
@@ -75,15 +98,18 @@ class DependencyService:
                 end_dt = datetime.now()
                 start_dt = end_dt - timedelta(days=30)
             
-            dependencies = analyzer.analyze_dependencies(
+            analysis = analyzer.analyze_dependencies(
                 branch=branch,
                 target_commit_hash=target_commit,
                 start_date=start_dt,
-                end_date=end_dt
+                end_date=end_dt,
+                transitive=transitive,
+                track_lines=track_lines,
+                progress=progress
             )
             
-            commits = analyzer.get_commits_in_range(branch, start_dt, end_dt)
-            target_changes = analyzer.get_commit_file_changes(target_commit)
+            dependencies = analysis.dependencies
+            target_changes = analysis.target_changes
             
             data = {
                 'dependencies': dependencies,
@@ -94,11 +120,17 @@ class DependencyService:
                     'start': start_dt.strftime("%Y-%m-%d"),
                     'end': end_dt.strftime("%Y-%m-%d")
                 },
-                'total_commits': len(commits),
+                'total_commits': len(analysis.commits),
                 'target_files_changed': len(target_changes),
-                'target_file_list': list(target_changes.keys())
+                'target_file_list': list(target_changes.keys()),
+                'cache_stats': analyzer.cache.stats(),
+                'prefilter_stats': analysis.prefilter_stats,
+                'track_lines': track_lines
             }
             
+            if transitive:
+                data['dependency_graph'] = analysis.graph
+            
             serializable_data = DependencyService._make_json_serializable(data)
             
             try:
@@ -0,0 +1,219 @@
+import os
+import re
+import zlib
+import sqlite3
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.environ.get('DOCUMENT_CACHE_DIR', '.cache')
+DEFAULT_MAX_ENTRIES = int(os.environ.get('DOCUMENT_CACHE_MAX_ENTRIES', '200'))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file's content."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Unify line endings and drop trailing whitespace and runs of blank lines."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return re.sub(r'\n{3,}', '\n\n', '\n'.join(line.rstrip() for line in lines)).strip()
+
+
+class DocumentCache:
+    """
+    Content-addressed cache of extracted document text, plus an index of saved uploads.
+
+    Extracted text is stored zlib-compressed under a key derived from the
+    file's SHA-256, its extension and the extractor version, so a document
+    is parsed once however often (and under whatever name) it is uploaded.
+    The least recently used texts are dropped beyond max_entries. The
+    upload index maps content hashes to files already saved, so identical
+    uploads share one copy on disk.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """Open (or create) the cache database under cache_dir."""
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.db_path = os.path.join(cache_dir, 'documents.sqlite3')
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.uploads_reused = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(cache_dir, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS document_texts (
+                    key TEXT PRIMARY KEY,
+                    text BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_document_texts_access ON document_texts (last_access)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS uploads (
+                    content_hash TEXT NOT NULL,
+                    extension TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    PRIMARY KEY (content_hash, extension)
+                )
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def text_key(content_hash: str, extension: str, version: int, max_chars: int = 0) -> str:
+        key = f'{content_hash}:{extension.lower()}:v{version}'
+        # A budget-limited extraction may be shorter, so it is cached separately
+        return f'{key}:{max_chars}' if max_chars else key
+
+    def get_text(self, key: str) -> Optional[str]:
+        """Return the cached text for a key, or None."""
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute("SELECT text FROM document_texts WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE document_texts SET last_access = ? WHERE key = ?", (time.time(), key))
+                        self.hits += 1
+                        return zlib.decompress(row[0]).decode('utf-8')
+            except (sqlite3.Error, zlib.error) as e:
+                logger.warning(f"Document cache read failed: {str(e)}")
+
+            self.misses += 1
+            return None
+
+    def put_text(self, key: str, text: str) -> None:
+        """Store extracted text, then drop the least recently used entries beyond max_entries."""
+        now = time.time()
+        data = text.encode('utf-8')
+        with self._lock:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO document_texts (key, text, size, created_at, last_access) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, zlib.compress(data, 6), len(data), now, now)
+                    )
+                    count = conn.execute("SELECT COUNT(*) FROM document_texts").fetchone()[0]
+                    if count > self.max_entries:
+                        excess = count - self.max_entries
+                        conn.execute("""
+                            DELETE FROM document_texts WHERE key IN (
+                                SELECT key FROM document_texts ORDER BY last_access ASC LIMIT ?
+                            )
+                        """, (excess,))
+                        self.evictions += excess
+            except sqlite3.Error as e:
+                logger.warning(f"Document cache write failed: {str(e)}")
+
+    def find_upload(self, content_hash: str, extension: str) -> Optional[str]:
+        """Path of a saved upload with this content and extension, if it still exists."""
+        extension = extension.lower()
+        with self._connect() as conn:
+            row = conn.execute("SELECT path FROM uploads WHERE content_hash = ? AND extension = ?",
+                               (content_hash, extension)).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[0]):
+                conn.execute("DELETE FROM uploads WHERE content_hash = ? AND extension = ?", (content_hash, extension))
+                return None
+            return row[0]
+
+    def record_upload(self, content_hash: str, extension: str, path: str) -> None:
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO uploads (content_hash, extension, path) VALUES (?, ?, ?)",
+                         (content_hash, extension.lower(), path))
+
+    def save_upload(self, stream: BinaryIO, upload_dir: str, filename: str) -> Tuple[str, bool]:
+        """
+        Save an uploaded file as upload_dir/filename unless identical content
+        with the same extension was saved before.
+
+        Returns (path, reused); when reused, path is the earlier copy and
+        nothing new is written.
+        """
+        os.makedirs(upload_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.incoming-', dir=upload_dir)
+        digest = hashlib.sha256()
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: stream.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        content_hash = digest.hexdigest()
+        extension = os.path.splitext(filename)[1]
+        with self._lock:
+            existing = self.find_upload(content_hash, extension)
+            if existing is not None:
+                os.remove(temp_path)
+                self.uploads_reused += 1
+                logger.info(f"Upload {filename} is identical to {existing}; reusing it")
+                return existing, True
+
+            path = os.path.join(upload_dir, filename)
+            os.replace(temp_path, path)
+            self.record_upload(content_hash, extension, path)
+            return path, False
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters, reused uploads and the current number of entries."""
+        with self._lock:
+            with self._connect() as conn:
+                entries, size, stored = conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(LENGTH(text)), 0) FROM document_texts"
+                ).fetchone()
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'uploads_reused': self.uploads_reused,
+            'entries': entries,
+            'text_bytes': size,
+            'stored_bytes': stored,
+            'max_entries': self.max_entries
+        }
+
+
+_default_cache: Optional[DocumentCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_document_cache() -> DocumentCache:
+    """Return the process-wide document cache."""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = DocumentCache()
+        return _default_cache
@@ -1,46 +1,99 @@
 import os
-from PyPDF2 import PdfReader
+import io
+import csv
+import math
+import logging
+from datetime import datetime
+from typing import Any, Iterable, Iterator, Sequence, Tuple
 from docx import Document
+import openpyxl
 import pandas as pd
+from document_cache import DocumentCache, file_digest, get_document_cache, normalize_text
+from patch_chunker import CHARS_PER_TOKEN
+from pdf_extractor import extract_pdf_text
 
-def extract_text_from_file(file_path: str) -> str:
+try:
+    import python_calamine
+except ImportError:  # pragma: no cover - the calamine engine is optional
+    python_calamine = None
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever extraction output changes, so texts cached by older code are not reused
+EXTRACTOR_VERSION = 3
+
+# 'auto' (calamine if installed, else openpyxl), 'calamine', 'openpyxl' (read-only streaming) or 'pandas';
+# .xls files always go through pandas
+EXCEL_ENGINE = os.environ.get('EXCEL_ENGINE', 'auto').lower()
+
+# Rows after the header and columns rendered per sheet (and for CSV files); 0 = no limit
+EXCEL_MAX_ROWS = int(os.environ.get('EXCEL_MAX_ROWS', '5000'))
+EXCEL_MAX_COLS = int(os.environ.get('EXCEL_MAX_COLS', '100'))
+
+# Longest document text passed on to the AI prompt (0 = no limit). DOCUMENT_MAX_TOKENS gives the
+# budget in estimated tokens instead; PDFs stop being parsed once it is reached
+DOCUMENT_MAX_CHARS = int(os.environ.get('DOCUMENT_MAX_CHARS', '0')) or \
+    int(int(os.environ.get('DOCUMENT_MAX_TOKENS', '0')) * CHARS_PER_TOKEN)
+
+def extract_text_from_file(file_path: str, use_cache: bool = True, max_chars: int = DOCUMENT_MAX_CHARS) -> str:
+    """
+    Return the normalized text of a PDF, DOCX, TXT, XLS(X) or CSV document.
+    
+    Text is cached by file content (see document_cache), so a document that
+    was extracted before, under any name, is not parsed again. With
+    max_chars > 0 longer text is cut off and ends with a note saying so.
+    """
     ext = os.path.splitext(file_path)[1].lower()
     
+    key = None
+    if use_cache and os.path.exists(file_path):
+        key = DocumentCache.text_key(file_digest(file_path), ext, EXTRACTOR_VERSION, max_chars)
+        cached = get_document_cache().get_text(key)
+        if cached is not None:
+            return cached
+    
+    text = normalize_text(_extract_text(file_path, ext, max_chars))
+    if key is not None:
+        get_document_cache().put_text(key, text)
+    return text
+
+def _truncate(text: str, max_chars: int) -> str:
+    if not max_chars or len(text) <= max_chars:
+        return text
+    return text[:max_chars] + f"\n\n[Document truncated to its first {max_chars} characters]"
+
+def _extract_text(file_path: str, ext: str, max_chars: int = 0) -> str:
     try:
         if ext == '.pdf':
-            return extract_text_from_pdf(file_path)
+            return extract_text_from_pdf(file_path, max_chars)
         elif ext == '.docx':
-            return extract_text_from_docx(file_path)
+            return _truncate(extract_text_from_docx(file_path), max_chars)
         elif ext == '.txt':
             with open(file_path, 'r', encoding='utf-8') as f:
                 content = f.read()
                 if not content.strip():
                     raise ValueError("Text file is empty")
-                return content
+                return _truncate(content, max_chars)
         elif ext in ['.xls', '.xlsx']:
-            return extract_text_from_excel(file_path)
+            return _truncate(extract_text_from_excel(file_path), max_chars)
         elif ext == '.csv':
-            return extract_text_from_csv(file_path)
+            return _truncate(extract_text_from_csv(file_path), max_chars)
         else:
             raise ValueError(f"Unsupported file format: {ext}. Please use PDF, DOCX, TXT, XLS, XLSX, or CSV.")
     except Exception as e:
         raise Exception(f"Error reading document: {str(e)}")
 
-def extract_text_from_pdf(file_path: str) -> str:
+def extract_text_from_pdf(file_path: str, max_chars: int = 0) -> str:
     try:
-        reader = PdfReader(file_path)
-        if len(reader.pages) == 0:
+        text, pages_read, total_pages, truncated = extract_pdf_text(file_path, max_chars)
+        if total_pages == 0:
             raise ValueError("PDF file has no pages")
         
-        text = ""
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        
         if not text.strip():
             raise ValueError("Could not extract text from PDF. The file may be image-based or corrupted.")
         
+        if truncated:
+            text += f"\n\n[Document truncated to its first {max_chars} characters; read {pages_read} of {total_pages} pages]"
         return text
     except Exception as e:
         raise Exception(f"Error reading PDF: {str(e)}")
@@ -59,28 +112,101 @@ def extract_text_from_docx(file_path: str) -> str:
     except Exception as e:
         raise Exception(f"Error reading DOCX: {str(e)}")
 
-def extract_text_from_excel(file_path: str) -> str:
-    try:
-        xls = pd.ExcelFile(file_path)
-        text = ""
-        
+def _cell_text(value: Any) -> str:
+    if value is None or value is pd.NaT or (isinstance(value, float) and math.isnan(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, datetime):
+        return value.date().isoformat() if value.time() == datetime.min.time() else value.isoformat(sep=' ')
+    # Tabs and line breaks inside a cell would break the row apart
+    return ' '.join(str(value).split())
+
+def render_tsv(rows: Iterable[Sequence[Any]], max_rows: int = 0, max_cols: int = 0) -> str:
+    """
+    Render rows (the first being the header) as tab-separated lines.
+    
+    Empty rows and trailing empty cells are dropped. At most max_rows rows
+    after the header and max_cols columns are kept (0 = no limit), with a
+    note when anything was left out.
+    """
+    out = io.StringIO()
+    written = 0
+    rows_cut = cols_cut = False
+    
+    for row in rows:
+        cells = [_cell_text(value) for value in row]
+        while cells and not cells[-1]:
+            cells.pop()
+        if not cells:
+            continue
+        if max_rows and written > max_rows:
+            rows_cut = True
+            break
+        if max_cols and len(cells) > max_cols:
+            cells = cells[:max_cols]
+            cols_cut = True
+        out.write('\t'.join(cells))
+        out.write('\n')
+        written += 1
+    
+    if rows_cut:
+        out.write(f"[Only the first {max_rows} rows are shown]\n")
+    if cols_cut:
+        out.write(f"[Only the first {max_cols} columns are shown]\n")
+    return out.getvalue()
+
+def _excel_engine(file_path: str, engine: str) -> str:
+    ext = os.path.splitext(file_path)[1].lower()
+    if engine == 'auto':
+        engine = 'calamine' if python_calamine is not None else 'openpyxl'
+    if engine == 'calamine' and python_calamine is None:
+        logger.warning("python-calamine is not installed; reading Excel files with openpyxl instead")
+        engine = 'openpyxl'
+    if engine == 'openpyxl' and ext == '.xls':
+        # openpyxl only reads the xlsx format
+        engine = 'pandas'
+    return engine
+
+def _iter_excel_sheets(file_path: str, engine: str, max_rows: int, max_cols: int) -> Iterator[Tuple[str, Iterable[Sequence[Any]]]]:
+    """Yield (sheet name, rows) for every sheet, opening the workbook once."""
+    if engine == 'openpyxl':
+        # Read-only mode streams rows from the file instead of building the whole workbook
+        workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            for sheet in workbook.worksheets:
+                yield sheet.title, sheet.iter_rows(max_col=max_cols + 1 if max_cols else None, values_only=True)
+        finally:
+            workbook.close()
+        return
+    
+    with pd.ExcelFile(file_path, engine='calamine' if engine == 'calamine' else None) as xls:
         for sheet_name in xls.sheet_names:
-            df = pd.read_excel(file_path, sheet_name=sheet_name)
-            text += f"\n=== Sheet: {sheet_name} ===\n"
-            text += df.to_string(index=False, na_rep='')
-            text += "\n\n"
+            # No nrows: render_tsv caps rows after dropping blank ones, so a row limit here would cut early
+            df = xls.parse(sheet_name, header=None)
+            yield sheet_name, df.itertuples(index=False, name=None)
+
+def extract_text_from_excel(file_path: str, max_rows: int = EXCEL_MAX_ROWS, max_cols: int = EXCEL_MAX_COLS,
+                            engine: str = EXCEL_ENGINE) -> str:
+    try:
+        text = io.StringIO()
+        for sheet_name, rows in _iter_excel_sheets(file_path, _excel_engine(file_path, engine), max_rows, max_cols):
+            text.write(f"\n=== Sheet: {sheet_name} ===\n")
+            text.write(render_tsv(rows, max_rows, max_cols))
+            text.write("\n")
+        text = text.getvalue()
         
-        if not text.strip():
+        if not text.replace('=== Sheet:', '').strip(' =\n'):
             raise ValueError("Excel file appears to be empty")
         
         return text
     except Exception as e:
         raise Exception(f"Error reading Excel file: {str(e)}")
 
-def extract_text_from_csv(file_path: str) -> str:
+def extract_text_from_csv(file_path: str, max_rows: int = EXCEL_MAX_ROWS, max_cols: int = EXCEL_MAX_COLS) -> str:
     try:
-        df = pd.read_csv(file_path)
-        text = df.to_string(index=False, na_rep='')
+        with open(file_path, 'r', encoding='utf-8', newline='') as f:
+            text = render_tsv(csv.reader(f), max_rows, max_cols)
         
         if not text.strip():
             raise ValueError("CSV file appears to be empty")
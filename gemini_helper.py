@@ -1,7 +1,66 @@
 import os
 import json
+import time
+import random
+import logging
+import threading
 import requests
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
 from datetime import datetime
+from requests.adapters import HTTPAdapter
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from ai_response_cache import cache_key, get_response_cache, normalize_text
+from patch_chunker import DEFAULT_CHUNK_TOKENS, PatchChunk, chunk_patch, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Receives (event, data) notifications: 'requesting' (model), 'streaming' (model, characters) as
+# streamed text arrives, 'received' (model, tokens, characters) and 'cached' (model, characters)
+# when the response came from the response cache. Patch analysis also reports 'planned' (the
+# estimate_analysis dict) before its final request, preceded by 'chunk_analyzed' and
+# 'notes_combined' (done, total) while a large patch is analyzed in chunks
+AIProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# Receives each piece of response text as it is streamed
+AIChunkCallback = Callable[[str], None]
+
+# Overridable so the client can be pointed at a local stub server
+GEMINI_API_BASE = os.environ.get('GEMINI_API_BASE', 'https://generativelanguage.googleapis.com/v1beta')
+
+MODELS_TO_TRY = [
+    "gemini-2.0-flash",
+    "gemini-1.5-flash",
+    "gemini-2.5-pro"
+]
+
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "topK": 40,
+    "topP": 0.95,
+    "maxOutputTokens": 8192,
+}
+
+GEMINI_TIMEOUT = float(os.environ.get('GEMINI_TIMEOUT', '120'))
+GEMINI_MAX_RETRIES = int(os.environ.get('GEMINI_MAX_RETRIES', '3'))
+GEMINI_BACKOFF_BASE = float(os.environ.get('GEMINI_BACKOFF_BASE', '1.0'))
+GEMINI_BACKOFF_MAX = float(os.environ.get('GEMINI_BACKOFF_MAX', '30'))
+GEMINI_POOL_SIZE = int(os.environ.get('GEMINI_POOL_SIZE', '10'))
+GEMINI_RACE_MODELS = os.environ.get('GEMINI_RACE_MODELS', '').lower() in ('1', 'true', 'yes')
+GEMINI_STREAM = os.environ.get('GEMINI_STREAM', 'true').lower() in ('1', 'true', 'yes')
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Patch chunks (and note merges) analyzed at the same time when a patch is too big for one prompt
+AI_MAP_CONCURRENCY = int(os.environ.get('AI_MAP_CONCURRENCY', '4'))
+
+# Per-chunk notes are kept short so that all of them fit in the final prompt
+MAP_GENERATION_CONFIG = dict(GENERATION_CONFIG, maxOutputTokens=2048)
+
+NO_RESPONSE = "Error: No valid response from AI model"
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
 
 def configure_gemini():
     api_key = os.environ.get("GEMINI_API_KEY")
@@ -9,19 +68,180 @@ def configure_gemini():
         raise Exception("GEMINI_API_KEY environment variable is not set. Please configure your API key in the Secrets.")
     return api_key
 
-def log_prompt(prompt: str):
+def log_prompt(prompt: str, suffix: str = ''):
     os.makedirs("prompts", exist_ok=True)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    log_file_path = f"prompts/prompt_{timestamp}.txt"
+    log_file_path = f"prompts/prompt_{timestamp}{suffix}.txt"
     with open(log_file_path, "w") as log_file:
         log_file.write(prompt)
 
-def analyze_with_rest_api(prompt: str, api_key: str) -> str:
-    models_to_try = [
-        "gemini-2.0-flash",
-        "gemini-1.5-flash",
-        "gemini-2.5-pro"
-    ]
+def get_session() -> requests.Session:
+    """Return the shared keep-alive session used for Gemini requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(MODELS_TO_TRY), pool_maxsize=GEMINI_POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+        return _session
+
+def _backoff_delay(attempt: int, retry_after: Optional[str] = None) -> float:
+    """Seconds to wait before retry number attempt + 1: the server's Retry-After, else full-jitter exponential backoff."""
+    if retry_after and retry_after.strip().isdigit():
+        return min(float(retry_after), GEMINI_BACKOFF_MAX)
+    return random.uniform(0, min(GEMINI_BACKOFF_MAX, GEMINI_BACKOFF_BASE * 2 ** attempt))
+
+def _post_with_retries(url: str, headers: Dict[str, str], payload: Dict[str, Any],
+                       stream: bool = False) -> requests.Response:
+    """POST with retries on connection errors, 429 and 5xx; other HTTP errors raise immediately."""
+    for attempt in range(GEMINI_MAX_RETRIES + 1):
+        try:
+            response = get_session().post(url, headers=headers, json=payload, timeout=GEMINI_TIMEOUT, stream=stream)
+        except requests.exceptions.ConnectionError as e:
+            if attempt == GEMINI_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+            logger.warning(f"Gemini connection failed ({str(e)}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            continue
+        
+        if response.status_code in RETRY_STATUSES and attempt < GEMINI_MAX_RETRIES:
+            delay = _backoff_delay(attempt, response.headers.get('Retry-After'))
+            logger.warning(f"Gemini returned {response.status_code} for {url}; retrying in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+            continue
+        
+        if response.status_code >= 400:
+            # Release the connection; only the status is needed for the error
+            response.close()
+        response.raise_for_status()
+        return response
+
+def _extract_text(result: Dict[str, Any]) -> Optional[str]:
+    if "candidates" in result and len(result["candidates"]) > 0:
+        candidate = result["candidates"][0]
+        if "content" in candidate and "parts" in candidate["content"]:
+            parts = candidate["content"]["parts"]
+            if len(parts) > 0 and "text" in parts[0]:
+                return parts[0]["text"]
+    return None
+
+def _request_model(model_name: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Ask one model; returns (response text or None, raw result)."""
+    url = f"{GEMINI_API_BASE}/models/{model_name}:generateContent"
+    result = _post_with_retries(url, headers, payload).json()
+    return _extract_text(result), result
+
+class StreamInterrupted(Exception):
+    """Raised when a streamed response fails after some text was already delivered."""
+
+def _stream_model(model_name: str, headers: Dict[str, str], payload: Dict[str, Any],
+                  on_chunk: AIChunkCallback, progress: Optional[AIProgressCallback] = None) -> Tuple[Optional[str], Dict[str, Any]]:
+    """
+    Ask one model through the streamGenerateContent SSE endpoint, passing
+    each text piece to on_chunk. Returns (full text or None, last event).
+    """
+    url = f"{GEMINI_API_BASE}/models/{model_name}:streamGenerateContent?alt=sse"
+    response = _post_with_retries(url, headers, payload, stream=True)
+    pieces: List[str] = []
+    characters = 0
+    last_event: Dict[str, Any] = {}
+    
+    try:
+        # SSE is always UTF-8, but the reply names no charset (requests would assume ISO-8859-1),
+        # so split the raw bytes into lines and decode each complete line
+        for raw_line in response.iter_lines():
+            line = raw_line.decode('utf-8')
+            if not line or not line.startswith('data:'):
+                continue
+            last_event = json.loads(line[len('data:'):].strip())
+            text = _extract_text(last_event)
+            if not text:
+                continue
+            pieces.append(text)
+            characters += len(text)
+            on_chunk(text)
+            if progress:
+                progress('streaming', {'model': model_name, 'characters': characters})
+    except (requests.exceptions.RequestException, ValueError) as e:
+        if pieces:
+            raise StreamInterrupted(f"Streaming from {model_name} stopped after {characters} characters: {str(e)}")
+        raise
+    finally:
+        response.close()
+    
+    if not pieces:
+        return None, last_event
+    return ''.join(pieces), last_event
+
+def _race_models(models: List[str], headers: Dict[str, str],
+                 payload: Dict[str, Any]) -> Tuple[Optional[str], Optional[str], Dict[str, Any], Optional[Exception]]:
+    """
+    Ask every model at once and keep the first valid answer.
+    
+    Returns (model, text, result, last_error); model is None if no model answered.
+    """
+    executor = ThreadPoolExecutor(max_workers=len(models), thread_name_prefix='gemini-race')
+    futures = {executor.submit(_request_model, model_name, headers, payload): model_name for model_name in models}
+    last_error = None
+    try:
+        for future in as_completed(futures):
+            try:
+                text, result = future.result()
+            except requests.exceptions.RequestException as e:
+                last_error = e
+                continue
+            if text is not None:
+                return futures[future], text, result, None
+        return None, None, {}, last_error
+    finally:
+        # Slower requests finish in the background; their answers are discarded
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def analyze_with_rest_api(prompt: str, api_key: str, progress: Optional[AIProgressCallback] = None,
+                          use_cache: bool = True, race: Optional[bool] = None,
+                          on_chunk: Optional[AIChunkCallback] = None,
+                          generation_config: Optional[Dict[str, Any]] = None) -> str:
+    """
+    Send prompt to Gemini and return the response text.
+    
+    Models are tried in MODELS_TO_TRY order, moving on when one is not
+    found or stays rate limited/unavailable after retries. With race=True
+    (default GEMINI_RACE_MODELS) all models are asked concurrently and the
+    first valid answer wins, at the cost of paying for every request.
+    Responses are cached per exact prompt, model and generationConfig;
+    use_cache=False skips the lookup (the fresh response is still stored).
+    
+    If on_chunk is given (and GEMINI_STREAM is on), the response is read
+    from streamGenerateContent and handed to on_chunk piece by piece; a
+    cached response is delivered as a single piece. Streaming always tries
+    the models one after another.
+    
+    generation_config defaults to GENERATION_CONFIG.
+    """
+    models_to_try = MODELS_TO_TRY
+    generation_config = generation_config or GENERATION_CONFIG
+    cache = get_response_cache()
+    if race is None:
+        race = GEMINI_RACE_MODELS
+    stream = on_chunk is not None and GEMINI_STREAM
+    if stream:
+        race = False
+    
+    if use_cache:
+        keys = {cache_key(prompt, model_name, generation_config): model_name for model_name in models_to_try}
+        key, cached = cache.get_any(list(keys))
+        if cached is not None:
+            if progress:
+                progress('cached', {'model': keys[key], 'characters': len(cached)})
+            if on_chunk:
+                on_chunk(cached)
+            return cached
+    else:
+        cache.record_bypass()
     
     headers = {
         "Content-Type": "application/json",
@@ -34,47 +254,56 @@ def analyze_with_rest_api(prompt: str, api_key: str) -> str:
                 "text": prompt
             }]
         }],
-        "generationConfig": {
-            "temperature": 0.7,
-            "topK": 40,
-            "topP": 0.95,
-            "maxOutputTokens": 8192,
-        }
+        "generationConfig": generation_config
     }
     
     last_error = None
+    model_name, text, result = None, None, {}
     
-    for model_name in models_to_try:
-        try:
-            url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent"
-            response = requests.post(url, headers=headers, json=payload, timeout=120)
-            response.raise_for_status()
-            
-            result = response.json()
-            
-            if "candidates" in result and len(result["candidates"]) > 0:
-                candidate = result["candidates"][0]
-                if "content" in candidate and "parts" in candidate["content"]:
-                    parts = candidate["content"]["parts"]
-                    if len(parts) > 0 and "text" in parts[0]:
-                        return parts[0]["text"]
-            
-            return "Error: No valid response from AI model"
-        
-        except requests.exceptions.HTTPError as e:
-            last_error = e
-            if e.response.status_code != 404:
+    if race:
+        if progress:
+            progress('requesting', {'model': ', '.join(models_to_try)})
+        model_name, text, result, last_error = _race_models(models_to_try, headers, payload)
+        if model_name is None and last_error is None:
+            return NO_RESPONSE
+    else:
+        for candidate_model in models_to_try:
+            try:
+                if progress:
+                    progress('requesting', {'model': candidate_model})
+                if stream:
+                    text, result = _stream_model(candidate_model, headers, payload, on_chunk, progress)
+                else:
+                    text, result = _request_model(candidate_model, headers, payload)
+            except requests.exceptions.HTTPError as e:
+                last_error = e
+                if e.response.status_code != 404 and e.response.status_code not in RETRY_STATUSES:
+                    raise Exception(f"API request failed: {str(e)}")
+                continue
+            except (requests.exceptions.RequestException, StreamInterrupted) as e:
                 raise Exception(f"API request failed: {str(e)}")
-            continue
-        except requests.exceptions.RequestException as e:
-            raise Exception(f"API request failed: {str(e)}")
+            
+            if text is None:
+                return NO_RESPONSE
+            model_name = candidate_model
+            break
     
-    raise Exception(f"All models failed. Last error: {str(last_error)}. Please verify your API key is valid and has access to Gemini models.")
-
-def analyze_brd_and_patch(brd_content: str, patch_content: str) -> str:
-    api_key = configure_gemini()
+    if model_name is None:
+        raise Exception(f"All models failed. Last error: {str(last_error)}. Please verify your API key is valid and has access to Gemini models.")
     
-    system_instruction = """You are a technical analyst helping developers understand feature implementations.
+    if on_chunk and not stream:
+        on_chunk(text)
+    
+    if progress:
+        progress('received', {
+            'model': model_name,
+            'tokens': result.get("usageMetadata", {}).get("candidatesTokenCount"),
+            'characters': len(text)
+        })
+    cache.put(cache_key(prompt, model_name, generation_config), model_name, text)
+    return text
+
+ANALYSIS_INSTRUCTION = """You are a technical analyst helping developers understand feature implementations.
 Your task is to analyze a BRD (Business Requirements Document) or User Story and a code patch file, then generate a comprehensive analysis document.
 
 The analysis should include:
@@ -88,12 +317,30 @@ The analysis should include:
 
 Format the response in clean, well-structured Markdown."""
 
-    prompt = f"""
-{system_instruction}
+CHUNK_INSTRUCTION = """You are a technical analyst helping developers understand feature implementations.
+The code patch of a feature is too large to read at once, so it is analyzed in parts. Below is one part.
+
+Write concise Markdown notes about this part only:
+- **Files**: each file changed and what changed in it
+- **Key Functions/Methods**: code elements added or modified, with their purpose
+- **Behaviour Changes**: new or changed behaviour, data or configuration
+- **Dependencies and Risks**: new dependencies, migrations, edge cases or anything unusual
+
+Do not write an introduction or an overall summary; the notes of all parts are combined later."""
+
+COMBINE_INSTRUCTION = """You are a technical analyst helping developers understand feature implementations.
+Below are notes on consecutive parts of one large code patch. Merge them into a single set of concise Markdown notes
+with the same headings (Files, Key Functions/Methods, Behaviour Changes, Dependencies and Risks), keeping every file and
+important detail but removing repetition."""
+
+def _analysis_prompt(brd_content: str, patch_content: str) -> str:
+    # Only the BRD is normalized; the patch goes in (and into the cache key) exactly as it is
+    return f"""
+{ANALYSIS_INSTRUCTION}
 
 BRD/User Story Content:
 ---
-{brd_content}
+{normalize_text(brd_content)}
 ---
 
 Patch File Content:
@@ -104,6 +351,200 @@ Patch File Content:
 Please analyze the above and generate a comprehensive analysis document following the structure outlined.
 """
 
-    log_prompt(prompt)
+def _chunk_prompt(chunk: PatchChunk, total: int) -> str:
+    return f"""
+{CHUNK_INSTRUCTION}
+
+Patch part {chunk.index + 1} of {total}:
+---
+{chunk.text}
+---
+"""
+
+def _combine_prompt(notes: List[str]) -> str:
+    parts = '\n\n'.join(f"Notes {i + 1}:\n---\n{text}\n---" for i, text in enumerate(notes))
+    return f"""
+{COMBINE_INSTRUCTION}
+
+{parts}
+"""
+
+def _reduce_prompt(brd_content: str, notes: List[str]) -> str:
+    parts = '\n\n'.join(f"Patch notes, part {i + 1} of {len(notes)}:\n---\n{text}\n---" for i, text in enumerate(notes))
+    return f"""
+{ANALYSIS_INSTRUCTION}
+
+The patch was too large to include directly. It was analyzed in parts, and the notes on those parts are given
+instead of the patch content.
+
+BRD/User Story Content:
+---
+{normalize_text(brd_content)}
+---
+
+{parts}
+
+Please analyze the above and generate a comprehensive analysis document following the structure outlined.
+"""
 
-    return analyze_with_rest_api(prompt, api_key)
+def split_patch(patch_content: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[PatchChunk]:
+    """The parts a patch is analyzed in, or an empty list if it fits in one prompt."""
+    if estimate_tokens(patch_content) <= chunk_tokens:
+        return []
+    return chunk_patch(patch_content, chunk_tokens)
+
+def plan_analysis(brd_content: str, patch_content: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                  chunks: Optional[List[PatchChunk]] = None) -> Tuple[List[PatchChunk], Dict[str, Any]]:
+    """
+    Decide how a BRD and patch will be analyzed and estimate the token cost.
+    
+    Returns (chunks, estimate); chunks are those of split_patch unless
+    already given. Token counts are approximations (see
+    patch_chunker.estimate_tokens); output tokens are the configured
+    maxOutputTokens limits, i.e. an upper bound.
+    """
+    if chunks is None:
+        chunks = split_patch(patch_content, chunk_tokens)
+    brd_tokens = estimate_tokens(brd_content)
+    patch_tokens = estimate_tokens(patch_content)
+    estimate = {
+        'mode': 'single',
+        'brd_tokens': brd_tokens,
+        'patch_tokens': patch_tokens,
+        'chunk_budget': chunk_tokens,
+        'chunks': 0,
+        'chunk_tokens': [],
+        'requests': 1,
+        'input_tokens': estimate_tokens(_analysis_prompt(brd_content, patch_content)),
+        'max_output_tokens': GENERATION_CONFIG['maxOutputTokens']
+    }
+    if not chunks:
+        return chunks, estimate
+    
+    map_output = MAP_GENERATION_CONFIG['maxOutputTokens']
+    map_input = sum(estimate_tokens(_chunk_prompt(chunk, len(chunks))) for chunk in chunks)
+    # The final prompt holds the BRD and at most map_output tokens of notes per chunk
+    reduce_input = estimate_tokens(_reduce_prompt(brd_content, [])) + len(chunks) * map_output
+    estimate.update({
+        'mode': 'map_reduce',
+        'chunks': len(chunks),
+        'chunk_tokens': [chunk.tokens for chunk in chunks],
+        'requests': len(chunks) + 1,
+        'input_tokens': map_input + reduce_input,
+        'max_output_tokens': len(chunks) * map_output + GENERATION_CONFIG['maxOutputTokens']
+    })
+    return chunks, estimate
+
+def estimate_analysis(brd_content: str, patch_content: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS) -> Dict[str, Any]:
+    """Token estimate for analyze_brd_and_patch without calling the model."""
+    return plan_analysis(brd_content, patch_content, chunk_tokens)[1]
+
+def _analyze_prompts(prompts: List[str], api_key: str, use_cache: bool, event: str,
+                     progress: Optional[AIProgressCallback] = None) -> List[str]:
+    """
+    Send prompts concurrently (up to AI_MAP_CONCURRENCY at a time) and
+    return the answers in prompt order. progress(event, {done, total}) is
+    called from this thread as each answer arrives; the first failure
+    cancels the prompts not yet sent.
+    """
+    answers: List[Optional[str]] = [None] * len(prompts)
+    executor = ThreadPoolExecutor(max_workers=max(1, min(AI_MAP_CONCURRENCY, len(prompts))),
+                                  thread_name_prefix='gemini-map')
+    futures = {executor.submit(analyze_with_rest_api, prompt, api_key, None, use_cache,
+                               generation_config=MAP_GENERATION_CONFIG): i
+               for i, prompt in enumerate(prompts)}
+    try:
+        for done, future in enumerate(as_completed(futures), 1):
+            answer = future.result()
+            if answer == NO_RESPONSE:
+                raise Exception(f"{NO_RESPONSE} for patch part {futures[future] + 1} of {len(prompts)}")
+            answers[futures[future]] = answer
+            if progress:
+                progress(event, {'done': done, 'total': len(prompts)})
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+    
+    return answers
+
+def _combine_notes(notes: List[str], api_key: str, use_cache: bool, budget: int,
+                   progress: Optional[AIProgressCallback] = None) -> List[str]:
+    """Merge neighbouring notes until all of them fit in budget tokens (or no two fit together)."""
+    while len(notes) > 1 and sum(estimate_tokens(text) for text in notes) > budget:
+        groups: List[List[str]] = [[]]
+        for text in notes:
+            if groups[-1] and sum(estimate_tokens(t) for t in groups[-1] + [text]) > budget:
+                groups.append([])
+            groups[-1].append(text)
+        if len(groups) == len(notes):
+            break
+        
+        merge = [i for i, group in enumerate(groups) if len(group) > 1]
+        merged = _analyze_prompts([_combine_prompt(groups[i]) for i in merge], api_key, use_cache,
+                                  'notes_combined', progress)
+        for i, text in zip(merge, merged):
+            groups[i] = [text]
+        notes = [group[0] for group in groups]
+    
+    return notes
+
+@contextmanager
+def _timed(timings: Dict[str, float], name: str) -> Iterator[None]:
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.monotonic() - start, 3)
+
+def analyze_brd_and_patch(brd_content: Union[str, Future], patch_content: Union[str, Future],
+                          progress: Optional[AIProgressCallback] = None, use_cache: bool = True,
+                          on_chunk: Optional[AIChunkCallback] = None,
+                          chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                          timings: Optional[Dict[str, float]] = None) -> str:
+    """
+    Generate the analysis document for a BRD and its patch.
+    
+    A patch estimated above chunk_tokens is split per file and hunk (see
+    patch_chunker) and analyzed map-reduce style: the parts are summarized
+    concurrently without the BRD, so their notes are cached independently
+    of it, and the final request combines the BRD with the notes into the
+    usual report. Only that final request is streamed to on_chunk.
+    
+    Either input may be a Future still being produced by another thread
+    (e.g. document text extraction). The patch parts are sent as soon as
+    the patch is available and the BRD is waited for only when the final
+    prompt is built. Seconds spent in each step are recorded in timings.
+    """
+    api_key = configure_gemini()
+    if timings is None:
+        timings = {}
+    
+    with _timed(timings, 'patch_wait'):
+        if isinstance(patch_content, Future):
+            patch_content = patch_content.result()
+    with _timed(timings, 'patch_split'):
+        chunks = split_patch(patch_content, chunk_tokens)
+    
+    notes = []
+    if chunks:
+        chunk_prompts = [_chunk_prompt(chunk, len(chunks)) for chunk in chunks]
+        for chunk, chunk_prompt in zip(chunks, chunk_prompts):
+            log_prompt(chunk_prompt, f'_part{chunk.index + 1}')
+        with _timed(timings, 'patch_parts'):
+            notes = _analyze_prompts(chunk_prompts, api_key, use_cache, 'chunk_analyzed', progress)
+            notes = _combine_notes(notes, api_key, use_cache, chunk_tokens, progress)
+    
+    with _timed(timings, 'brd_wait'):
+        if isinstance(brd_content, Future):
+            brd_content = brd_content.result()
+    
+    _, estimate = plan_analysis(brd_content, patch_content, chunk_tokens, chunks)
+    logger.info(f"AI analysis plan: {estimate['mode']}, {estimate['chunks']} chunk(s), "
+                f"~{estimate['input_tokens']} input tokens in {estimate['requests']} request(s)")
+    if progress:
+        progress('planned', estimate)
+    
+    prompt = _reduce_prompt(brd_content, notes) if chunks else _analysis_prompt(brd_content, patch_content)
+    log_prompt(prompt)
+    
+    with _timed(timings, 'final_request'):
+        return analyze_with_rest_api(prompt, api_key, progress, use_cache, on_chunk=on_chunk)
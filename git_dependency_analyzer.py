@@ -1,20 +1,94 @@
 import os
 import re
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Set, Tuple, Optional
+from typing import List, Dict, Any, Set, Tuple, Optional, Callable
 import git
 from git import Repo, InvalidGitRepositoryError
+from line_range_index import LineRangeIndex, build_line_index, merge_spans
+from commit_cache import CommitChangeCache, CHANGES_VERSION
+from commit_changes import CommitChanges, PathTable
+from git_log_stream import iter_git_log, iter_name_status
+from line_tracking import LineShiftTracker
 
 logger = logging.getLogger(__name__)
 
+BACKEND_GITPYTHON = 'gitpython'
+BACKEND_GIT_LOG = 'git-log'
+BACKENDS = (BACKEND_GITPYTHON, BACKEND_GIT_LOG)
+
+DEFAULT_BACKEND = os.environ.get('DEPENDENCY_ANALYZER_BACKEND', BACKEND_GITPYTHON)
+DEFAULT_WORKERS = int(os.environ.get('DEPENDENCY_ANALYZER_WORKERS', '1'))
+DEFAULT_CHUNK_SIZE = 64
+DEFAULT_LINE_BUCKET = 64
+
+# Receives (event, data) progress notifications from analyze_dependencies
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+# Per-process analyzer used by ProcessPoolExecutor workers
+_worker_analyzer = None
+
+def _init_diff_worker(repo_path: str, cache_dir: Optional[str], cache_max_entries: int,
+                      cache_version: int = CHANGES_VERSION) -> None:
+    """Open a dedicated repository handle (and cache connection) in each worker process."""
+    global _worker_analyzer
+    cache = CommitChangeCache(cache_dir, cache_max_entries, cache_version) if cache_dir else None
+    _worker_analyzer = GitAnalyzer(repo_path, cache=cache, backend=BACKEND_GITPYTHON)
+    _worker_analyzer.repo = Repo(repo_path)
+
+def _diff_commit_chunk(commit_hashes: List[str]) -> List[Tuple[str, Dict[str, List[Tuple[int, int]]]]]:
+    """Diff a chunk of commits in a worker process."""
+    return [(commit_hash, _worker_analyzer.get_commit_file_changes(commit_hash)) for commit_hash in commit_hashes]
+
+class DependencyAnalysis:
+    """Result of GitAnalyzer.analyze_dependencies, including the data gathered on the way."""
+    
+    def __init__(self, commits: List[Dict[str, Any]], target_changes: Dict[str, List[Tuple[int, int]]],
+                 dependencies: List[Dict[str, Any]], target_commit: Optional[Dict[str, Any]] = None,
+                 graph: Optional[Dict[str, Any]] = None, prefilter_stats: Optional[Dict[str, int]] = None):
+        self.commits = commits
+        self.target_changes = target_changes
+        self.dependencies = dependencies
+        self.target_commit = target_commit
+        self.graph = graph
+        self.prefilter_stats = prefilter_stats
+    
+    def __repr__(self):
+        return f'<DependencyAnalysis commits={len(self.commits)} dependencies={len(self.dependencies)}>'
+
 class GitAnalyzer:
     """Class to analyze Git repositories and detect commit dependencies."""
     
-    def __init__(self, repo_path: str):
-        """Initialize the GitAnalyzer with a repository path."""
+    def __init__(self, repo_path: str, cache: Optional[CommitChangeCache] = None,
+                 backend: Optional[str] = None, workers: Optional[int] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, prefilter: bool = True):
+        """
+        Initialize the GitAnalyzer with a repository path.
+        
+        Args:
+            cache: Optional persistent cache of per-commit file changes
+            backend: 'gitpython' diffs each commit through GitPython, 'git-log'
+                streams every commit and its hunks from a single `git log -p`
+            workers: Number of processes used to diff commits with the
+                gitpython backend; 1 keeps everything in-process
+            chunk_size: Number of commits handed to a worker at a time
+            prefilter: Skip diffing commits that touch none of the target's
+                files (gitpython backend only)
+        """
+        backend = backend or DEFAULT_BACKEND
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown analyzer backend '{backend}'. Use one of: {', '.join(BACKENDS)}")
+        
         self.repo_path = repo_path
         self.repo = None
+        self.cache = cache
+        self.backend = backend
+        self.workers = max(1, workers if workers is not None else DEFAULT_WORKERS)
+        self.chunk_size = max(1, chunk_size)
+        self.prefilter = prefilter
+        # Interns the file paths of every commit this analyzer reads; freed with the analyzer
+        self.paths = PathTable()
         
     def is_valid_repo(self) -> bool:
         """Check if the given path is a valid Git repository."""
@@ -89,6 +163,45 @@ class GitAnalyzer:
         
         return commits
     
+    def get_commits_with_changes(self, branch: str, start_date: datetime, 
+                                 end_date: datetime) -> Tuple[List[Dict[str, Any]], Dict[str, Dict[str, List[Tuple[int, int]]]]]:
+        """
+        Get commits in the date range together with their file changes in one pass.
+        
+        Returns the same commit list as get_commits_in_range and a mapping of
+        full commit hash to the changes get_commit_file_changes would return.
+        """
+        commits = []
+        changes_by_hash = {}
+        until = end_date + timedelta(days=1)  # Include end date
+        
+        try:
+            for commit, file_changes in iter_git_log(self.repo_path, branch, start_date, until):
+                commit_date = datetime.strptime(commit["date"], "%Y-%m-%d %H:%M:%S")
+                parents = commit.pop("parents")
+                
+                if not (start_date <= commit_date <= until):
+                    continue
+                
+                # Root commits have no parent to diff against
+                if not parents:
+                    file_changes = {}
+                
+                commits.append(commit)
+                changes_by_hash[commit["full_hash"]] = CommitChanges(file_changes, self.paths)
+            
+            # Sort by date (newest first)
+            commits.sort(key=lambda x: x["date"], reverse=True)
+            
+        except Exception as e:
+            logger.error(f"Error streaming commits: {str(e)}")
+            raise
+        
+        if self.cache is not None:
+            self.cache.put_many(changes_by_hash)
+        
+        return commits, changes_by_hash
+    
     def get_commit_file_changes(self, commit_hash: str) -> Dict[str, List[Tuple[int, int]]]:
         """Get file changes and line ranges for a specific commit."""
         if not self.repo:
@@ -96,6 +209,13 @@ class GitAnalyzer:
         
         try:
             commit = self.repo.commit(commit_hash)
+            
+            # A commit's diff never changes, so cached results are always valid
+            if self.cache is not None:
+                cached_changes = self.cache.get(commit.hexsha, self.paths)
+                if cached_changes is not None:
+                    return cached_changes
+            
             file_changes = {}
             
             if commit.parents:
@@ -126,20 +246,66 @@ class GitAnalyzer:
                             line_ranges = self._parse_diff_line_numbers(diff_text)
                             file_changes[file_path].extend(line_ranges)
             
+            file_changes = CommitChanges(file_changes, self.paths)
+            
+            if self.cache is not None:
+                self.cache.put(commit.hexsha, file_changes)
+            
             return file_changes
             
         except Exception as e:
             logger.error(f"Error getting file changes for commit {commit_hash}: {str(e)}")
             return {}
     
+    def get_commits_file_changes_parallel(self, commit_hashes: List[str]) -> Dict[str, Dict[str, List[Tuple[int, int]]]]:
+        """
+        Get file changes for many commits, diffing cache misses across a process pool.
+        
+        Returns a mapping of commit hash to changes in the order of commit_hashes,
+        identical to calling get_commit_file_changes for each hash serially.
+        """
+        if not self.repo:
+            self.repo = Repo(self.repo_path)
+        
+        results: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        pending = []
+        
+        for commit_hash in commit_hashes:
+            cached_changes = self.cache.get(commit_hash, self.paths) if self.cache is not None else None
+            if cached_changes is not None:
+                results[commit_hash] = cached_changes
+            else:
+                pending.append(commit_hash)
+        
+        if len(pending) <= self.chunk_size or self.workers == 1:
+            for commit_hash in pending:
+                results[commit_hash] = self.get_commit_file_changes(commit_hash)
+        else:
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+            cache_dir = self.cache.cache_dir if self.cache is not None else None
+            cache_max_entries = self.cache.max_entries if self.cache is not None else 0
+            cache_version = self.cache.version if self.cache is not None else CHANGES_VERSION
+            
+            # Workers write their own results to the shared cache
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(chunks)),
+                                     initializer=_init_diff_worker,
+                                     initargs=(self.repo_path, cache_dir, cache_max_entries, cache_version)) as executor:
+                for chunk_results in executor.map(_diff_commit_chunk, chunks):
+                    # Changes arrive with their own path tables; move them onto this analyzer's
+                    results.update((commit_hash, CommitChanges.from_dict(changes, self.paths))
+                                   for commit_hash, changes in chunk_results)
+        
+        return {commit_hash: results[commit_hash] for commit_hash in commit_hashes}
+    
     def _parse_diff_line_numbers(self, diff_text: str) -> List[Tuple[int, int]]:
         """Parse diff text to extract line number ranges."""
         line_ranges = []
         
-        # Regular expression to match diff headers like @@ -1,4 +1,6 @@
-        hunk_pattern = r'@@\s*-(\d+)(?:,(\d+))?\s*\+(\d+)(?:,(\d+))?\s*@@'
+        # Regular expression to match diff headers like @@ -1,4 +1,6 @@; only at the start of a line,
+        # since hunk body lines begin with ' ', '+' or '-' and may contain header-like text
+        hunk_pattern = r'^@@\s*-(\d+)(?:,(\d+))?\s*\+(\d+)(?:,(\d+))?\s*@@'
         
-        for match in re.finditer(hunk_pattern, diff_text):
+        for match in re.finditer(hunk_pattern, diff_text, re.MULTILINE):
             old_start = int(match.group(1))
             old_count = int(match.group(2)) if match.group(2) else 1
             new_start = int(match.group(3))
@@ -151,26 +317,69 @@ class GitAnalyzer:
         
         return line_ranges
     
-    def analyze_dependencies(self, branch: str, target_commit_hash: str, start_date: datetime, end_date: datetime) -> List[Dict[str, Any]]:
-        """Analyze dependencies for a target commit by comparing file and line overlaps."""
+    def analyze_dependencies(self, branch: str, target_commit_hash: str, start_date: datetime, end_date: datetime,
+                             transitive: bool = False, track_lines: bool = False,
+                             progress: Optional[ProgressCallback] = None) -> DependencyAnalysis:
+        """
+        Analyze dependencies for a target commit by comparing file and line overlaps.
+        
+        The returned DependencyAnalysis also carries the commit list and target
+        changes so callers never need to walk or diff the history again. With
+        transitive=True it also holds the full dependency DAG of the target
+        (see build_dependency_graph), computed from the same diffs.
+        
+        With track_lines=True each candidate's changed lines are first carried
+        forward through every later commit in the window, following renames,
+        and compared with the lines the target changes in its parent, instead
+        of comparing raw hunk numbers from different snapshots.
+        
+        If given, progress(event, data) is called as the analysis advances:
+        'commits_listed' (total_commits), 'candidates' (candidates),
+        'commit_scanned' (scanned, total) and 'dependency_found' (dependency),
+        so callers can report progress and partial results.
+        """
         if not self.repo:
             self.repo = Repo(self.repo_path)
         
+        def report(event: str, **data) -> None:
+            if progress is not None:
+                progress(event, data)
+        
         dependencies = []
+        all_commits = []
+        target_changes = {}
+        target_commit = None
+        graph = None
+        prefilter_stats = None
+        earlier_commits = []
+        earlier_changes = {}
         
         try:
             # Get all commits in the date range
-            all_commits = self.get_commits_in_range(branch, start_date, end_date)
+            if self.backend == BACKEND_GIT_LOG:
+                all_commits, window_changes = self.get_commits_with_changes(branch, start_date, end_date)
+            else:
+                all_commits = self.get_commits_in_range(branch, start_date, end_date)
+                window_changes = {}
+            
+            report('commits_listed', total_commits=len(all_commits))
+            
+            def commit_file_changes(commit_hash: str) -> Dict[str, List[Tuple[int, int]]]:
+                if commit_hash in window_changes:
+                    return window_changes[commit_hash]
+                return self.get_commit_file_changes(commit_hash)
             
             # Get target commit changes
-            target_changes = self.get_commit_file_changes(target_commit_hash)
+            target_changes = commit_file_changes(target_commit_hash)
             
             if not target_changes:
                 logger.info(f"No file changes found for target commit {target_commit_hash}")
-                return dependencies
+                return DependencyAnalysis(all_commits, target_changes, dependencies)
+            
+            # Index the target's line ranges once and reuse it for every candidate
+            target_index = build_line_index(target_changes)
             
             # Find the target commit in the list
-            target_commit = None
             target_commit_date: Optional[datetime] = None
             for commit in all_commits:
                 if commit["full_hash"] == target_commit_hash or commit["hash"] == target_commit_hash:
@@ -180,71 +389,285 @@ class GitAnalyzer:
             
             if not target_commit:
                 logger.error(f"Target commit {target_commit_hash} not found in commit list")
-                return dependencies
+                return DependencyAnalysis(all_commits, target_changes, dependencies)
+            
+            # Only commits earlier than the target can be dependencies
+            candidates = [
+                commit for commit in all_commits
+                if datetime.strptime(commit["date"], "%Y-%m-%d %H:%M:%S") < target_commit_date
+            ]
+            
+            use_prefilter = self.backend == BACKEND_GITPYTHON and self.prefilter
+            name_status = {}
+            if use_prefilter or track_lines:
+                name_status = self.get_name_status(branch, start_date, end_date)
+            
+            # Drop commits that never touch a relevant path before diffing them
+            if use_prefilter:
+                candidates, prefilter_stats = self._prefilter_candidates(
+                    candidates, target_changes, name_status, transitive, track_lines
+                )
+            
+            report('candidates', candidates=len(candidates))
+            
+            # Diff every remaining candidate up front when a process pool is configured
+            if self.backend == BACKEND_GITPYTHON and self.workers > 1:
+                window_changes = self.get_commits_file_changes_parallel(
+                    [commit["full_hash"] for commit in candidates]
+                )
+            
+            tracked_changes = []
             
             # Check each earlier commit for dependencies
-            for commit in all_commits:
-                commit_date = datetime.strptime(commit["date"], "%Y-%m-%d %H:%M:%S")
+            for scanned, commit in enumerate(candidates, 1):
+                commit_changes = commit_file_changes(commit["full_hash"])
                 
-                # Only check commits that are earlier than the target commit
-                if target_commit_date is None or commit_date >= target_commit_date:
-                    continue
+                if transitive:
+                    earlier_commits.append(commit)
+                    earlier_changes[commit["full_hash"]] = commit_changes
                 
-                commit_changes = self.get_commit_file_changes(commit["full_hash"])
+                if track_lines:
+                    tracked_changes.append((commit, commit_changes))
+                else:
+                    # Check for file and line overlaps
+                    overlap_info = self._check_overlap(target_changes, commit_changes, target_index)
+                    
+                    if overlap_info["has_overlap"]:
+                        dependencies.append(self._make_dependency(commit, overlap_info))
+                        report('dependency_found', dependency=dependencies[-1])
                 
-                # Check for file and line overlaps
-                overlap_info = self._check_overlap(target_changes, commit_changes)
+                report('commit_scanned', scanned=scanned, total=len(candidates))
+            
+            if track_lines:
+                # Only the target's pre-image ranges share the parent's coordinates
+                target_parent_changes = {path: ranges[0::2] for path, ranges in target_changes.items()}
+                target_parent_index = build_line_index(target_parent_changes)
+                shifted_changes = self._track_line_shifts(tracked_changes, name_status)
                 
-                if overlap_info["has_overlap"]:
-                    dependencies.append({
-                        "hash": commit["hash"],
-                        "full_hash": commit["full_hash"],
-                        "author": commit["author"],
-                        "date": commit["date"],
-                        "message": commit["message"],
-                        "overlap_files": overlap_info["overlap_files"],
-                        "overlap_count": overlap_info["overlap_count"]
-                    })
+                for commit, _ in tracked_changes:
+                    overlap_info = self._check_overlap(
+                        target_parent_changes, shifted_changes.get(commit["full_hash"], {}), target_parent_index
+                    )
+                    if overlap_info["has_overlap"]:
+                        dependencies.append(self._make_dependency(commit, overlap_info))
+                        report('dependency_found', dependency=dependencies[-1])
             
             # Sort dependencies by date (newest first)
             dependencies.sort(key=lambda x: x["date"], reverse=True)
             
+            if transitive:
+                graph = self.build_dependency_graph(target_commit, target_changes, earlier_commits, earlier_changes)
+            
         except Exception as e:
             logger.error(f"Error analyzing dependencies: {str(e)}")
             raise
         
-        return dependencies
+        return DependencyAnalysis(all_commits, target_changes, dependencies, target_commit, graph, prefilter_stats)
+    
+    def get_name_status(self, branch: str, start_date: datetime, 
+                        end_date: datetime) -> Dict[str, List[Tuple[str, str, str]]]:
+        """Get the (status, a_path, b_path) entries of every commit in the date range."""
+        return dict(iter_name_status(self.repo_path, branch, start_date, end_date + timedelta(days=1)))
+    
+    def _prefilter_candidates(self, candidates: List[Dict[str, Any]], target_changes: Dict[str, List[Tuple[int, int]]],
+                              name_status: Dict[str, List[Tuple[str, str, str]]], transitive: bool,
+                              track_lines: bool) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """
+        Keep only candidate commits whose touched paths can overlap the target.
+        
+        Touched paths come from one `git log --name-status` over the window,
+        so no patch text is generated for the commits that are dropped. The
+        relevant path set is grown newest first: in transitive mode by every
+        kept commit's paths, so prerequisites reached through other files
+        survive, and with line tracking by the source of every rename.
+        """
+        relevant = set(target_changes)
+        kept = []
+        
+        for commit in candidates:
+            entries = name_status.get(commit["full_hash"])
+            if entries is None:
+                kept.append(commit)
+                continue
+            
+            paths = {path for _, a_path, b_path in entries for path in (a_path, b_path)}
+            if not paths & relevant:
+                continue
+            
+            kept.append(commit)
+            if transitive:
+                relevant |= paths
+            elif track_lines:
+                relevant.update(a_path for status, a_path, b_path in entries if status == 'R' and b_path in relevant)
+        
+        stats = {
+            "candidates": len(candidates),
+            "diffed": len(kept),
+            "skipped": len(candidates) - len(kept)
+        }
+        logger.info(f"Prefilter skipped {stats['skipped']} of {stats['candidates']} commits")
+        
+        return kept, stats
+    
+    def _track_line_shifts(self, tracked_changes: List[Tuple[Dict[str, Any], Dict[str, List[Tuple[int, int]]]]],
+                           name_status: Dict[str, List[Tuple[str, str, str]]]) -> Dict[str, Dict[str, List[Tuple[int, int]]]]:
+        """
+        Map every candidate's changed lines into the target parent's coordinates.
+        
+        tracked_changes is ordered newest first, as analyze_dependencies walks
+        candidates; the commits are replayed oldest first in a single pass.
+        """
+        tracker = LineShiftTracker()
+        
+        for commit, commit_changes in reversed(tracked_changes):
+            renames = [
+                (a_path, b_path) for status, a_path, b_path in name_status.get(commit["full_hash"], [])
+                if status == 'R'
+            ]
+            tracker.apply_commit(commit["full_hash"], commit_changes, renames)
+        
+        return tracker.changes_by_commit()
+    
+    def build_dependency_graph(self, target_commit: Dict[str, Any], target_changes: Dict[str, List[Tuple[int, int]]],
+                               earlier_commits: List[Dict[str, Any]],
+                               changes_by_hash: Dict[str, Dict[str, List[Tuple[int, int]]]],
+                               bucket_size: int = DEFAULT_LINE_BUCKET) -> Dict[str, Any]:
+        """
+        Build the transitive dependency DAG of the target commit.
+        
+        Commits are replayed oldest first into an inverted index of
+        (file, line bucket) -> commits, so each commit is only compared with
+        earlier commits that touched the same region of the same file. An edge
+        A -> B means A overlaps the earlier commit B, using the same rule as
+        the direct analysis.
+        
+        Returns a dictionary with the 'nodes' and 'edges' of the target's
+        closure and a 'cherry_pick_order' of full hashes, prerequisites first
+        and the target last.
+        """
+        target_hash = target_commit["full_hash"]
+        commits = sorted(earlier_commits, key=lambda x: x["date"]) + [target_commit]
+        changes = dict(changes_by_hash)
+        changes[target_hash] = target_changes
+        dates = {commit["full_hash"]: commit["date"] for commit in commits}
+        
+        bucket_index: Dict[Tuple[str, int], List[str]] = {}
+        edges: Dict[str, Dict[str, List[str]]] = {}
+        
+        for commit in commits:
+            full_hash = commit["full_hash"]
+            commit_edges: Dict[str, List[str]] = {}
+            
+            for file_path, ranges in changes.get(full_hash, {}).items():
+                if not ranges:
+                    continue
+                
+                file_index = LineRangeIndex(ranges)
+                buckets = self._line_buckets(ranges, bucket_size)
+                seen = set()
+                
+                for bucket in buckets:
+                    for other_hash in bucket_index.get((file_path, bucket), ()):
+                        if other_hash in seen:
+                            continue
+                        seen.add(other_hash)
+                        
+                        # Same-second commits are not ordered, as in the direct analysis
+                        if dates[other_hash] >= dates[full_hash]:
+                            continue
+                        
+                        if any(file_index.has_overlap(start, end) for start, end in changes[other_hash][file_path]):
+                            commit_edges.setdefault(other_hash, []).append(file_path)
+                
+                for bucket in buckets:
+                    bucket_index.setdefault((file_path, bucket), []).append(full_hash)
+            
+            edges[full_hash] = commit_edges
+        
+        # Walk the edges from the target to collect its closure
+        closure = {target_hash}
+        stack = [target_hash]
+        while stack:
+            for prerequisite in edges.get(stack.pop(), {}):
+                if prerequisite not in closure:
+                    closure.add(prerequisite)
+                    stack.append(prerequisite)
+        
+        # Edges always point to strictly older commits, so date order is topological
+        ordered = [commit for commit in commits if commit["full_hash"] in closure]
+        direct = set(edges.get(target_hash, {}))
+        
+        return {
+            "nodes": [{
+                "hash": commit["hash"],
+                "full_hash": commit["full_hash"],
+                "author": commit["author"],
+                "date": commit["date"],
+                "message": commit["message"],
+                "direct": commit["full_hash"] in direct,
+                "is_target": commit["full_hash"] == target_hash
+            } for commit in ordered],
+            "edges": [{
+                "from": full_hash,
+                "to": prerequisite,
+                "files": sorted(files)
+            } for full_hash in (commit["full_hash"] for commit in ordered)
+              for prerequisite, files in edges[full_hash].items()],
+            "cherry_pick_order": [commit["full_hash"] for commit in ordered],
+            "total_transitive": len(closure) - 1
+        }
+    
+    def _line_buckets(self, ranges: List[Tuple[int, int]], bucket_size: int) -> Set[int]:
+        """Return the line buckets touched by a list of ranges."""
+        buckets = set()
+        for start, end in ranges:
+            # A zero-length hunk (start, start - 1) sits between two lines
+            low, high = min(start, end), max(start, end)
+            buckets.update(range(low // bucket_size, high // bucket_size + 1))
+        return buckets
+    
+    def _make_dependency(self, commit: Dict[str, Any], overlap_info: Dict[str, Any]) -> Dict[str, Any]:
+        """Build the dependency entry for a commit that overlaps the target."""
+        return {
+            "hash": commit["hash"],
+            "full_hash": commit["full_hash"],
+            "author": commit["author"],
+            "date": commit["date"],
+            "message": commit["message"],
+            "overlap_files": overlap_info["overlap_files"],
+            "overlap_lines": overlap_info["overlap_lines"],
+            "overlap_count": overlap_info["overlap_count"]
+        }
     
     def _check_overlap(self, target_changes: Dict[str, List[Tuple[int, int]]], 
-                      commit_changes: Dict[str, List[Tuple[int, int]]]) -> Dict[str, Any]:
+                      commit_changes: Dict[str, List[Tuple[int, int]]],
+                      target_index: Optional[Dict[str, LineRangeIndex]] = None) -> Dict[str, Any]:
         """Check if there's any overlap between two sets of file changes."""
+        if target_index is None:
+            target_index = build_line_index(target_changes)
+        
+        commit_changes = CommitChanges.from_dict(commit_changes)
+        
         overlap_files = []
+        overlap_lines = {}
         overlap_count = 0
         
         # Check for file overlaps
-        common_files = set(target_changes.keys()) & set(commit_changes.keys())
-        
-        for file_path in common_files:
-            target_lines = target_changes[file_path]
-            commit_lines = commit_changes[file_path]
-            
-            # Check for line range overlaps
-            file_has_overlap = False
-            for target_start, target_end in target_lines:
-                for commit_start, commit_end in commit_lines:
-                    if self._ranges_overlap(target_start, target_end, commit_start, commit_end):
-                        file_has_overlap = True
-                        overlap_count += 1
-                        break
-                if file_has_overlap:
-                    break
+        common_files = [file_path for file_path in target_index if file_path in commit_changes]
+        
+        for file_path in sorted(common_files):
+            # Collect the exact line spans shared with the target commit
+            spans = commit_changes.overlap_spans(file_path, target_index[file_path])
             
-            if file_has_overlap:
+            if spans:
+                overlap_count += 1
                 overlap_files.append(file_path)
+                overlap_lines[file_path] = merge_spans(spans)
         
         return {
             "has_overlap": len(overlap_files) > 0,
             "overlap_files": overlap_files,
+            "overlap_lines": overlap_lines,
             "overlap_count": overlap_count
         }
     
@@ -0,0 +1,290 @@
+import re
+import codecs
+import logging
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Tuple, Any, Iterator, Optional, IO
+
+logger = logging.getLogger(__name__)
+
+# Each commit header is framed by NUL bytes so multi-line messages parse safely
+LOG_FORMAT = '%x00%H%x1f%P%x1f%ct%x1f%an%x1f%B%x00'
+
+HUNK_HEADER = re.compile(rb'^@@\s*-(\d+)(?:,(\d+))?\s*\+(\d+)(?:,(\d+))?\s*@@')
+
+CommitChanges = Dict[str, List[Tuple[int, int]]]
+
+
+def _unquote_path(raw: bytes) -> str:
+    """Decode a path as printed by git, undoing C-style quoting if present."""
+    raw = raw.rstrip(b'\t\r\n')
+    if raw.startswith(b'"') and raw.endswith(b'"'):
+        raw = codecs.escape_decode(raw[1:-1])[0]
+    return raw.decode('utf-8', errors='replace')
+
+
+def _strip_prefix(path: str) -> Optional[str]:
+    """Strip the a/ or b/ prefix from a diff path, returning None for /dev/null."""
+    if path == '/dev/null':
+        return None
+    if path.startswith(('a/', 'b/')):
+        return path[2:]
+    return path
+
+
+def _paths_from_diff_header(header: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """Split a 'diff --git a/X b/Y' header into its two paths."""
+    rest = header[len(b'diff --git '):].rstrip(b'\r\n')
+
+    if rest.startswith(b'"'):
+        end = rest.index(b'"', 1)
+        while rest[end - 1:end] == b'\\':
+            end = rest.index(b'"', end + 1)
+        return _strip_prefix(_unquote_path(rest[:end + 1])), _strip_prefix(_unquote_path(rest[end + 2:]))
+
+    # Unrenamed paths print the same name twice, which disambiguates spaces
+    if len(rest) % 2 == 1:
+        half = len(rest) // 2
+        left, right = rest[:half], rest[half + 1:]
+        if left[2:] == right[2:]:
+            return _strip_prefix(_unquote_path(left)), _strip_prefix(_unquote_path(right))
+
+    left, _, right = rest.partition(b' b/')
+    return _strip_prefix(_unquote_path(left)), _strip_prefix(_unquote_path(b'b/' + right))
+
+
+class _FileDiff:
+    """Paths and hunk line ranges collected for one file of a commit."""
+
+    __slots__ = ('a_path', 'b_path', 'ranges')
+
+    def __init__(self, a_path: Optional[str], b_path: Optional[str]):
+        self.a_path = a_path
+        self.b_path = b_path
+        self.ranges: List[Tuple[int, int]] = []
+
+    def add_to(self, changes: CommitChanges) -> None:
+        """Record this file under both of its paths, like GitAnalyzer.get_commit_file_changes."""
+        if self.a_path:
+            changes.setdefault(self.a_path, []).extend(self.ranges)
+        if self.b_path and self.b_path != self.a_path:
+            changes.setdefault(self.b_path, []).extend(self.ranges)
+
+
+def _parse_commit_header(header: bytes) -> Dict[str, Any]:
+    """Turn a NUL-framed LOG_FORMAT header into a commit info dictionary."""
+    fields = header[1:header.index(b'\x00', 1)].split(b'\x1f', 4)
+    full_hash, parents, timestamp, author, message = (f.decode('utf-8', errors='replace') for f in fields)
+    commit_date = datetime.fromtimestamp(int(timestamp))
+
+    return {
+        "hash": full_hash[:8],
+        "full_hash": full_hash,
+        "author": author,
+        "date": commit_date.strftime("%Y-%m-%d %H:%M:%S"),
+        "message": message.strip(),
+        "parents": parents.split()
+    }
+
+
+def parse_git_log_stream(stream: IO[bytes]) -> Iterator[Tuple[Dict[str, Any], CommitChanges]]:
+    """
+    Incrementally parse `git log -p` output produced with LOG_FORMAT.
+
+    Yields (commit_info, changes) per commit, where commit_info matches the
+    dictionaries returned by GitAnalyzer.get_commits_in_range (plus a
+    'parents' list) and changes maps each touched path to its hunk ranges.
+    """
+    header: Optional[bytes] = None
+    commit_info: Optional[Dict[str, Any]] = None
+    changes: CommitChanges = {}
+    current: Optional[_FileDiff] = None
+    old_left = new_left = 0
+
+    for line in stream:
+        # Inside a hunk body every line is content, even if it looks like a header
+        if old_left > 0 or new_left > 0:
+            marker = line[:1]
+            if marker == b' ':
+                old_left -= 1
+                new_left -= 1
+                continue
+            if marker == b'-':
+                old_left -= 1
+                continue
+            if marker == b'+':
+                new_left -= 1
+                continue
+            if marker == b'\\':
+                continue
+            old_left = new_left = 0
+
+        if header is not None:
+            header += line
+            if b'\x00' in header[1:]:
+                commit_info = _parse_commit_header(header)
+                header = None
+            continue
+
+        if line.startswith(b'\x00'):
+            if commit_info is not None:
+                if current is not None:
+                    current.add_to(changes)
+                yield commit_info, changes
+            commit_info = None
+            changes = {}
+            current = None
+            if b'\x00' in line[1:]:
+                commit_info = _parse_commit_header(line)
+            else:
+                header = line
+            continue
+
+        if commit_info is None:
+            continue
+
+        if line.startswith(b'diff --git '):
+            if current is not None:
+                current.add_to(changes)
+            current = _FileDiff(*_paths_from_diff_header(line))
+        elif current is None:
+            continue
+        elif line.startswith(b'@@'):
+            match = HUNK_HEADER.match(line)
+            if match:
+                old_start = int(match.group(1))
+                old_count = int(match.group(2)) if match.group(2) else 1
+                new_start = int(match.group(3))
+                new_count = int(match.group(4)) if match.group(4) else 1
+                current.ranges.append((old_start, old_start + old_count - 1))
+                current.ranges.append((new_start, new_start + new_count - 1))
+                old_left, new_left = old_count, new_count
+        elif line.startswith((b'rename from ', b'copy from ')):
+            current.a_path = _unquote_path(line.split(b' ', 2)[2])
+        elif line.startswith((b'rename to ', b'copy to ')):
+            current.b_path = _unquote_path(line.split(b' ', 2)[2])
+        elif line.startswith(b'--- '):
+            path = _strip_prefix(_unquote_path(line[4:]))
+            if path:
+                current.a_path = path
+        elif line.startswith(b'+++ '):
+            path = _strip_prefix(_unquote_path(line[4:]))
+            if path:
+                current.b_path = path
+
+    if commit_info is not None:
+        if current is not None:
+            current.add_to(changes)
+        yield commit_info, changes
+
+
+@contextmanager
+def _git_output(cmd: List[str], repo_path: str) -> Iterator[IO[bytes]]:
+    """
+    Run a git command and yield its stdout for streaming.
+
+    stderr goes to a temporary file rather than a pipe: git writes warnings
+    while stdout is still being read, and a full stderr pipe nobody drains
+    would block it. A failed command raises with its stderr once the output
+    has been read to the end.
+    """
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, cwd=repo_path, stdout=subprocess.PIPE, stderr=stderr)
+        try:
+            yield process.stdout
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+
+        if returncode != 0:
+            stderr.seek(0)
+            raise Exception(f"git log failed: {stderr.read().decode('utf-8', errors='replace').strip()}")
+
+
+def iter_git_log(repo_path: str, rev: str, since: datetime, until: datetime,
+                 context_lines: int = 3) -> Iterator[Tuple[Dict[str, Any], CommitChanges]]:
+    """
+    Stream commit metadata and per-file hunk ranges with a single `git log -p`.
+
+    Merge commits are diffed against their first parent and renames are
+    detected, matching the GitPython diff used by GitAnalyzer.
+    """
+    cmd = [
+        'git', '-c', 'core.quotepath=off', 'log',
+        f'--format={LOG_FORMAT}',
+        '-p', f'-U{context_lines}', '-M',
+        '--diff-merges=first-parent',
+        '--no-color', '--no-ext-diff', '--no-textconv',
+        f'--since={since}', f'--until={until}',
+        rev, '--'
+    ]
+
+    with _git_output(cmd, repo_path) as stdout:
+        yield from parse_git_log_stream(stdout)
+
+
+def _read_nul_tokens(stream: IO[bytes], chunk_size: int = 65536) -> Iterator[bytes]:
+    """Yield NUL-separated tokens from a binary stream without reading it all at once."""
+    pending = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        tokens = (pending + chunk).split(b'\x00')
+        pending = tokens.pop()
+        yield from tokens
+    if pending:
+        yield pending
+
+
+def iter_name_status(repo_path: str, rev: str, since: datetime,
+                     until: datetime) -> Iterator[Tuple[str, List[Tuple[str, str, str]]]]:
+    """
+    Stream the files each commit touches, without generating any patch text.
+
+    Yields (full_hash, entries) using `git log --name-status -z` with the
+    same rename detection and first-parent merge diffs as iter_git_log. Each
+    entry is (status, a_path, b_path); a_path and b_path only differ for
+    renames, and together they match the keys of
+    GitAnalyzer.get_commit_file_changes.
+    """
+    cmd = [
+        'git', 'log', '--format=%x01%H',
+        '--name-status', '-z', '-M',
+        '--diff-merges=first-parent',
+        '--no-color', '--no-ext-diff',
+        f'--since={since}', f'--until={until}',
+        rev, '--'
+    ]
+
+    with _git_output(cmd, repo_path) as stdout:
+        full_hash: Optional[str] = None
+        entries: List[Tuple[str, str, str]] = []
+        status = ''
+        paths: List[str] = []
+        expected_paths = 0
+
+        for token in _read_nul_tokens(stdout):
+            if expected_paths:
+                paths.append(token.decode('utf-8', errors='replace'))
+                expected_paths -= 1
+                if not expected_paths:
+                    entries.append((status, paths[0], paths[-1]))
+                continue
+
+            token = token.lstrip(b'\n')
+            if token.startswith(b'\x01'):
+                if full_hash is not None:
+                    yield full_hash, entries
+                full_hash = token[1:].decode('ascii')
+                entries = []
+            elif token:
+                # Renames and copies list both the old and the new path
+                status = token[:1].decode('ascii')
+                paths = []
+                expected_paths = 2 if status in ('R', 'C') else 1
+
+        if full_hash is not None:
+            yield full_hash, entries
@@ -0,0 +1,279 @@
+import os
+import re
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+import subprocess
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Union
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows has no flock; fall back to thread locks
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIRROR_DIR = os.environ.get('GIT_MIRROR_DIR', os.path.join('.cache', 'git-mirrors'))
+DEFAULT_MAX_BYTES = int(os.environ.get('GIT_MIRROR_MAX_BYTES', str(5 * 1024 ** 3)))
+
+# Receives (phase, percent) notifications; percent is None when unknown
+GitProgressCallback = Callable[[str, Optional[int]], None]
+
+GIT_PROGRESS_LINE = re.compile(r'^(?:remote: )?([A-Za-z ]+):\s+(\d+)%')
+FULL_SHA = re.compile(r'^[0-9a-fA-F]{40}$')
+
+
+def run_git_with_progress(cmd: List[str], progress: Optional[GitProgressCallback] = None,
+                          cwd: Optional[str] = None) -> None:
+    """Run a git command with --progress output, reporting each phase and percentage."""
+    process = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    stderr_lines = []
+    last_reported = None
+    buffer = b''
+
+    while True:
+        chunk = process.stderr.read1(4096)
+        if not chunk:
+            break
+        buffer += chunk
+        # git redraws progress lines in place with carriage returns
+        *lines, buffer = re.split(rb'[\r\n]', buffer)
+        for raw_line in lines:
+            line = raw_line.decode('utf-8', errors='replace').strip()
+            if not line:
+                continue
+            match = GIT_PROGRESS_LINE.match(line)
+            if match:
+                phase, percent = match.group(1).strip(), int(match.group(2))
+                if progress is not None and (phase, percent) != last_reported:
+                    last_reported = (phase, percent)
+                    progress(phase, percent)
+            else:
+                stderr_lines.append(line)
+
+    if buffer.strip():
+        stderr_lines.append(buffer.decode('utf-8', errors='replace').strip())
+
+    returncode = process.wait()
+    process.stderr.close()
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, cmd, stderr='\n'.join(stderr_lines))
+
+
+def normalize_repo_url(repo_url: str) -> str:
+    """
+    Canonical form of a repository location, so equivalent URLs share a mirror.
+
+    Scheme and host are lower-cased, credentials, trailing slashes and a
+    trailing '.git' are dropped, and local paths are made absolute.
+    """
+    url = repo_url.strip()
+
+    if '://' in url:
+        parts = urlsplit(url)
+        if parts.scheme.lower() == 'file':
+            # file:///srv/repo and /srv/repo are the same repository
+            url = os.path.normpath(parts.path)
+        else:
+            host = (parts.hostname or '').lower()
+            if parts.port:
+                host = f'{host}:{parts.port}'
+            url = urlunsplit((parts.scheme.lower(), host, parts.path.rstrip('/'), '', ''))
+    elif re.match(r'^(?:[^@/]+@)?[^/:]+:', url) and not os.path.exists(url):
+        # scp-like syntax: [user@]host:path
+        host, _, path = url.partition(':')
+        url = f'{host.rpartition("@")[2].lower()}:{path.rstrip("/")}'
+    else:
+        url = os.path.abspath(os.path.expanduser(url))
+
+    if url.endswith('.git'):
+        url = url[:-4]
+    return url.rstrip('/')
+
+
+class GitMirrorPool:
+    """
+    Bare mirrors of remote repositories, shared by every patch request.
+
+    Each repository is cloned once with `git clone --mirror` and only
+    fetched again when a requested commit is missing. Access to a mirror is
+    serialized per repository (threads and, where flock exists, processes),
+    and the least recently used mirrors are deleted once the pool exceeds
+    max_bytes on disk.
+    """
+
+    def __init__(self, mirror_dir: str = DEFAULT_MIRROR_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.mirror_dir = mirror_dir
+        self.max_bytes = max_bytes
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+        os.makedirs(mirror_dir, exist_ok=True)
+
+    def _key(self, repo_url: str) -> str:
+        return hashlib.sha1(normalize_repo_url(repo_url).encode('utf-8')).hexdigest()[:20]
+
+    def mirror_path(self, repo_url: str) -> str:
+        return os.path.join(self.mirror_dir, f'{self._key(repo_url)}.git')
+
+    @contextmanager
+    def _repo_lock(self, key: str, blocking: bool = True) -> Iterator[bool]:
+        """Hold the per-repository lock; yields False if blocking=False and it is busy."""
+        with self._locks_guard:
+            thread_lock = self._locks.setdefault(key, threading.Lock())
+
+        if not thread_lock.acquire(blocking):
+            yield False
+            return
+
+        try:
+            if fcntl is None:
+                yield True
+                return
+
+            with open(os.path.join(self.mirror_dir, f'{key}.lock'), 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+                except BlockingIOError:
+                    yield False
+                    return
+                try:
+                    yield True
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+        finally:
+            thread_lock.release()
+
+    @staticmethod
+    def _has_commit(mirror_path: str, commit_hash: str) -> bool:
+        result = subprocess.run(
+            ['git', 'cat-file', '-e', f'{commit_hash}^{{commit}}'],
+            cwd=mirror_path, capture_output=True
+        )
+        return result.returncode == 0
+
+    def _clone(self, repo_url: str, mirror_path: str, progress: Optional[GitProgressCallback]) -> None:
+        # Clone next to the final location and rename, so a failed clone never looks usable
+        temp_path = tempfile.mkdtemp(prefix='.cloning-', dir=self.mirror_dir)
+        try:
+            logger.info(f"Creating mirror of {repo_url}")
+            run_git_with_progress(['git', 'clone', '--mirror', '--progress', '--', repo_url, temp_path], progress)
+            os.rename(temp_path, mirror_path)
+        except Exception:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+    def _fetch(self, mirror_path: str, commit_hashes: List[str], progress: Optional[GitProgressCallback]) -> None:
+        logger.info(f"Fetching {mirror_path} for missing commit(s) {', '.join(commit_hashes)}")
+        run_git_with_progress(['git', 'fetch', '--prune', '--progress', 'origin'], progress, cwd=mirror_path)
+
+        # Commits no ref points at can still be fetched by full SHA from most servers
+        by_sha = [commit_hash for commit_hash in commit_hashes
+                  if FULL_SHA.match(commit_hash) and not self._has_commit(mirror_path, commit_hash)]
+        if by_sha:
+            try:
+                run_git_with_progress(['git', 'fetch', '--progress', 'origin'] + by_sha, progress, cwd=mirror_path)
+            except subprocess.CalledProcessError as e:
+                logger.warning(f"Fetching {', '.join(by_sha)} by SHA failed: {e.stderr}")
+
+    @contextmanager
+    def checkout(self, repo_url: str, commit_hashes: Union[str, Sequence[str]],
+                 progress: Optional[GitProgressCallback] = None) -> Iterator[str]:
+        """
+        Yield the path of a mirror of repo_url that contains commit_hashes
+        (one commit or a sequence of them).
+
+        The repository lock is held until the block exits, so the mirror is
+        neither fetched into nor evicted while the caller reads from it.
+        """
+        if isinstance(commit_hashes, str):
+            commit_hashes = [commit_hashes]
+        commit_hashes = list(dict.fromkeys(commit_hashes))
+        for commit_hash in commit_hashes:
+            if not commit_hash or commit_hash.startswith('-'):
+                raise ValueError(f'Invalid commit: {commit_hash!r}')
+
+        key = self._key(repo_url)
+        mirror_path = self.mirror_path(repo_url)
+        changed = False
+
+        with self._repo_lock(key):
+            if not os.path.isdir(mirror_path):
+                if progress is not None:
+                    progress('Cloning', None)
+                self._clone(repo_url, mirror_path, progress)
+                changed = True
+            else:
+                missing = [c for c in commit_hashes if not self._has_commit(mirror_path, c)]
+                if missing:
+                    if progress is not None:
+                        progress('Fetching', None)
+                    self._fetch(mirror_path, missing, progress)
+                    changed = True
+
+            missing = [c for c in commit_hashes if not self._has_commit(mirror_path, c)]
+            if missing:
+                raise ValueError(f'Commit {", ".join(missing)} not found in {repo_url}')
+
+            # The directory mtime records when the mirror was last used
+            os.utime(mirror_path)
+            yield mirror_path
+
+        if changed:
+            self.evict(keep=mirror_path)
+
+    @staticmethod
+    def _disk_usage(path: str) -> int:
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.lstat(os.path.join(root, name)).st_size
+                except OSError:
+                    continue
+        return total
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Delete least recently used mirrors until the pool fits in max_bytes. Returns removed paths."""
+        mirrors = []
+        for name in os.listdir(self.mirror_dir):
+            path = os.path.join(self.mirror_dir, name)
+            if name.endswith('.git') and os.path.isdir(path):
+                mirrors.append((os.stat(path).st_mtime, path, self._disk_usage(path)))
+
+        total = sum(size for _, _, size in mirrors)
+        removed = []
+
+        for _, path, size in sorted(mirrors):
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+
+            key = os.path.basename(path)[:-len('.git')]
+            with self._repo_lock(key, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                shutil.rmtree(path, ignore_errors=True)
+
+            total -= size
+            removed.append(path)
+            logger.info(f"Evicted mirror {path} ({size} bytes)")
+
+        return removed
+
+
+_default_pool: Optional[GitMirrorPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def get_mirror_pool() -> GitMirrorPool:
+    """Return the process-wide mirror pool used for patch generation."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = GitMirrorPool()
+        return _default_pool
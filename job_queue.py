@@ -0,0 +1,190 @@
+import os
+import json
+import socket
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '4'))
+
+# Minimum seconds between progress writes, so chatty jobs don't hammer the database
+PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL', '0.5'))
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+ACTIVE_STATUSES = (JOB_QUEUED, JOB_RUNNING)
+
+# Distinguishes this process from an earlier one that had the same pid
+_PROCESS_TOKEN = uuid.uuid4().hex[:8]
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    In-process runner for long stage actions, backed by a persistent jobs table.
+
+    Work runs on a thread pool inside an application context; every state
+    change is committed to the jobs table so any web worker can report it.
+    A job function is called as func(progress, *args), where
+    progress(percent, message, details) records how far it got plus an
+    optional JSON-serializable snapshot of partial results, and returns a
+    JSON-serializable result.
+    """
+
+    def __init__(self, app, db, job_model, max_workers: int = DEFAULT_JOB_WORKERS):
+        self.app = app
+        self.db = db
+        self.job_model = job_model
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def worker_id() -> str:
+        """Identify the current process, so interrupted jobs can be told apart from running ones."""
+        return f'{socket.gethostname()}:{os.getpid()}:{_PROCESS_TOKEN}'
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Created on first use so forked web workers each get their own threads
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+            return self._executor
+
+    def submit(self, feature_id: int, stage_name: str, action: str, func: Callable[..., Any], *args) -> str:
+        """Record a queued job and schedule func on the pool. Returns the job id."""
+        job = self.job_model(
+            feature_id=feature_id,
+            stage_name=stage_name,
+            action=action,
+            status=JOB_QUEUED,
+            progress=0,
+            message='Queued',
+            worker=self.worker_id()
+        )
+        self.db.session.add(job)
+        self.db.session.commit()
+        job_id = job.id
+
+        self._get_executor().submit(self._run, job_id, func, args)
+        logger.info(f"Queued job {job_id} ({action}) for feature {feature_id}")
+        return job_id
+
+    def _update(self, job_id: str, **fields) -> None:
+        fields['updated_at'] = datetime.utcnow()
+        self.job_model.query.filter_by(id=job_id).update(fields)
+        self.db.session.commit()
+
+    def _run(self, job_id: str, func: Callable[..., Any], args: tuple) -> None:
+        with self.app.app_context():
+            try:
+                self._update(job_id, status=JOB_RUNNING, started_at=datetime.utcnow(), message='Running')
+
+                last_write = 0.0
+                pending: Dict[str, Any] = {}
+
+                def progress(percent: int, message: Optional[str] = None,
+                             details: Optional[Dict[str, Any]] = None) -> None:
+                    nonlocal last_write
+                    pending['progress'] = max(0, min(100, int(percent)))
+                    pending['message'] = message
+                    if details is not None:
+                        pending['details'] = json.dumps(details)
+
+                    now = time.monotonic()
+                    if now - last_write >= PROGRESS_INTERVAL:
+                        last_write = now
+                        self._update(job_id, **pending)
+                        pending.clear()
+
+                result = func(progress, *args)
+
+                # Keep the last partial-results snapshot even if it was throttled
+                final_details = {'details': pending['details']} if 'details' in pending else {}
+                self._update(
+                    job_id,
+                    status=JOB_SUCCEEDED,
+                    progress=100,
+                    message='Completed',
+                    result=json.dumps(result),
+                    finished_at=datetime.utcnow(),
+                    **final_details
+                )
+                logger.info(f"Job {job_id} completed")
+            except Exception as e:
+                logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+                self.db.session.rollback()
+                try:
+                    self._update(job_id, status=JOB_FAILED, message='Failed', error=str(e),
+                                 finished_at=datetime.utcnow())
+                except Exception as update_error:
+                    logger.error(f"Could not record failure of job {job_id}: {str(update_error)}")
+                    self.db.session.rollback()
+
+    def active_job(self, feature_id: int, stage_name: str):
+        """Return the queued or running job for a feature stage, if any."""
+        return (self.job_model.query
+                .filter_by(feature_id=feature_id, stage_name=stage_name)
+                .filter(self.job_model.status.in_(ACTIVE_STATUSES))
+                .order_by(self.job_model.created_at.desc())
+                .first())
+
+    def has_active(self, stage_name: str) -> bool:
+        """Whether any feature has a queued or running job for this stage."""
+        return (self.job_model.query
+                .filter_by(stage_name=stage_name)
+                .filter(self.job_model.status.in_(ACTIVE_STATUSES))
+                .first()) is not None
+
+    def latest_job(self, feature_id: int, stage_name: str):
+        """Return the most recently created job for a feature stage, if any."""
+        return (self.job_model.query
+                .filter_by(feature_id=feature_id, stage_name=stage_name)
+                .order_by(self.job_model.created_at.desc())
+                .first())
+
+    def recover_interrupted(self) -> int:
+        """
+        Fail jobs left queued or running by a process on this host that no
+        longer exists (e.g. after a restart). Returns how many were updated.
+        """
+        hostname = socket.gethostname()
+        recovered = 0
+
+        for job in self.job_model.query.filter(self.job_model.status.in_(ACTIVE_STATUSES)).all():
+            host, _, rest = (job.worker or '').partition(':')
+            pid, _, token = rest.partition(':')
+            if host != hostname or not pid.isdigit():
+                continue
+            if int(pid) == os.getpid():
+                if token == _PROCESS_TOKEN:
+                    continue
+            elif _pid_alive(int(pid)):
+                continue
+            job.status = JOB_FAILED
+            job.message = 'Failed'
+            job.error = 'Interrupted: the server process running this job stopped before it finished'
+            job.finished_at = datetime.utcnow()
+            recovered += 1
+
+        if recovered:
+            self.db.session.commit()
+            logger.warning(f"Marked {recovered} interrupted job(s) as failed")
+        return recovered
@@ -0,0 +1,109 @@
+from bisect import bisect_left, bisect_right
+from typing import Dict, Iterable, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy ships with pandas
+    np = None
+
+
+class LineRangeIndex:
+    """Sorted interval index over the changed line ranges of a single file."""
+
+    __slots__ = ('starts', 'ends', 'points', '_arrays')
+
+    def __init__(self, ranges: Iterable[Tuple[int, int]]):
+        """
+        Build the index from inclusive (start, end) line ranges.
+
+        Overlapping ranges are merged into disjoint sorted intervals so a query
+        only visits the intervals it actually intersects. Zero-length hunks
+        (e.g. ``@@ -10,0 +11,2 @@`` yields ``(10, 9)``) are kept separately as
+        insertion points between two lines.
+        """
+        self.starts: List[int] = []
+        self.ends: List[int] = []
+        self.points: List[int] = []
+
+        for start, end in sorted(ranges):
+            if start > end:
+                self.points.append(start)
+            elif self.ends and start <= self.ends[-1]:
+                self.ends[-1] = max(self.ends[-1], end)
+            else:
+                self.starts.append(start)
+                self.ends.append(end)
+
+        self.points.sort()
+        self._arrays = None
+
+    def __len__(self) -> int:
+        return len(self.starts) + len(self.points)
+
+    def overlaps(self, start: int, end: int) -> List[Tuple[int, int]]:
+        """Return the line spans where (start, end) overlaps indexed ranges."""
+        spans = []
+
+        # Intervals are disjoint and sorted, so ends are sorted too: skip every
+        # interval that finishes before the query starts, then walk forward.
+        i = bisect_left(self.ends, start)
+        while i < len(self.starts) and self.starts[i] <= end:
+            lo = max(start, self.starts[i])
+            hi = min(end, self.ends[i])
+            spans.append((lo, hi) if lo <= hi else (hi, lo))
+            i += 1
+
+        # An insertion point p sits between lines p - 1 and p.
+        if start <= end:
+            lo = bisect_right(self.points, start)
+            hi = bisect_right(self.points, end)
+            for point in self.points[lo:hi]:
+                spans.append((point - 1, point))
+
+        return spans
+
+    def has_overlap(self, start: int, end: int) -> bool:
+        """Check whether (start, end) overlaps any indexed range."""
+        i = bisect_left(self.ends, start)
+        if i < len(self.starts) and self.starts[i] <= end:
+            return True
+        if start <= end:
+            return bisect_right(self.points, end) > bisect_right(self.points, start)
+        return False
+
+    def overlap_mask(self, starts, ends):
+        """
+        Vectorized has_overlap: return a boolean NumPy array telling which of
+        the ranges (starts[i], ends[i]) overlap any indexed range.
+        """
+        if self._arrays is None:
+            self._arrays = (np.array(self.starts, dtype=np.int64),
+                            np.array(self.ends, dtype=np.int64),
+                            np.array(self.points, dtype=np.int64))
+        index_starts, index_ends, points = self._arrays
+
+        hits = np.zeros(len(starts), dtype=bool)
+        if len(index_starts):
+            i = np.searchsorted(index_ends, starts, side='left')
+            candidate_starts = index_starts[np.minimum(i, len(index_starts) - 1)]
+            hits |= (i < len(index_starts)) & (candidate_starts <= ends)
+        if len(points):
+            between = np.searchsorted(points, ends, side='right') > np.searchsorted(points, starts, side='right')
+            hits |= (starts <= ends) & between
+        return hits
+
+
+def build_line_index(file_changes: Dict[str, List[Tuple[int, int]]]) -> Dict[str, LineRangeIndex]:
+    """Build a per-file LineRangeIndex for a commit's file changes."""
+    return {file_path: LineRangeIndex(ranges) for file_path, ranges in file_changes.items()}
+
+
+def merge_spans(spans: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """Merge overlapping or adjacent inclusive spans into a sorted list."""
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
@@ -0,0 +1,108 @@
+from bisect import bisect_left
+from typing import Dict, List, Tuple, Optional
+
+
+def _hunk_bounds(start: int, end: int) -> Tuple[int, int]:
+    """
+    Convert a parsed hunk range into inclusive line bounds.
+
+    _parse_diff_line_numbers turns a zero-length side such as ``-10,0``
+    (insertion after line 10) into ``(10, 9)``; here it becomes the empty
+    span ``(11, 10)`` so that every line after the insertion point compares
+    as lying past the hunk.
+    """
+    if end < start:
+        return start + 1, start
+    return start, end
+
+
+class HunkMap:
+    """Maps line numbers from a commit's parent to the commit itself for one file."""
+
+    __slots__ = ('old_lo', 'old_hi', 'new_lo', 'new_hi')
+
+    def __init__(self, ranges: List[Tuple[int, int]]):
+        """Build the map from alternating (old, new) ranges as stored per file."""
+        self.old_lo: List[int] = []
+        self.old_hi: List[int] = []
+        self.new_lo: List[int] = []
+        self.new_hi: List[int] = []
+
+        for i in range(0, len(ranges) - 1, 2):
+            old_lo, old_hi = _hunk_bounds(*ranges[i])
+            new_lo, new_hi = _hunk_bounds(*ranges[i + 1])
+            self.old_lo.append(old_lo)
+            self.old_hi.append(old_hi)
+            self.new_lo.append(new_lo)
+            self.new_hi.append(new_hi)
+
+    def new_ranges(self) -> List[Tuple[int, int]]:
+        """Return the non-empty ranges this commit wrote in its own coordinates."""
+        return [(lo, hi) for lo, hi in zip(self.new_lo, self.new_hi) if lo <= hi]
+
+    def map_line(self, line: int, upper: bool) -> int:
+        """Map one line; lines inside a hunk map to the hunk's low or high edge."""
+        # Hunks entirely above the line shift it by their cumulative delta
+        i = bisect_left(self.old_hi, line)
+        if i < len(self.old_lo) and self.old_lo[i] <= line:
+            return self.new_hi[i] if upper else self.new_lo[i]
+        if i == 0:
+            return line
+        return line + self.new_hi[i - 1] - self.old_hi[i - 1]
+
+    def map_range(self, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """Map a range, returning None when all of its lines were removed."""
+        lo = self.map_line(start, upper=False)
+        hi = self.map_line(end, upper=True)
+        return (lo, hi) if lo <= hi else None
+
+
+class LineShiftTracker:
+    """
+    Carries changed line ranges forward through history to a common snapshot.
+
+    Commits are applied oldest first. Each one shifts the ranges recorded so
+    far for the files it touches, moves them across renames and then records
+    its own ranges, so after the last commit every range is expressed in
+    that commit's coordinates. Each commit is applied exactly once.
+    """
+
+    def __init__(self):
+        # path -> [(commit_hash, start, end), ...] in current coordinates
+        self.live: Dict[str, List[Tuple[str, int, int]]] = {}
+
+    def apply_commit(self, commit_hash: str, changes: Dict[str, List[Tuple[int, int]]],
+                     renames: Optional[List[Tuple[str, str]]] = None) -> None:
+        """Advance all tracked ranges through one commit and record its own changes."""
+        handled = set()
+
+        for old_path, new_path in renames or []:
+            ranges = changes.get(new_path, changes.get(old_path, []))
+            self._apply_file(commit_hash, old_path, new_path, ranges)
+            handled.update((old_path, new_path))
+
+        for file_path, ranges in changes.items():
+            if file_path not in handled:
+                self._apply_file(commit_hash, file_path, file_path, ranges)
+
+    def _apply_file(self, commit_hash: str, old_path: str, new_path: str,
+                    ranges: List[Tuple[int, int]]) -> None:
+        hunk_map = HunkMap(ranges)
+        shifted = []
+
+        for owner, start, end in self.live.pop(old_path, []):
+            mapped = hunk_map.map_range(start, end)
+            if mapped:
+                shifted.append((owner, mapped[0], mapped[1]))
+
+        shifted.extend((commit_hash, start, end) for start, end in hunk_map.new_ranges())
+        if shifted:
+            self.live[new_path] = shifted
+
+    def changes_by_commit(self) -> Dict[str, Dict[str, List[Tuple[int, int]]]]:
+        """Return every commit's surviving ranges keyed by current path."""
+        result: Dict[str, Dict[str, List[Tuple[int, int]]]] = {}
+        for file_path, entries in self.live.items():
+            for owner, start, end in entries:
+                result.setdefault(owner, {}).setdefault(file_path, []).append((start, end))
+        return result
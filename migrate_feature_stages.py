@@ -0,0 +1,51 @@
+"""
+Database migration script to move each feature's stage_data JSON into the feature_stages table
+Run this script once to migrate existing database
+"""
+
+from app import app, db, Feature, FeatureStage
+import json
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+def migrate():
+    with app.app_context():
+        try:
+            logging.info("Starting database migration for feature stages...")
+            
+            logging.info("Creating tables (feature_stages if not exists)...")
+            db.create_all()
+            
+            moved = 0
+            for feature in Feature.query.all():
+                try:
+                    stage_data = json.loads(feature.stage_data or '{}')
+                except ValueError as e:
+                    logging.warning(f"Skipping feature {feature.id}: stage_data is not valid JSON ({str(e)})")
+                    continue
+                
+                if not stage_data:
+                    continue
+                
+                for stage_name, data in stage_data.items():
+                    # A row written by the new code is newer than the blob
+                    if db.session.get(FeatureStage, (feature.id, stage_name)) is None:
+                        db.session.add(FeatureStage(feature_id=feature.id, stage_name=stage_name,
+                                                    data=json.dumps(data), updated_at=feature.updated_at))
+                        moved += 1
+                
+                # Plain SQL, so the feature's updated_at (and its place in the feature list) is unchanged
+                db.session.execute(db.text("UPDATE features SET stage_data = '{}' WHERE id = :id"), {'id': feature.id})
+                logging.info(f"Moved {len(stage_data)} stage(s) of feature {feature.id}")
+            
+            db.session.commit()
+            logging.info(f"Migration completed successfully! {moved} stage row(s) created")
+        
+        except Exception as e:
+            logging.error(f"Migration failed: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,40 @@
+"""
+Database migration script to add the jobs table and its progress details column
+Run this script once to migrate existing database
+"""
+
+from app import app, db
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+def migrate():
+    with app.app_context():
+        try:
+            logging.info("Starting database migration for background jobs...")
+            
+            logging.info("Creating tables (jobs if not exists)...")
+            db.create_all()
+            
+            logging.info("Checking if details column exists in jobs table...")
+            from sqlalchemy import inspect
+            inspector = inspect(db.engine)
+            columns = [col['name'] for col in inspector.get_columns('jobs')]
+            
+            if 'details' not in columns:
+                logging.info("Adding details column to jobs table...")
+                db.session.execute(db.text("ALTER TABLE jobs ADD COLUMN details TEXT"))
+                db.session.commit()
+                logging.info("Column added successfully!")
+            else:
+                logging.info("Column details already exists, skipping...")
+            
+            logging.info("Migration completed successfully!")
+        
+        except Exception as e:
+            logging.error(f"Migration failed: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    migrate()
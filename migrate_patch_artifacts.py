@@ -0,0 +1,76 @@
+"""
+Database migration script to move existing patch files into the patch artifact store
+Run this script once to migrate existing database
+"""
+
+from app import app, db, Feature, patch_store
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+def migrate():
+    with app.app_context():
+        try:
+            logging.info("Starting patch artifact migration...")
+            
+            logging.info("Creating tables (patch_artifacts, patch_artifact_sources, feature_patch_artifacts if not exists)...")
+            db.create_all()
+            
+            imported = 0
+            for feature in Feature.query.all():
+                stage_data = feature.get_stage_data()
+                patch_data = stage_data.get('Patch Generation')
+                if not patch_data or not patch_data.get('patch_file'):
+                    continue
+                
+                if not patch_data.get('patch_files'):
+                    # Single-patch stage data from before multi-commit support
+                    patch_data['patch_files'] = [{
+                        'commit_hash': patch_data.get('commit_hash', ''),
+                        'patch_file': patch_data['patch_file'],
+                        'patch_filename': patch_data.get('patch_filename', os.path.basename(patch_data['patch_file']))
+                    }]
+                
+                moved = {}
+                for patch in patch_data['patch_files']:
+                    old_path = patch.get('patch_file')
+                    if patch.get('artifact_hash') or not old_path or not os.path.exists(old_path):
+                        continue
+                    
+                    artifact = patch_store.add(patch_data.get('vcs_type', 'git'), patch_data.get('repo_url', ''),
+                                               patch['commit_hash'], old_path)
+                    patch['patch_file'] = artifact.storage_path
+                    patch['artifact_hash'] = artifact.content_hash
+                    moved[old_path] = artifact.storage_path
+                
+                if not moved:
+                    continue
+                
+                patch_data['patch_file'] = patch_data['patch_files'][0]['patch_file']
+                ai_data = stage_data.get('AI Analysis', {})
+                if ai_data.get('patch_file') in moved:
+                    ai_data['patch_file'] = moved[ai_data['patch_file']]
+                if feature.patch_file_path in moved:
+                    feature.patch_file_path = moved[feature.patch_file_path]
+                
+                feature.set_stage_data(stage_data)
+                patch_store.add_reference(feature.id, [p['artifact_hash'] for p in patch_data['patch_files'] if p.get('artifact_hash')])
+                db.session.commit()
+                
+                for old_path, new_path in moved.items():
+                    if os.path.abspath(old_path) != os.path.abspath(new_path):
+                        os.remove(old_path)
+                
+                imported += len(moved)
+                logging.info(f"Moved {len(moved)} patch file(s) of feature {feature.name} into the artifact store")
+            
+            logging.info(f"Migration completed successfully! {imported} patch file(s) imported")
+        
+        except Exception as e:
+            logging.error(f"Migration failed: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,71 @@
+"""
+Database migration script to index existing uploads by content hash and remove duplicate copies
+Run this script once to migrate existing database
+"""
+
+from app import app, db, Feature
+from document_cache import file_digest, get_document_cache
+import os
+import logging
+
+logging.basicConfig(level=logging.INFO)
+
+def migrate():
+    with app.app_context():
+        try:
+            logging.info("Starting upload index migration...")
+            
+            cache = get_document_cache()
+            upload_dir = app.config['UPLOAD_FOLDER']
+            
+            # Oldest copy first; the timestamp prefix sorts chronologically
+            canonical = {}
+            replaced = {}
+            for name in sorted(os.listdir(upload_dir)):
+                path = os.path.join(upload_dir, name)
+                if name.startswith('.') or not os.path.isfile(path):
+                    continue
+                
+                key = (file_digest(path), os.path.splitext(name)[1].lower())
+                first = canonical.get(key) or cache.find_upload(*key)
+                if first is None:
+                    cache.record_upload(key[0], key[1], path)
+                    first = path
+                canonical[key] = first
+                if os.path.abspath(first) != os.path.abspath(path):
+                    replaced[path] = first
+            
+            still_used = set()
+            for feature in Feature.query.all():
+                if feature.file_path in replaced:
+                    feature.file_path = replaced[feature.file_path]
+                
+                stage_data = feature.get_stage_data()
+                ai_data = stage_data.get('AI Analysis', {})
+                if ai_data.get('brd_file') in replaced:
+                    ai_data['brd_file'] = replaced[ai_data['brd_file']]
+                    feature.set_stage_data(stage_data)
+                
+                # Other uploads (e.g. unit test files) keep their own copy
+                for stage in stage_data.values():
+                    if isinstance(stage, dict):
+                        still_used.update(value for value in stage.values() if isinstance(value, str) and value in replaced)
+            
+            db.session.commit()
+            
+            removed = 0
+            for path in replaced:
+                if path not in still_used:
+                    os.remove(path)
+                    removed += 1
+                    logging.info(f"Removed {path}, a duplicate of {replaced[path]}")
+            
+            logging.info(f"Migration completed successfully! {len(canonical)} distinct upload(s) indexed, {removed} duplicate(s) removed")
+        
+        except Exception as e:
+            logging.error(f"Migration failed: {str(e)}")
+            db.session.rollback()
+            raise
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,173 @@
+import os
+import re
+import math
+from typing import List, Optional
+
+# Rough characters per token for source code and diffs; only used for budgeting and cost estimates
+CHARS_PER_TOKEN = float(os.environ.get('AI_CHARS_PER_TOKEN', '4'))
+
+# Patches estimated above this many tokens are split into chunks of at most this size
+DEFAULT_CHUNK_TOKENS = int(os.environ.get('AI_CHUNK_TOKENS', '30000'))
+
+COMMIT_HEADER = re.compile(r'^commit [0-9a-f]{40,64}\b')
+# git diffs start each file with 'diff --git' (paths quoted if unusual), svn diffs with 'Index: <path>'
+FILE_HEADER = re.compile(r'^(?:diff --git "?a/(?P<git>.+?)"? "?b/|Index: (?P<svn>.+)$)')
+HUNK_HEADER = re.compile(r'^@@ ')
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate number of model tokens in text."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+class PatchChunk:
+    """A piece of a patch that fits the token budget, with the files it touches."""
+
+    __slots__ = ('index', 'text', 'files', 'tokens')
+
+    def __init__(self, index: int, text: str, files: List[str]):
+        self.index = index
+        self.text = text
+        self.files = files
+        self.tokens = estimate_tokens(text)
+
+    def to_dict(self):
+        return {'index': self.index, 'files': self.files, 'tokens': self.tokens}
+
+
+class _Section:
+    """A commit header or one file's diff: the header lines and the hunks after them."""
+
+    __slots__ = ('path', 'header', 'hunks', 'commit')
+
+    def __init__(self, path: Optional[str], header: List[str], commit: Optional[str]):
+        self.path = path
+        self.header = header
+        self.hunks: List[List[str]] = []
+        self.commit = commit
+
+
+def _split_sections(patch_text: str) -> List[_Section]:
+    sections: List[_Section] = []
+    commit = None
+    current: Optional[_Section] = None
+
+    for line in patch_text.splitlines(keepends=True):
+        file_match = FILE_HEADER.match(line)
+        if COMMIT_HEADER.match(line):
+            commit = line.rstrip('\n')
+            current = _Section(None, [line], commit)
+            sections.append(current)
+        elif file_match:
+            current = _Section(file_match.group('git') or file_match.group('svn').strip(), [line], commit)
+            sections.append(current)
+        elif current is None:
+            current = _Section(None, [line], commit)
+            sections.append(current)
+        elif current.path is not None and HUNK_HEADER.match(line):
+            current.hunks.append([line])
+        elif current.hunks:
+            current.hunks[-1].append(line)
+        else:
+            current.header.append(line)
+
+    return sections
+
+
+def _split_lines(lines: List[str], prefix: str, budget: int) -> List[str]:
+    """Cut lines into pieces of at most budget tokens, each starting with prefix."""
+    limit = max(1, int((budget - estimate_tokens(prefix)) * CHARS_PER_TOKEN))
+    pieces: List[str] = []
+    current: List[str] = []
+    size = 0
+
+    for line in lines:
+        if current and size + len(line) > limit:
+            pieces.append(prefix + ''.join(current))
+            current, size = [], 0
+        # A single line longer than the budget (e.g. minified code) is cut as well
+        while len(line) > limit:
+            pieces.append(prefix + line[:limit])
+            line = line[limit:]
+        current.append(line)
+        size += len(line)
+
+    if current:
+        pieces.append(prefix + ''.join(current))
+    return pieces
+
+
+def _section_pieces(section: _Section, budget: int) -> List[str]:
+    """The section's text, split by hunk (and within hunks if needed) when it exceeds budget."""
+    text = ''.join(section.header) + ''.join(''.join(hunk) for hunk in section.hunks)
+    if estimate_tokens(text) <= budget:
+        return [text]
+
+    # Repeat the file header (and the commit it belongs to) so every piece stands on its own
+    header = ''.join(section.header)
+    if section.commit and section.path is not None:
+        header = f'{section.commit} (continued)\n{header}'
+    if not section.hunks or estimate_tokens(header) * 2 > budget:
+        return _split_lines(section.header + [line for hunk in section.hunks for line in hunk], '', budget)
+
+    limit = budget * CHARS_PER_TOKEN
+    pieces: List[str] = []
+    current: List[str] = []
+    size = len(header)
+    for hunk in section.hunks:
+        hunk_text = ''.join(hunk)
+        if size + len(hunk_text) <= limit:
+            current.append(hunk_text)
+            size += len(hunk_text)
+            continue
+        if current:
+            pieces.append(header + ''.join(current))
+        current, size = [], len(header)
+        if estimate_tokens(header + hunk_text) <= budget:
+            current.append(hunk_text)
+            size += len(hunk_text)
+        else:
+            pieces.extend(_split_lines(hunk[1:], header + hunk[0], budget))
+
+    if current:
+        pieces.append(header + ''.join(current))
+    return pieces
+
+
+def chunk_patch(patch_text: str, max_tokens: int = DEFAULT_CHUNK_TOKENS) -> List[PatchChunk]:
+    """
+    Split a patch into chunks of at most max_tokens (estimated) each.
+
+    Whole files are packed together while they fit. A file bigger than the
+    budget is split between hunks, and a hunk bigger than the budget between
+    lines; each such piece repeats the file header and the commit line so it
+    can be read on its own. A patch that fits returns a single chunk.
+    """
+    chunks: List[PatchChunk] = []
+    current: List[str] = []
+    files: List[str] = []
+    tokens = 0
+
+    def flush():
+        nonlocal current, files, tokens
+        if current:
+            chunks.append(PatchChunk(len(chunks), ''.join(current), files))
+        current, files, tokens = [], [], 0
+
+    for section in _split_sections(patch_text):
+        for piece in _section_pieces(section, max_tokens):
+            piece_tokens = estimate_tokens(piece)
+            if current and tokens + piece_tokens > max_tokens:
+                flush()
+                context = f'{section.commit} (continued)\n' if section.commit else ''
+                if (section.path is not None and context and not piece.startswith(section.commit)
+                        and estimate_tokens(context) + piece_tokens <= max_tokens):
+                    current.append(context)
+                    tokens += estimate_tokens(context)
+            current.append(piece)
+            tokens += piece_tokens
+            if section.path is not None and section.path not in files:
+                files.append(section.path)
+
+    flush()
+    return chunks
@@ -0,0 +1,237 @@
+import os
+import io
+import re
+import gzip
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timedelta
+from typing import BinaryIO, Dict, Iterable, List, Tuple
+
+from git_mirror_pool import normalize_repo_url
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - zstd compression is optional
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# 'none', 'gzip' or 'zstd'; applies to newly stored artifacts only
+DEFAULT_COMPRESSION = os.environ.get('PATCH_ARTIFACT_COMPRESSION', 'none').lower()
+
+# Unreferenced artifacts younger than this are kept: a running Patch Generation job may be about to reference them
+DEFAULT_GC_GRACE_SECONDS = float(os.environ.get('PATCH_ARTIFACT_GC_GRACE_SECONDS', '3600'))
+
+COMPRESSION_SUFFIXES = {'none': '', 'gzip': '.gz', 'zstd': '.zst'}
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+GIT_PATCH_HEADER = re.compile(rb'^commit ([0-9a-f]{40,64})\b')
+
+
+def open_artifact(path: str, text: bool = False):
+    """
+    Open a stored patch for reading, decompressing it according to its suffix.
+
+    Plain paths from before the artifact store work too. With text=True the
+    content is decoded as UTF-8, replacing undecodable bytes.
+    """
+    if path.endswith('.gz'):
+        stream: BinaryIO = gzip.open(path, 'rb')
+    elif path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} requires the zstandard package")
+        stream = zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    else:
+        stream = open(path, 'rb')
+
+    if text:
+        return io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    return stream
+
+
+def is_immutable_revision(vcs_type: str, revision: str) -> bool:
+    """Whether a revision always names the same change, so its patch can be reused."""
+    revision = revision.strip()
+    if vcs_type == 'git':
+        # Branch and tag names move; hexadecimal object names do not
+        return 7 <= len(revision) <= 64 and all(c in '0123456789abcdefABCDEF' for c in revision)
+    return revision.isdigit()
+
+
+class PatchArtifactStore:
+    """
+    Content-addressed storage for generated patches.
+
+    Patch bytes are stored once per SHA-256 under root_dir, optionally
+    compressed. The source model maps (vcs_type, repo_url, revision) to a
+    content hash so an already exported revision is not generated again,
+    and the reference model records which features use which artifact;
+    collect_garbage() deletes artifacts no feature references any more,
+    once they are older than gc_grace_seconds.
+    """
+
+    def __init__(self, db, artifact_model, source_model, reference_model, root_dir: str,
+                 compression: str = DEFAULT_COMPRESSION, gc_grace_seconds: float = DEFAULT_GC_GRACE_SECONDS):
+        self.db = db
+        self.gc_grace_seconds = gc_grace_seconds
+        self.artifact_model = artifact_model
+        self.source_model = source_model
+        self.reference_model = reference_model
+        self.root_dir = root_dir
+
+        if compression not in COMPRESSION_SUFFIXES:
+            raise ValueError(f"Unknown patch compression: {compression}")
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed; compressing patch artifacts with gzip instead")
+            compression = 'gzip'
+        self.compression = compression
+
+    @staticmethod
+    def source_key(vcs_type: str, repo_url: str, revision: str) -> Tuple[str, str, str]:
+        return vcs_type, normalize_repo_url(repo_url), revision.strip().lower()
+
+    def lookup(self, vcs_type: str, repo_url: str, revision: str):
+        """Return the stored artifact for a revision, or None if it has to be generated."""
+        if not is_immutable_revision(vcs_type, revision):
+            return None
+
+        vcs_type, repo_url, revision = self.source_key(vcs_type, repo_url, revision)
+        source = self.source_model.query.filter_by(vcs_type=vcs_type, repo_url=repo_url, revision=revision).first()
+        if source is None and vcs_type == 'git':
+            # An abbreviated hash matches the full hash recorded from an earlier patch, if unambiguous
+            candidates = (self.source_model.query
+                          .filter_by(vcs_type=vcs_type, repo_url=repo_url)
+                          .filter(self.source_model.revision.like(f'{revision}%'))
+                          .limit(2)
+                          .all())
+            if len(candidates) == 1:
+                source = candidates[0]
+        if source is None:
+            return None
+
+        artifact = self.db.session.get(self.artifact_model, source.content_hash)
+        if artifact is None or not os.path.exists(artifact.storage_path):
+            logger.warning(f"Patch artifact for {revision} is missing from disk; it will be regenerated")
+            return None
+        return artifact
+
+    def _storage_path(self, content_hash: str, compression: str) -> str:
+        return os.path.join(self.root_dir, content_hash[:2], f'{content_hash}.patch{COMPRESSION_SUFFIXES[compression]}')
+
+    def _write(self, src_path: str) -> Tuple[str, str, int]:
+        """Copy src_path into a temporary file in the store. Returns (temp path, content hash, size)."""
+        os.makedirs(self.root_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.incoming-', dir=self.root_dir)
+        digest = hashlib.sha256()
+        size = 0
+
+        try:
+            with os.fdopen(fd, 'wb') as raw, open(src_path, 'rb') as src:
+                if self.compression == 'gzip':
+                    out = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0)
+                elif self.compression == 'zstd':
+                    out = zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+                else:
+                    out = raw
+
+                for chunk in iter(lambda: src.read(COPY_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    out.write(chunk)
+
+                if out is not raw:
+                    out.close()
+        except Exception:
+            os.remove(temp_path)
+            raise
+
+        return temp_path, digest.hexdigest(), size
+
+    def add(self, vcs_type: str, repo_url: str, revision: str, src_path: str):
+        """
+        Store the patch at src_path for a revision and return its artifact.
+
+        If identical content is already stored, the existing artifact is reused
+        and the new copy discarded. The caller commits the session.
+        """
+        temp_path, content_hash, size = self._write(src_path)
+
+        artifact = self.db.session.get(self.artifact_model, content_hash)
+        if artifact is not None and os.path.exists(artifact.storage_path):
+            os.remove(temp_path)
+        else:
+            storage_path = self._storage_path(content_hash, self.compression)
+            os.makedirs(os.path.dirname(storage_path), exist_ok=True)
+            os.replace(temp_path, storage_path)
+
+            if artifact is None:
+                artifact = self.artifact_model(content_hash=content_hash)
+                self.db.session.add(artifact)
+            artifact.storage_path = storage_path
+            artifact.compression = self.compression
+            artifact.size = size
+            artifact.stored_size = os.path.getsize(storage_path)
+
+        revisions = [revision] if is_immutable_revision(vcs_type, revision) else []
+        if vcs_type == 'git':
+            # `git show` output names the full commit hash on its first line
+            with open(src_path, 'rb') as src:
+                match = GIT_PATCH_HEADER.match(src.readline())
+            if match:
+                revisions.append(match.group(1).decode('ascii'))
+
+        for revision in dict.fromkeys(revisions):
+            vcs_type, repo_url, revision = self.source_key(vcs_type, repo_url, revision)
+            source = self.source_model.query.filter_by(vcs_type=vcs_type, repo_url=repo_url, revision=revision).first()
+            if source is None:
+                self.db.session.add(self.source_model(vcs_type=vcs_type, repo_url=repo_url, revision=revision,
+                                                      content_hash=content_hash))
+            else:
+                source.content_hash = content_hash
+
+        return artifact
+
+    def add_reference(self, feature_id: int, content_hashes: Iterable[str]) -> None:
+        """Record that a feature uses these artifacts. The caller commits the session."""
+        for content_hash in set(content_hashes):
+            if self.db.session.get(self.reference_model, (feature_id, content_hash)) is None:
+                self.db.session.add(self.reference_model(feature_id=feature_id, content_hash=content_hash))
+
+    def reference_counts(self) -> Dict[str, int]:
+        rows = (self.db.session.query(self.reference_model.content_hash, self.db.func.count())
+                .group_by(self.reference_model.content_hash)
+                .all())
+        return {content_hash: count for content_hash, count in rows}
+
+    def collect_garbage(self) -> List[str]:
+        """
+        Delete artifacts with no feature references, on disk and in the index,
+        unless they were stored within the grace period. Returns their hashes.
+        """
+        counts = self.reference_counts()
+        cutoff = datetime.utcnow() - timedelta(seconds=self.gc_grace_seconds)
+        collected = []
+
+        for artifact in self.artifact_model.query.all():
+            if counts.get(artifact.content_hash):
+                continue
+            if artifact.created_at is not None and artifact.created_at > cutoff:
+                continue
+            self.source_model.query.filter_by(content_hash=artifact.content_hash).delete()
+            self.db.session.delete(artifact)
+            collected.append((artifact.content_hash, artifact.storage_path))
+
+        self.db.session.commit()
+
+        for content_hash, storage_path in collected:
+            try:
+                os.remove(storage_path)
+                os.rmdir(os.path.dirname(storage_path))
+            except OSError:
+                pass
+            logger.info(f"Deleted unreferenced patch artifact {content_hash}")
+
+        return [content_hash for content_hash, _ in collected]
+
@@ -0,0 +1,119 @@
+import os
+import io
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from PyPDF2 import PdfReader
+
+# Worker processes for large PDFs; 1 extracts every page in the calling thread
+PDF_WORKERS = int(os.environ.get('PDF_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+# Smaller documents are not worth starting worker processes for
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get('PDF_PARALLEL_MIN_PAGES', '32'))
+
+PAGES_PER_TASK = 8
+
+
+# The document a worker process parses, opened once by _init_worker
+_worker_reader: Optional[PdfReader] = None
+
+
+def _init_worker(file_path: str) -> None:
+    """Open the PDF once in each worker process; every range it extracts reuses this reader."""
+    global _worker_reader
+    _worker_reader = PdfReader(file_path)
+
+
+def _extract_page_range(start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop); runs in a worker process."""
+    return [_worker_reader.pages[i].extract_text() or '' for i in range(start, stop)]
+
+
+def _pool_context():
+    # The web process also runs request and job threads, so a forked copy of it could inherit a
+    # lock one of them holds (logging, database handles) and hang. forkserver forks workers from
+    # a single-threaded server process that only imports this module; spawn starts each afresh
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([__name__])
+        return context
+    return multiprocessing.get_context('spawn')
+
+
+def iter_pdf_pages(file_path: str, workers: Optional[int] = None,
+                   reader: Optional[PdfReader] = None) -> Iterator[str]:
+    """
+    Yield the text of each page of a PDF, in order.
+
+    Documents of at least PDF_PARALLEL_MIN_PAGES pages are parsed by a
+    process pool in ranges of PAGES_PER_TASK pages, with only a few ranges
+    ahead of the consumer; each worker opens the file once. Closing the
+    generator early cancels the ranges not started yet, so a caller that has
+    read enough stops the parsing. reader is the caller's already opened
+    copy of file_path, if any.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    if reader is None:
+        reader = PdfReader(file_path)
+    total = len(reader.pages)
+
+    if workers <= 1 or total < PDF_PARALLEL_MIN_PAGES:
+        for page in reader.pages:
+            yield page.extract_text() or ''
+        return
+
+    ranges = iter([(start, min(start + PAGES_PER_TASK, total)) for start in range(0, total, PAGES_PER_TASK)])
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context(),
+                               initializer=_init_worker, initargs=(file_path,))
+    pending: Deque[Future] = deque()
+    try:
+        for start, stop in ranges:
+            pending.append(pool.submit(_extract_page_range, start, stop))
+            if len(pending) >= workers * 2:
+                break
+
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range is not None:
+                pending.append(pool.submit(_extract_page_range, *next_range))
+            yield from texts
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def extract_pdf_text(file_path: str, max_chars: int = 0,
+                     workers: Optional[int] = None) -> Tuple[str, int, int, bool]:
+    """
+    Extract a PDF's text, one line break after each page.
+
+    With max_chars > 0, parsing stops as soon as that many characters are
+    collected and the text is cut there. Returns (text, pages read, total
+    pages, whether the text was cut).
+    """
+    reader = PdfReader(file_path)
+    total = len(reader.pages)
+    out = io.StringIO()
+    size = 0
+    pages_read = 0
+    truncated = False
+
+    pages = iter_pdf_pages(file_path, workers, reader)
+    try:
+        for page_text in pages:
+            pages_read += 1
+            if not page_text:
+                continue
+            if max_chars and size + len(page_text) + 1 > max_chars:
+                out.write(page_text[:max_chars - size])
+                truncated = True
+                break
+            out.write(page_text)
+            out.write('\n')
+            size += len(page_text) + 1
+    finally:
+        pages.close()
+
+    return out.getvalue(), pages_read, total, truncated
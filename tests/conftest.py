@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_response_cache
+import gemini_helper
+from ai_response_cache import AIResponseCache
+from gemini_stub import StubGemini
+
+
+@pytest.fixture(scope='session')
+def app_module(tmp_path_factory):
+    """
+    Import the web app against a throwaway SQLite database.
+
+    The import creates the upload and generated folders in the current
+    directory, so it runs in a temporary one.
+    """
+    work_dir = tmp_path_factory.mktemp('app')
+    previous_url = os.environ.get('DATABASE_URL')
+    previous_dir = os.getcwd()
+    os.environ['DATABASE_URL'] = f"sqlite:///{work_dir / 'app.db'}"
+    os.chdir(work_dir)
+    try:
+        import app as app_module
+    finally:
+        os.chdir(previous_dir)
+        if previous_url is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous_url
+    return app_module
+
+
+@pytest.fixture
+def web(app_module):
+    """The app module inside an application context, with empty tables."""
+    with app_module.app.app_context():
+        app_module.db.drop_all()
+        app_module.db.create_all()
+        yield app_module
+        app_module.db.session.remove()
+
+
+@pytest.fixture
+def gemini(tmp_path, monkeypatch):
+    """Point gemini_helper at a local StubGemini, with a fresh session and an empty response cache."""
+    stub = StubGemini().start()
+    monkeypatch.setenv('GEMINI_API_KEY', 'test-key')
+    monkeypatch.setattr(gemini_helper, 'GEMINI_API_BASE', stub.base_url)
+    monkeypatch.setattr(gemini_helper, '_session', None)
+    monkeypatch.setattr(gemini_helper, 'GEMINI_BACKOFF_BASE', 0.01)
+    monkeypatch.setattr(ai_response_cache, '_default_cache', AIResponseCache(str(tmp_path / 'ai-cache')))
+    yield stub
+    if gemini_helper._session is not None:
+        gemini_helper._session.close()
+    stub.stop()
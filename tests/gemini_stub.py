@@ -0,0 +1,145 @@
+"""
+A local HTTP server that stands in for the Gemini REST API in tests.
+
+Replies are scripted per model and method ('generateContent' or
+'streamGenerateContent'); each request takes the next reply of its model and
+method, and the last one is repeated once the script runs out. Every request
+is recorded with the client port it came from, so tests can tell whether
+connections were reused.
+"""
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def text_result(text: str, tokens: int = 1) -> Dict[str, Any]:
+    """A generateContent result carrying text."""
+    return {
+        'candidates': [{'content': {'parts': [{'text': text}]}}],
+        'usageMetadata': {'candidatesTokenCount': tokens}
+    }
+
+
+def sse_body(pieces: List[str]) -> bytes:
+    """A streamGenerateContent?alt=sse body sending each piece as one event."""
+    return b''.join(b'data: ' + json.dumps(text_result(piece), ensure_ascii=False).encode('utf-8') + b'\r\n\r\n'
+                    for piece in pieces)
+
+
+@dataclass
+class Reply:
+    status: int = 200
+    body: Any = None
+    headers: Dict[str, str] = field(default_factory=dict)
+    # Seconds to wait before answering
+    delay: float = 0.0
+    # Send the body in writes of this many bytes, pausing between them
+    chunk_size: int = 0
+
+    @classmethod
+    def text(cls, text: str, **kwargs) -> 'Reply':
+        return cls(body=text_result(text), **kwargs)
+
+    @classmethod
+    def stream(cls, pieces: List[str], chunk_size: int = 0, content_type: str = 'text/event-stream',
+               **kwargs) -> 'Reply':
+        return cls(body=sse_body(pieces), headers={'Content-Type': content_type}, chunk_size=chunk_size, **kwargs)
+
+    def encoded(self) -> Tuple[bytes, Dict[str, str]]:
+        if isinstance(self.body, bytes):
+            return self.body, dict(self.headers)
+        body = json.dumps(self.body if self.body is not None else {}).encode('utf-8')
+        return body, {'Content-Type': 'application/json', **self.headers}
+
+
+@dataclass
+class RecordedRequest:
+    model: str
+    method: str
+    payload: Dict[str, Any]
+    headers: Dict[str, str]
+    client_port: int
+    received_at: float
+
+
+class StubGemini:
+    """Scripted Gemini endpoint on 127.0.0.1; use base_url as GEMINI_API_BASE."""
+
+    def __init__(self):
+        self.replies: Dict[Tuple[str, str], List[Reply]] = {}
+        self.requests: List[RecordedRequest] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self._server.server_port}'
+
+    def start(self) -> 'StubGemini':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def script(self, model: str, *replies: Reply, method: str = 'generateContent') -> None:
+        """Answer the next requests for model and method with replies, in order."""
+        with self._lock:
+            self.replies[(model, method)] = list(replies)
+
+    def requests_for(self, model: Optional[str] = None) -> List[RecordedRequest]:
+        with self._lock:
+            return [request for request in self.requests if model is None or request.model == model]
+
+    def _next_reply(self, model: str, method: str) -> Reply:
+        with self._lock:
+            script = self.replies.get((model, method))
+            if not script:
+                return Reply(status=404, body={'error': {'code': 404, 'message': f'{model} is not scripted'}})
+            return script.pop(0) if len(script) > 1 else script[0]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'{}')
+                model, _, method = self.path.split('?')[0].rsplit('/', 1)[-1].partition(':')
+                with stub._lock:
+                    stub.requests.append(RecordedRequest(model, method, payload, dict(self.headers),
+                                                         self.client_address[1], time.monotonic()))
+
+                reply = stub._next_reply(model, method)
+                if reply.delay:
+                    time.sleep(reply.delay)
+
+                body, headers = reply.encoded()
+                try:
+                    self.send_response(reply.status)
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    step = reply.chunk_size or len(body) or 1
+                    for start in range(0, len(body), step):
+                        self.wfile.write(body[start:start + step])
+                        self.wfile.flush()
+                        if reply.chunk_size:
+                            time.sleep(0.002)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client stopped listening, e.g. a request that lost a race
+                    self.close_connection = True
+
+        return Handler
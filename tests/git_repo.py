@@ -0,0 +1,85 @@
+"""
+Small hand-written git histories for analyzer tests.
+
+Commits are made one hour apart from BASE_DATE, so every commit falls inside
+the window returned by GitRepo.window() and their order is unambiguous.
+"""
+import os
+import subprocess
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+
+from git_dependency_analyzer import GitAnalyzer
+
+BRANCH = 'main'
+BASE_DATE = datetime(2025, 1, 1, 9, 0)
+
+
+def numbered(count: int, prefix: str = 'line') -> List[str]:
+    """Lines 'line 1' to 'line <count>'."""
+    return [f'{prefix} {number}' for number in range(1, count + 1)]
+
+
+class GitRepo:
+    def __init__(self, path):
+        self.path = str(path)
+        self.commits: List[str] = []
+        os.makedirs(self.path, exist_ok=True)
+        self.git('init', '-q', '-b', BRANCH)
+        self.git('config', 'user.name', 'Test')
+        self.git('config', 'user.email', 'test@example.com')
+        self.git('config', 'commit.gpgsign', 'false')
+
+    def git(self, *args: str, env: Dict[str, str] = None) -> str:
+        return subprocess.run(['git', *args], cwd=self.path, check=True, capture_output=True, text=True,
+                              env={**os.environ, **(env or {})}).stdout
+
+    def write(self, name: str, lines: List[str]) -> None:
+        file_path = os.path.join(self.path, name)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    def read(self, name: str) -> List[str]:
+        with open(os.path.join(self.path, name)) as f:
+            return f.read().splitlines()
+
+    def replace(self, name: str, replacements: Dict[int, str]) -> None:
+        """Replace lines by their 1-based number."""
+        lines = self.read(name)
+        for number, text in replacements.items():
+            lines[number - 1] = text
+        self.write(name, lines)
+
+    def insert(self, name: str, after: int, new_lines: List[str]) -> None:
+        lines = self.read(name)
+        self.write(name, lines[:after] + new_lines + lines[after:])
+
+    def delete(self, name: str, first: int, last: int) -> None:
+        lines = self.read(name)
+        self.write(name, lines[:first - 1] + lines[last:])
+
+    def rename(self, old: str, new: str) -> None:
+        self.git('mv', old, new)
+
+    def commit(self, message: str) -> str:
+        """Commit everything in the work tree and return the full hash."""
+        self.git('add', '-A')
+        return self._record('commit', '-q', '-m', message)
+
+    def merge(self, branch: str) -> str:
+        """Merge branch into the current branch with a merge commit and return its hash."""
+        return self._record('merge', '-q', '--no-ff', '-m', f'Merge {branch}', branch)
+
+    def _record(self, *args: str) -> str:
+        date = (BASE_DATE + timedelta(hours=len(self.commits))).strftime('%Y-%m-%dT%H:%M:%S')
+        self.git(*args, env={'GIT_AUTHOR_DATE': date, 'GIT_COMMITTER_DATE': date})
+        self.commits.append(self.git('rev-parse', 'HEAD').strip())
+        return self.commits[-1]
+
+    def window(self) -> Tuple[datetime, datetime]:
+        return BASE_DATE - timedelta(days=1), BASE_DATE + timedelta(days=2)
+
+    def analyze(self, target: str, backend: str = None, **options):
+        analyzer = GitAnalyzer(self.path, backend=backend, workers=1)
+        return analyzer.analyze_dependencies(BRANCH, target, *self.window(), **options)
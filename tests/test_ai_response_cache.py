@@ -0,0 +1,116 @@
+"""
+Tests for the AI response cache, run through analyze_with_rest_api against a
+local stub of the Gemini API.
+"""
+import time
+
+import pytest
+
+import ai_response_cache
+import gemini_helper
+from ai_response_cache import AIResponseCache
+from gemini_helper import GENERATION_CONFIG, MODELS_TO_TRY, _analysis_prompt, analyze_with_rest_api
+from gemini_stub import Reply
+
+MODEL = MODELS_TO_TRY[0]
+
+
+@pytest.fixture
+def cache(gemini):
+    return ai_response_cache.get_response_cache()
+
+
+def use_cache(monkeypatch, tmp_path, **options):
+    cache = AIResponseCache(str(tmp_path / 'bounded-cache'), **options)
+    monkeypatch.setattr(ai_response_cache, '_default_cache', cache)
+    return cache
+
+
+def test_second_identical_call_is_a_hit(gemini, cache):
+    gemini.script(MODEL, Reply.text('first'), Reply.text('second'))
+    events = []
+
+    first = analyze_with_rest_api('Summarize', 'test-key')
+    second = analyze_with_rest_api('Summarize', 'test-key', progress=lambda event, data: events.append(event))
+
+    assert first == second == 'first'
+    assert len(gemini.requests) == 1
+    assert events == ['cached']
+    assert cache.stats()['hits'] == 1
+
+
+def test_changed_generation_config_misses(gemini, cache):
+    gemini.script(MODEL, Reply.text('default'), Reply.text('cooler'))
+
+    analyze_with_rest_api('Summarize', 'test-key')
+    cooler = analyze_with_rest_api('Summarize', 'test-key', generation_config=dict(GENERATION_CONFIG, temperature=0.1))
+
+    assert cooler == 'cooler'
+    assert len(gemini.requests) == 2
+
+
+def test_changed_model_misses(gemini, cache, monkeypatch):
+    gemini.script('model-a', Reply.text('from a'))
+    gemini.script('model-b', Reply.text('from b'))
+
+    monkeypatch.setattr(gemini_helper, 'MODELS_TO_TRY', ['model-a'])
+    from_a = analyze_with_rest_api('Summarize', 'test-key')
+    monkeypatch.setattr(gemini_helper, 'MODELS_TO_TRY', ['model-b'])
+    from_b = analyze_with_rest_api('Summarize', 'test-key')
+
+    assert (from_a, from_b) == ('from a', 'from b')
+    assert [request.model for request in gemini.requests] == ['model-a', 'model-b']
+
+
+def test_entries_expire_after_ttl(gemini, tmp_path, monkeypatch):
+    cache = use_cache(monkeypatch, tmp_path, ttl_seconds=0.2)
+    gemini.script(MODEL, Reply.text('old'), Reply.text('new'))
+
+    analyze_with_rest_api('Summarize', 'test-key')
+    time.sleep(0.3)
+    answer = analyze_with_rest_api('Summarize', 'test-key')
+
+    assert answer == 'new'
+    assert len(gemini.requests) == 2
+    assert cache.stats()['expired'] == 1
+
+
+def test_least_recently_used_entry_is_evicted(gemini, tmp_path, monkeypatch):
+    cache = use_cache(monkeypatch, tmp_path, max_entries=2)
+    gemini.script(MODEL, Reply.text('answer'))
+
+    analyze_with_rest_api('one', 'test-key')
+    analyze_with_rest_api('two', 'test-key')
+    analyze_with_rest_api('one', 'test-key')
+    analyze_with_rest_api('three', 'test-key')
+    requests_before = len(gemini.requests)
+    analyze_with_rest_api('one', 'test-key')
+    analyze_with_rest_api('two', 'test-key')
+
+    assert requests_before == 3
+    assert [request.payload['contents'][0]['parts'][0]['text'] for request in gemini.requests[3:]] == ['two']
+    assert cache.stats()['evictions'] >= 1
+
+
+def test_bypass_requests_again_and_stores_the_fresh_answer(gemini, cache):
+    gemini.script(MODEL, Reply.text('stale'), Reply.text('fresh'))
+
+    analyze_with_rest_api('Summarize', 'test-key')
+    bypassed = analyze_with_rest_api('Summarize', 'test-key', use_cache=False)
+    cached = analyze_with_rest_api('Summarize', 'test-key')
+
+    assert bypassed == cached == 'fresh'
+    assert len(gemini.requests) == 2
+    assert cache.stats()['bypassed'] == 1
+
+
+def test_patch_whitespace_changes_the_key_but_brd_whitespace_does_not(gemini, cache):
+    gemini.script(MODEL, Reply.text('analysis'))
+    patch = '+def run():\n+    return 1\n'
+
+    analyze_with_rest_api(_analysis_prompt('Users can book holidays.', patch), 'test-key')
+    analyze_with_rest_api(_analysis_prompt('Users can book holidays.  \r\n\r\n\r\n', patch), 'test-key')
+    analyze_with_rest_api(_analysis_prompt('Users can book holidays.', patch.replace('1\n', '1  \n')), 'test-key')
+    analyze_with_rest_api(_analysis_prompt('Users can book holidays.', patch + '\n\n\n'), 'test-key')
+
+    assert len(gemini.requests) == 3
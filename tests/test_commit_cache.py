@@ -0,0 +1,42 @@
+"""
+Tests for CommitChangeCache keys: entries are stored under the change format
+version, so changes written by an older diff parser are never read back.
+"""
+import os
+import sqlite3
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from commit_cache import CHANGES_VERSION, CommitChangeCache
+
+SHA = 'a' * 40
+CHANGES = {'src/app.py': [(1, 3), (10, 12)]}
+
+
+def test_round_trip(tmp_path):
+    cache = CommitChangeCache(str(tmp_path))
+    cache.put(SHA, CHANGES)
+
+    assert cache.get(SHA).to_dict() == CHANGES
+    assert cache.stats()['version'] == CHANGES_VERSION
+
+
+def test_other_version_misses_and_is_dropped(tmp_path):
+    CommitChangeCache(str(tmp_path), version=CHANGES_VERSION).put(SHA, CHANGES)
+
+    newer = CommitChangeCache(str(tmp_path), version=CHANGES_VERSION + 1)
+
+    assert newer.get(SHA) is None
+    assert newer.stats()['entries'] == 0
+
+
+def test_unversioned_entries_are_dropped(tmp_path):
+    cache = CommitChangeCache(str(tmp_path))
+    with sqlite3.connect(cache.db_path) as conn:
+        conn.execute("INSERT INTO commit_changes (sha, changes, last_access) VALUES (?, '{}', 0)", (SHA,))
+
+    reopened = CommitChangeCache(str(tmp_path))
+
+    assert reopened.get(SHA) is None
+    assert reopened.stats()['entries'] == 0
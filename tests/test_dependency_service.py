@@ -0,0 +1,100 @@
+"""
+Regression tests for the number of history walks and diffs a dependency
+request costs.
+
+DependencyService.validate_and_analyze must list the commits in the window
+once and diff each commit at most once per request, however many of the
+analysis features (transitive graph, line tracking) are switched on, and a
+warm commit cache must not diff anything again.
+"""
+import os
+import sys
+from collections import Counter
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import git_dependency_analyzer
+from benchmark_dependency_analyzer import BRANCH, generate_synthetic_repo
+from commit_cache import CommitChangeCache
+from dependency_service import DependencyService
+from git_dependency_analyzer import BACKEND_GITPYTHON, GitAnalyzer
+
+
+@pytest.fixture
+def repo_info(tmp_path):
+    return generate_synthetic_repo(str(tmp_path / 'repo'), commits=40, files=6, lines_per_file=60,
+                                   hunks_per_commit=3, files_per_commit=2, rename_rate=0.05, seed=4)
+
+
+@pytest.fixture
+def calls(tmp_path, monkeypatch):
+    """Count history walks and per-commit diffs made through GitAnalyzer."""
+    counts = {'walks': 0, 'diffs': Counter(), 'stored': 0}
+    get_commits_in_range = GitAnalyzer.get_commits_in_range
+    get_commit_file_changes = GitAnalyzer.get_commit_file_changes
+    put_many = CommitChangeCache.put_many
+
+    def counted_walk(self, *args, **kwargs):
+        counts['walks'] += 1
+        return get_commits_in_range(self, *args, **kwargs)
+
+    def counted_diff(self, commit_hash, *args, **kwargs):
+        counts['diffs'][commit_hash] += 1
+        return get_commit_file_changes(self, commit_hash, *args, **kwargs)
+
+    def counted_put_many(self, entries):
+        counts['stored'] += len(entries)
+        return put_many(self, entries)
+
+    monkeypatch.setattr(GitAnalyzer, 'get_commits_in_range', counted_walk)
+    monkeypatch.setattr(GitAnalyzer, 'get_commit_file_changes', counted_diff)
+    monkeypatch.setattr(CommitChangeCache, 'put_many', counted_put_many)
+    # Diff in this process so every call is counted
+    monkeypatch.setattr(git_dependency_analyzer, 'DEFAULT_WORKERS', 1)
+    monkeypatch.setattr(DependencyService, '_commit_cache', CommitChangeCache(str(tmp_path / 'cache')))
+    return counts
+
+
+def _analyze(repo_info, **options):
+    result = DependencyService.validate_and_analyze(
+        repo_info['path'], BRANCH, repo_info['head'], repo_info['start_date'], repo_info['end_date'],
+        backend=BACKEND_GITPYTHON, **options
+    )
+    assert result['success'], result['error']
+    return result
+
+
+@pytest.mark.parametrize('options', [
+    {},
+    {'transitive': True},
+    {'track_lines': True},
+    {'transitive': True, 'track_lines': True},
+])
+def test_request_walks_once_and_diffs_each_commit_once(repo_info, calls, options):
+    _analyze(repo_info, **options)
+
+    assert calls['walks'] == 1
+    assert calls['diffs'], 'the target commit was never diffed'
+    assert max(calls['diffs'].values()) == 1
+    assert sum(calls['diffs'].values()) <= repo_info['commits']
+
+
+def test_warm_cache_diffs_nothing(repo_info, calls):
+    cold = _analyze(repo_info, transitive=True)
+    assert calls['stored'] > 0
+    calls['walks'] = 0
+    calls['diffs'].clear()
+    calls['stored'] = 0
+
+    warm = _analyze(repo_info, transitive=True)
+
+    # Lookups still go through get_commit_file_changes, but all are cache hits
+    assert calls['walks'] == 1
+    assert max(calls['diffs'].values()) == 1
+    assert calls['stored'] == 0
+    cold_stats = cold['data'].pop('cache_stats')
+    warm_stats = warm['data'].pop('cache_stats')
+    assert warm_stats['hits'] - cold_stats['hits'] == sum(calls['diffs'].values())
+    assert warm['data'] == cold['data']
@@ -0,0 +1,83 @@
+"""
+Tests for rendering spreadsheets as TSV: blank rows and trailing empty cells
+are dropped, row and column caps apply to what is left, and every Excel
+engine produces the same text.
+"""
+from datetime import datetime
+
+import openpyxl
+import pytest
+
+from document_processor import extract_text_from_csv, extract_text_from_excel, render_tsv
+
+ENGINES = ['openpyxl', 'pandas']
+
+
+def write_workbook(path, sheets):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for title, rows in sheets.items():
+        sheet = workbook.create_sheet(title)
+        for row in rows:
+            sheet.append(row)
+    workbook.save(path)
+    return str(path)
+
+
+def test_render_tsv_cleans_cells():
+    rows = [
+        ['Rule', 'Starts', 'Days', None, None],
+        ['Carry over\tunused\ndays', datetime(2025, 4, 1), 5.0, '', None],
+        [None, '', None],
+        ['Half days', datetime(2025, 4, 1, 13, 30), 0.5],
+    ]
+
+    assert render_tsv(rows) == ('Rule\tStarts\tDays\n'
+                                'Carry over unused days\t2025-04-01\t5\n'
+                                'Half days\t2025-04-01 13:30:00\t0.5\n')
+
+
+def test_render_tsv_caps_rows_after_the_header_and_columns():
+    rows = [['id', 'a', 'b', 'c']] + [[n, 'x', 'y', 'z'] for n in range(1, 6)]
+
+    assert render_tsv(rows, max_rows=3, max_cols=2) == ('id\ta\n1\tx\n2\tx\n3\tx\n'
+                                                        '[Only the first 3 rows are shown]\n'
+                                                        '[Only the first 2 columns are shown]\n')
+    assert render_tsv(rows[:4], max_rows=3) == 'id\ta\tb\tc\n1\tx\ty\tz\n2\tx\ty\tz\n3\tx\ty\tz\n'
+
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_excel_caps_count_only_non_blank_rows(tmp_path, engine):
+    # Blank rows near the top must not use up the row budget
+    rows = [['Rule', 'Days', 'Notes', 'Extra']] + [[None]] * 4 + [[f'rule {n}', n, 'ok', 'wide'] for n in range(1, 8)]
+    path = write_workbook(tmp_path / 'rules.xlsx', {'Rules': rows, 'Empty': [], 'Owners': [['Team'], ['HR']]})
+
+    text = extract_text_from_excel(path, max_rows=3, max_cols=3, engine=engine)
+
+    assert text == ('\n=== Sheet: Rules ===\n'
+                    'Rule\tDays\tNotes\n'
+                    'rule 1\t1\tok\nrule 2\t2\tok\nrule 3\t3\tok\n'
+                    '[Only the first 3 rows are shown]\n'
+                    '[Only the first 3 columns are shown]\n'
+                    '\n'
+                    '\n=== Sheet: Empty ===\n'
+                    '\n'
+                    '\n=== Sheet: Owners ===\n'
+                    'Team\nHR\n\n')
+
+
+def test_excel_engines_agree(tmp_path):
+    rows = ([['Rule', 'Starts', 'Days']] + [[None, None, None]] * 2
+            + [[f'rule {n}', datetime(2025, 1, n), n * 0.5] for n in range(1, 20)] + [[None]] * 3 + [['total', None, 95]])
+    path = write_workbook(tmp_path / 'rules.xlsx', {'Rules': rows})
+
+    for max_rows in (0, 5, 19, 20, 21):
+        texts = {engine: extract_text_from_excel(path, max_rows=max_rows, engine=engine) for engine in ENGINES}
+        assert texts['openpyxl'] == texts['pandas'], max_rows
+
+
+def test_csv_caps(tmp_path):
+    path = tmp_path / 'rules.csv'
+    path.write_text('Rule,Days\n\n,\nrule 1,1\nrule 2,2\nrule 3,3\n', encoding='utf-8')
+
+    assert extract_text_from_csv(str(path), max_rows=2) == 'Rule\tDays\nrule 1\t1\nrule 2\t2\n[Only the first 2 rows are shown]\n'
@@ -0,0 +1,116 @@
+"""
+Tests for per-stage feature data: stages round-trip through the
+feature_stages table one at a time, the old stage_data column is still read
+as a fallback, and concurrent first writes of a stage are merged instead of
+failing on the (feature_id, stage_name) key.
+"""
+import json
+
+import pytest
+
+
+@pytest.fixture
+def feature(web):
+    feature = web.Feature(name='Holiday booking')
+    web.db.session.add(feature)
+    web.db.session.commit()
+    return feature
+
+
+def reload(web, feature):
+    """A fresh instance of the feature, as the next request or job would see it."""
+    feature_id = feature.id
+    web.db.session.expunge_all()
+    return web.db.session.get(web.Feature, feature_id)
+
+
+def stored_rows(web, feature):
+    rows = web.FeatureStage.query.filter_by(feature_id=feature.id).all()
+    return {row.stage_name: json.loads(row.data) for row in rows}
+
+
+def test_stages_round_trip(web, feature):
+    feature.set_stage('Dependency Analyzer', {'commits': ['abc123'], 'done': False})
+    feature.update_stage('Dependency Analyzer', done=True)
+    feature.update_stage('Patch Generation', patch='feature.patch')
+    web.db.session.commit()
+
+    feature = reload(web, feature)
+    assert feature.get_stage('Dependency Analyzer') == {'commits': ['abc123'], 'done': True}
+    assert feature.get_stage('Patch Generation') == {'patch': 'feature.patch'}
+    assert feature.get_stage('Code Review') is None
+    assert feature.get_stage('Code Review', {}) == {}
+    assert stored_rows(web, feature) == {'Dependency Analyzer': {'commits': ['abc123'], 'done': True},
+                                         'Patch Generation': {'patch': 'feature.patch'}}
+
+
+def test_new_feature_stages_are_saved_with_it(web):
+    feature = web.Feature(name='Payroll export')
+    feature.set_stage('Dependency Analyzer', {'commits': []})
+    web.db.session.add(feature)
+    web.db.session.commit()
+
+    assert reload(web, feature).get_stage('Dependency Analyzer') == {'commits': []}
+
+
+def test_stage_data_view_loads_stages_lazily(web, feature):
+    feature.set_stage_data({'Dependency Analyzer': {'commits': 2}, 'Patch Generation': {'patch': 'p'}})
+    web.db.session.commit()
+
+    stages = web.StageData(reload(web, feature))
+    assert stages['Patch Generation'] == {'patch': 'p'}
+    assert 'Code Review' not in stages
+    with pytest.raises(KeyError):
+        stages['Code Review']
+    assert dict(stages) == {'Dependency Analyzer': {'commits': 2}, 'Patch Generation': {'patch': 'p'}}
+    assert len(stages) == 2
+
+
+def test_legacy_stage_data_is_a_fallback(web, feature):
+    feature.stage_data = json.dumps({'Dependency Analyzer': {'commits': 1, 'repo': 'old'},
+                                     'Patch Generation': {'patch': 'old.patch'}})
+    feature.set_stage('Patch Generation', {'patch': 'new.patch'})
+    web.db.session.commit()
+
+    feature = reload(web, feature)
+    assert feature.get_stage('Dependency Analyzer') == {'commits': 1, 'repo': 'old'}
+    assert feature.get_stage('Patch Generation') == {'patch': 'new.patch'}
+    assert feature.get_stage_data() == {'Dependency Analyzer': {'commits': 1, 'repo': 'old'},
+                                        'Patch Generation': {'patch': 'new.patch'}}
+
+    # Updating a legacy stage copies it into its own row
+    feature.update_stage('Dependency Analyzer', commits=3)
+    web.db.session.commit()
+    assert stored_rows(web, feature)['Dependency Analyzer'] == {'commits': 3, 'repo': 'old'}
+
+
+def test_concurrent_first_writes_are_merged(web, feature):
+    # The job loads the feature and sees no row for the stage yet...
+    job_feature = web.db.session.get(web.Feature, feature.id)
+    assert job_feature.get_stage('Dependency Analyzer') is None
+
+    # ...while a request, with its own session, creates the row first
+    with web.app.app_context():
+        request_feature = web.db.session.get(web.Feature, feature.id)
+        request_feature.update_stage('Dependency Analyzer', notes='from the request')
+        web.db.session.commit()
+
+    merged = job_feature.update_stage('Dependency Analyzer', commits=['abc123'])
+    web.db.session.commit()
+
+    assert merged == {'notes': 'from the request', 'commits': ['abc123']}
+    assert stored_rows(web, feature) == {'Dependency Analyzer': merged}
+
+
+def test_concurrent_first_set_stage_replaces(web, feature):
+    job_feature = web.db.session.get(web.Feature, feature.id)
+    assert job_feature.get_stage('Patch Generation') is None
+
+    with web.app.app_context():
+        web.db.session.get(web.Feature, feature.id).set_stage('Patch Generation', {'patch': 'a.patch'})
+        web.db.session.commit()
+
+    job_feature.set_stage('Patch Generation', {'patch': 'b.patch'})
+    web.db.session.commit()
+
+    assert stored_rows(web, feature) == {'Patch Generation': {'patch': 'b.patch'}}
@@ -0,0 +1,107 @@
+"""
+Retry, connection pooling and model racing in gemini_helper, checked against
+a local stub of the Gemini API.
+"""
+import time
+
+import pytest
+
+import gemini_helper
+from gemini_helper import GEMINI_MAX_RETRIES, analyze_with_rest_api
+from gemini_stub import Reply
+
+
+@pytest.fixture
+def delays(gemini, monkeypatch):
+    """The backoff delays _post_with_retries waits, in order."""
+    recorded = []
+    backoff_delay = gemini_helper._backoff_delay
+
+    def recording_backoff_delay(attempt, retry_after=None):
+        recorded.append(backoff_delay(attempt, retry_after))
+        return recorded[-1]
+
+    monkeypatch.setattr(gemini_helper, '_backoff_delay', recording_backoff_delay)
+    monkeypatch.setattr(gemini_helper, 'MODELS_TO_TRY', ['model-a'])
+    return recorded
+
+
+@pytest.mark.parametrize('status', [429, 500, 503])
+def test_retryable_status_is_retried_with_backoff(gemini, delays, status):
+    gemini.script('model-a', Reply(status=status), Reply(status=status), Reply.text('recovered'))
+
+    answer = analyze_with_rest_api('Summarize', 'test-key', use_cache=False)
+
+    assert answer == 'recovered'
+    assert len(gemini.requests) == 3
+    assert len(delays) == 2
+    # Full jitter: each wait is at most the exponential cap for its attempt
+    assert all(0 <= delay <= gemini_helper.GEMINI_BACKOFF_BASE * 2 ** attempt for attempt, delay in enumerate(delays))
+
+
+def test_retries_stop_after_the_limit(gemini, delays):
+    gemini.script('model-a', Reply(status=503))
+
+    with pytest.raises(Exception, match='All models failed'):
+        analyze_with_rest_api('Summarize', 'test-key', use_cache=False)
+
+    assert len(gemini.requests) == GEMINI_MAX_RETRIES + 1
+
+
+@pytest.mark.parametrize('status', [400, 401, 403])
+def test_client_error_is_not_retried(gemini, delays, status):
+    gemini.script('model-a', Reply(status=status), Reply.text('unexpected'))
+
+    with pytest.raises(Exception, match='API request failed'):
+        analyze_with_rest_api('Summarize', 'test-key', use_cache=False)
+
+    assert len(gemini.requests) == 1
+    assert delays == []
+
+
+def test_retry_after_header_is_honoured(gemini, delays):
+    gemini.script('model-a', Reply(status=429, headers={'Retry-After': '1'}), Reply.text('after waiting'))
+
+    answer = analyze_with_rest_api('Summarize', 'test-key', use_cache=False)
+
+    first, second = gemini.requests
+    assert answer == 'after waiting'
+    assert delays == [1.0]
+    assert second.received_at - first.received_at >= 1.0
+
+
+def test_pooled_session_reuses_the_connection(gemini, delays):
+    gemini.script('model-a', Reply.text('answer'))
+
+    for prompt in ('one', 'two', 'three'):
+        analyze_with_rest_api(prompt, 'test-key', use_cache=False)
+
+    assert gemini_helper.get_session() is gemini_helper.get_session()
+    assert len({request.client_port for request in gemini.requests}) == 1
+
+
+def test_race_returns_the_first_valid_answer(gemini, monkeypatch):
+    monkeypatch.setattr(gemini_helper, 'MODELS_TO_TRY', ['slow', 'fast', 'broken'])
+    gemini.script('slow', Reply.text('slow answer', delay=1.0))
+    gemini.script('fast', Reply.text('fast answer', delay=0.1))
+    gemini.script('broken', Reply(status=400))
+    events = []
+
+    started = time.monotonic()
+    answer = analyze_with_rest_api('Summarize', 'test-key', race=True,
+                                   progress=lambda event, data: events.append((event, data.get('model'))))
+    elapsed = time.monotonic() - started
+
+    assert answer == 'fast answer'
+    assert elapsed < 1.0
+    assert ('received', 'fast') in events
+    # The slower answer is discarded: the cached entry is the winner's
+    assert analyze_with_rest_api('Summarize', 'test-key', race=True) == 'fast answer'
+
+
+def test_race_skips_a_failed_model(gemini, monkeypatch):
+    monkeypatch.setattr(gemini_helper, 'MODELS_TO_TRY', ['failing', 'working'])
+    gemini.script('failing', Reply(status=500))
+    gemini.script('working', Reply.text('working answer', delay=0.2))
+
+    assert analyze_with_rest_api('Summarize', 'test-key', race=True, use_cache=False) == 'working answer'
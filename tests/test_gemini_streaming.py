@@ -0,0 +1,39 @@
+"""
+Streaming responses against a local stub of the Gemini API: the text read
+from streamGenerateContent must equal the generateContent answer, also when
+multi-byte UTF-8 characters are split across network reads.
+"""
+import pytest
+
+from gemini_helper import MODELS_TO_TRY, analyze_with_rest_api
+from gemini_stub import Reply
+
+MODEL = MODELS_TO_TRY[0]
+PIECES = ['Überblick — naïve “quotes” •\n', '日本語のテキスト 🚀, ', 'déjà vu ½']
+
+
+@pytest.mark.parametrize('content_type', ['text/event-stream', 'application/octet-stream'])
+def test_stream_matches_non_streaming(gemini, content_type):
+    gemini.script(MODEL, Reply.text(''.join(PIECES)))
+    # Three-byte writes split most of the multi-byte characters between reads
+    gemini.script(MODEL, Reply.stream(PIECES, chunk_size=3, content_type=content_type),
+                  method='streamGenerateContent')
+
+    whole = analyze_with_rest_api('Describe the patch', 'test-key', use_cache=False)
+    received = []
+    streamed = analyze_with_rest_api('Describe the patch', 'test-key', use_cache=False, on_chunk=received.append)
+
+    assert whole == ''.join(PIECES)
+    assert streamed == whole
+    assert received == PIECES
+    assert [request.method for request in gemini.requests] == ['generateContent', 'streamGenerateContent']
+
+
+def test_streamed_text_is_cached_as_received(gemini):
+    gemini.script(MODEL, Reply.stream(PIECES, chunk_size=5), method='streamGenerateContent')
+
+    streamed = analyze_with_rest_api('Describe the patch', 'test-key', on_chunk=lambda text: None)
+    cached = analyze_with_rest_api('Describe the patch', 'test-key')
+
+    assert cached == streamed == ''.join(PIECES)
+    assert len(gemini.requests) == 1
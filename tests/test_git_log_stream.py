@@ -0,0 +1,170 @@
+"""
+Parity of the `git log -p` stream parser (the git-log backend) with the
+GitPython backend: on the same history both must list the same commits with
+the same per-file hunk ranges and find the same dependencies. Also checks
+that git's stderr can neither stall the stream nor get lost on failure.
+"""
+import io
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+from git_dependency_analyzer import BACKEND_GIT_LOG, BACKEND_GITPYTHON, GitAnalyzer
+from git_log_stream import _git_output, iter_git_log, iter_name_status, parse_git_log_stream
+from git_repo import BRANCH, GitRepo, numbered
+
+# Lines that look like diff headers when they appear in a hunk body
+HEADER_LIKE = [
+    'diff --git a/fake.py b/fake.py',
+    '-- a/comment.sql',
+    '++ b/other.py',
+    '@@ -1,2 +1,3 @@',
+    'rename from fake.py',
+]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = GitRepo(tmp_path / 'repo')
+    repo.write('app.py', numbered(60))
+    repo.write('lib/util.py', numbered(30, 'util'))
+    repo.write('notes.txt', [])
+    repo.write('name with spaces.txt', numbered(5))
+    repo.commit('Initial version')
+
+    repo.replace('app.py', {10: 'changed 10', 40: 'changed 40'})
+    repo.commit('Two hunks in one file')
+
+    repo.insert('app.py', 20, HEADER_LIKE)
+    repo.commit('Add lines that look like diff headers')
+
+    repo.delete('app.py', 22, 23)
+    repo.replace('app.py', {21: '@@ -5 +5 @@ not a hunk'})
+    repo.commit('Remove some of them')
+
+    repo.write('notes.txt', numbered(4, 'note'))
+    repo.commit('Fill an empty file')
+
+    repo.rename('lib/util.py', 'lib/helpers.py')
+    repo.replace('lib/helpers.py', {15: 'changed while renaming'})
+    repo.commit('Rename with an edit')
+
+    repo.rename('name with spaces.txt', 'renamed with spaces.txt')
+    repo.commit('Pure rename')
+
+    repo.write('notes.txt', [])
+    repo.replace('app.py', {12: 'changed 12'})
+    repo.commit('Empty a file')
+
+    repo.git('checkout', '-q', '-b', 'topic')
+    repo.replace('app.py', {50: 'changed on a branch'})
+    repo.commit('Branch commit')
+    repo.git('checkout', '-q', BRANCH)
+    repo.replace('app.py', {55: 'changed on main'})
+    repo.commit('Main commit')
+    repo.merge('topic')
+
+    repo.replace('lib/helpers.py', {16: 'changed after the rename'})
+    repo.replace('app.py', {11: 'changed 11', 51: 'changed 51'})
+    repo.commit('Target')
+    return repo
+
+
+def gitpython_history(repo):
+    analyzer = GitAnalyzer(repo.path, backend=BACKEND_GITPYTHON)
+    commits = analyzer.get_commits_in_range(BRANCH, *repo.window())
+    return commits, {commit['full_hash']: dict(analyzer.get_commit_file_changes(commit['full_hash']))
+                     for commit in commits}
+
+
+def git_log_history(repo):
+    analyzer = GitAnalyzer(repo.path, backend=BACKEND_GIT_LOG)
+    commits, changes = analyzer.get_commits_with_changes(BRANCH, *repo.window())
+    return commits, {commit_hash: dict(file_changes) for commit_hash, file_changes in changes.items()}
+
+
+def test_backends_list_the_same_commits_and_changes(repo):
+    gitpython_commits, gitpython_changes = gitpython_history(repo)
+    git_log_commits, git_log_changes = git_log_history(repo)
+
+    assert sorted(commit['full_hash'] for commit in gitpython_commits) == sorted(repo.commits)
+    assert git_log_commits == gitpython_commits
+    for commit_hash in repo.commits:
+        assert git_log_changes[commit_hash] == gitpython_changes[commit_hash], commit_hash
+
+
+def test_header_like_body_lines_are_content(repo):
+    _, changes = git_log_history(repo)
+    _, gitpython_changes = gitpython_history(repo)
+
+    # One inserted block after line 20: @@ -18,6 +18,11 @@, and nothing for the fake headers
+    added = repo.commits[2]
+    assert changes[added] == gitpython_changes[added] == {'app.py': [(18, 23), (18, 28)]}
+    assert 'fake.py' not in changes[added] and 'comment.sql' not in changes[added]
+
+
+def test_renames_record_both_paths(repo):
+    _, changes = git_log_history(repo)
+
+    assert set(changes[repo.commits[5]]) == {'lib/util.py', 'lib/helpers.py'}
+    assert changes[repo.commits[6]] == {'name with spaces.txt': [], 'renamed with spaces.txt': []}
+
+
+def test_zero_length_hunks_of_empty_files(repo):
+    _, changes = git_log_history(repo)
+
+    assert changes[repo.commits[4]] == {'notes.txt': [(0, -1), (1, 4)]}
+    assert changes[repo.commits[7]]['notes.txt'] == [(1, 4), (0, -1)]
+
+
+@pytest.mark.parametrize('options', [{}, {'transitive': True}, {'track_lines': True}])
+def test_backends_find_the_same_dependencies(repo, options):
+    target = repo.commits[-1]
+
+    gitpython = repo.analyze(target, BACKEND_GITPYTHON, **options)
+    git_log = repo.analyze(target, BACKEND_GIT_LOG, **options)
+
+    assert gitpython.dependencies
+    assert git_log.dependencies == gitpython.dependencies
+    assert git_log.graph == gitpython.graph
+
+
+def test_parser_reads_a_stream_incrementally():
+    header = b'\x00' + b'\x1f'.join([b'a' * 40, b'', b'1735722000', b'Test', b'Message\n']) + b'\x00\n'
+    body = (b'diff --git a/x.py b/x.py\n--- a/x.py\n+++ b/x.py\n'
+            b'@@ -1,2 +1,2 @@\n'
+            b'--- not a header\n'
+            b'+diff --git a/y b/y\n'
+            b' context\n')
+
+    ((info, changes),) = list(parse_git_log_stream(io.BytesIO(header + body)))
+
+    assert info['full_hash'] == 'a' * 40 and info['message'] == 'Message'
+    assert changes == {'x.py': [(1, 2), (1, 2)]}
+
+
+def test_output_is_read_while_stderr_fills_up(tmp_path):
+    # More stderr than a pipe buffer holds, written before any stdout
+    script = "import sys; sys.stderr.write('warning: slow\\n' * 50000); sys.stderr.flush(); print('done')"
+    result = []
+
+    def read_output():
+        with _git_output([sys.executable, '-c', script], str(tmp_path)) as stdout:
+            result.append(stdout.read())
+
+    reader = threading.Thread(target=read_output, daemon=True)
+    reader.start()
+    reader.join(timeout=30)
+
+    assert not reader.is_alive()
+    assert result == [b'done\n']
+
+
+def test_failures_report_git_stderr(repo):
+    since, until = datetime(2020, 1, 1), datetime(2030, 1, 1)
+
+    for stream in (iter_git_log, iter_name_status):
+        with pytest.raises(Exception, match=r'git log failed: .*no-such-branch'):
+            list(stream(repo.path, 'no-such-branch', since, until))
@@ -0,0 +1,130 @@
+"""
+Tests for the persistent job queue: jobs move from queued through running to
+succeeded or failed with their progress, partial results and result stored in
+the jobs table, and jobs orphaned by a dead process are failed on recovery.
+"""
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import job_queue
+from job_queue import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JobQueue
+
+
+@pytest.fixture
+def queue(web):
+    return JobQueue(web.app, web.db, web.Job, max_workers=2)
+
+
+@pytest.fixture
+def feature(web):
+    feature = web.Feature(name='Holiday booking')
+    web.db.session.add(feature)
+    web.db.session.commit()
+    return feature
+
+
+def load_job(web, job_id):
+    # End the transaction so commits made by the job thread are visible
+    web.db.session.rollback()
+    return web.db.session.get(web.Job, job_id)
+
+
+def wait_for_job(web, job_id, statuses=(JOB_SUCCEEDED, JOB_FAILED), timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = load_job(web, job_id)
+        if job.status in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} is still {job.status}')
+
+
+def test_job_runs_through_its_states(web, queue, feature):
+    started, release = threading.Event(), threading.Event()
+
+    def work(progress, count):
+        progress(40, 'Halfway', {'scanned': count // 2})
+        started.set()
+        release.wait(10)
+        return {'scanned': count}
+
+    job_id = queue.submit(feature.id, 'Dependency Analyzer', 'analyze', work, 10)
+    assert load_job(web, job_id).status in (JOB_QUEUED, JOB_RUNNING)
+
+    assert started.wait(10)
+    running = wait_for_job(web, job_id, statuses=(JOB_RUNNING,))
+    assert (running.progress, running.message) == (40, 'Halfway')
+    assert running.to_dict()['details'] == {'scanned': 5}
+    assert queue.active_job(feature.id, 'Dependency Analyzer').id == job_id
+    assert queue.has_active('Dependency Analyzer')
+
+    release.set()
+    job = wait_for_job(web, job_id).to_dict()
+
+    assert job['status'] == JOB_SUCCEEDED and job['done']
+    assert (job['progress'], job['message'], job['result']) == (100, 'Completed', {'scanned': 10})
+    assert job['started_at'] and job['finished_at']
+    assert queue.active_job(feature.id, 'Dependency Analyzer') is None
+    assert queue.latest_job(feature.id, 'Dependency Analyzer').id == job_id
+
+
+def test_failed_job_records_the_error(web, queue, feature):
+    def work(progress):
+        progress(10, 'Starting')
+        raise ValueError('repository not found')
+
+    job_id = queue.submit(feature.id, 'Patch Generation', 'generate', work)
+    job = wait_for_job(web, job_id)
+
+    assert job.status == JOB_FAILED
+    assert job.error == 'repository not found'
+    assert job.finished_at is not None
+
+
+def test_throttled_progress_keeps_the_last_snapshot(web, queue, feature, monkeypatch):
+    monkeypatch.setattr(job_queue, 'PROGRESS_INTERVAL', 60)
+
+    def work(progress):
+        progress(10, 'First', {'step': 1})
+        progress(20, 'Second', {'step': 2})
+        return 'done'
+
+    job = wait_for_job(web, queue.submit(feature.id, 'AI Analysis', 'analyze', work)).to_dict()
+
+    assert job['details'] == {'step': 2}
+    assert job['result'] == 'done'
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_recovery_fails_only_jobs_of_dead_processes(web, queue, feature):
+    host = socket.gethostname()
+    workers = {
+        'dead': f'{host}:{dead_pid()}:feedbeef',
+        'alive': JobQueue.worker_id(),
+        'restarted': f'{host}:{queue.worker_id().split(":")[1]}:0ldt0ken',
+        'elsewhere': f'another-host:{dead_pid()}:feedbeef',
+    }
+    jobs = {}
+    for name, worker in workers.items():
+        job = web.Job(feature_id=feature.id, stage_name='Merging', action=name, status=JOB_RUNNING, worker=worker)
+        web.db.session.add(job)
+        jobs[name] = job
+    web.db.session.add(web.Job(feature_id=feature.id, stage_name='Merging', action='finished',
+                               status=JOB_SUCCEEDED, worker=workers['dead']))
+    web.db.session.commit()
+
+    assert queue.recover_interrupted() == 2
+
+    statuses = {name: load_job(web, job.id).status for name, job in jobs.items()}
+    assert statuses == {'dead': JOB_FAILED, 'alive': JOB_RUNNING, 'restarted': JOB_FAILED, 'elsewhere': JOB_RUNNING}
+    assert load_job(web, jobs['dead'].id).error.startswith('Interrupted')
@@ -0,0 +1,122 @@
+"""
+Tests for LineRangeIndex and the overlap spans the analyzer reports: index
+queries must agree with a brute-force check, zero-length hunks count as
+insertion points between two lines, and a dependency's overlap_lines are the
+exact lines it shares with the target.
+"""
+import random
+
+import numpy as np
+import pytest
+
+from commit_changes import CommitChanges
+from git_dependency_analyzer import GitAnalyzer
+from git_repo import GitRepo, numbered
+from line_range_index import LineRangeIndex, merge_spans
+
+
+def brute_force_overlaps(ranges, start, end):
+    for lo, hi in ranges:
+        if lo > hi:
+            # Insertion point between lines lo - 1 and lo
+            if start <= end and start < lo <= end:
+                return True
+        elif start <= hi and lo <= end:
+            return True
+    return False
+
+
+def test_overlapping_ranges_are_merged():
+    index = LineRangeIndex([(10, 20), (5, 12), (30, 30), (21, 25)])
+
+    assert index.starts == [5, 21, 30]
+    assert index.ends == [20, 25, 30]
+    assert index.overlaps(18, 22) == [(18, 20), (21, 22)]
+    assert index.overlaps(26, 29) == []
+
+
+def test_zero_length_hunk_is_an_insertion_point():
+    # @@ -10,0 +11,2 @@ stores the old side as (10, 9): lines were added after line 9
+    index = LineRangeIndex([(10, 9)])
+
+    assert len(index) == 1 and index.starts == []
+    assert index.overlaps(9, 10) == [(9, 10)]
+    assert index.has_overlap(9, 10)
+    assert not index.has_overlap(10, 12)
+    assert not index.has_overlap(1, 9)
+    # A zero-length query never overlaps anything
+    assert not index.has_overlap(10, 9)
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_queries_agree_with_brute_force(seed):
+    rng = random.Random(seed)
+    ranges = []
+    for _ in range(40):
+        start = rng.randint(1, 300)
+        ranges.append((start, start + rng.randint(-1, 8)))
+    index = LineRangeIndex(ranges)
+    queries = []
+    for _ in range(300):
+        start = rng.randint(1, 310)
+        queries.append((start, start + rng.randint(-1, 6)))
+
+    expected = [brute_force_overlaps(ranges, start, end) for start, end in queries]
+
+    assert [index.has_overlap(start, end) for start, end in queries] == expected
+    assert [bool(index.overlaps(start, end)) for start, end in queries] == expected
+    starts, ends = (np.array(values, dtype=np.int32) for values in zip(*queries))
+    assert index.overlap_mask(starts, ends).tolist() == expected
+
+
+def test_vectorized_overlap_spans_match_the_plain_loop():
+    rng = random.Random(7)
+    index = LineRangeIndex([(rng.randint(1, 500), rng.randint(1, 500)) for _ in range(30)])
+    ranges = sorted((start, start + rng.randint(0, 5)) for start in rng.sample(range(1, 500), 100))
+    changes = CommitChanges({'app.py': ranges})
+
+    spans = changes.overlap_spans('app.py', index)
+
+    assert sorted(spans) == sorted(span for start, end in ranges for span in index.overlaps(start, end))
+
+
+def test_merge_spans_joins_adjacent_spans():
+    assert merge_spans([(7, 9), (1, 3), (4, 5), (8, 12)]) == [(1, 5), (7, 12)]
+
+
+def test_dependency_overlap_lines_in_a_repository(tmp_path):
+    repo = GitRepo(tmp_path)
+    repo.write('app.py', numbered(40))
+    repo.write('other.py', numbered(10))
+    repo.commit('Initial version')
+    repo.replace('app.py', {12: 'changed 12'})
+    touching = repo.commit('Change line 12')
+    repo.replace('app.py', {35: 'changed 35'})
+    repo.commit('Change line 35')
+    repo.replace('other.py', {12 - 10: 'changed'})
+    repo.commit('Change another file')
+    repo.replace('app.py', {12: 'changed again', 13: 'changed 13'})
+    target = repo.commit('Change lines 12 and 13')
+
+    analysis = repo.analyze(target)
+
+    assert [dependency['full_hash'] for dependency in analysis.dependencies] == [touching]
+    # Hunks include three lines of context, so the shared lines are the overlap of 9-15 and 9-16
+    assert analysis.dependencies[0]['overlap_lines'] == {'app.py': [(9, 15)]}
+
+
+def test_zero_length_hunks_from_an_empty_file(tmp_path):
+    repo = GitRepo(tmp_path)
+    repo.write('notes.txt', [])
+    repo.commit('Add an empty file')
+    repo.write('notes.txt', numbered(5))
+    filling = repo.commit('Fill the empty file')
+    repo.replace('notes.txt', {3: 'changed'})
+    target = repo.commit('Change line 3')
+
+    analysis = repo.analyze(target)
+
+    # With no old lines the hunk is @@ -0,0 +1,5 @@, whose old side is stored as (0, -1)
+    assert dict(GitAnalyzer(repo.path).get_commit_file_changes(filling)) == {'notes.txt': [(0, -1), (1, 5)]}
+    assert [dependency['full_hash'] for dependency in analysis.dependencies] == [filling]
+    assert analysis.dependencies[0]['overlap_lines'] == {'notes.txt': [(1, 5)]}
@@ -0,0 +1,79 @@
+"""
+Tests for rename-aware line tracking: earlier changes are carried forward
+through every later commit, so they can be compared with the lines the target
+changes even after insertions, deletions and renames moved them.
+"""
+from line_tracking import HunkMap, LineShiftTracker
+from git_repo import GitRepo, numbered
+
+
+def test_hunk_map_shifts_lines_after_a_hunk():
+    # @@ -10,3 +10,5 @@: three lines replaced by five
+    hunk_map = HunkMap([(10, 12), (10, 14)])
+
+    assert hunk_map.map_line(5, upper=False) == 5
+    assert hunk_map.map_line(20, upper=False) == 22
+    assert hunk_map.map_range(11, 11) == (10, 14)
+    assert hunk_map.new_ranges() == [(10, 14)]
+
+
+def test_hunk_map_insertion_and_deletion():
+    # @@ -10,0 +11,3 @@ inserts after line 10; @@ -20,2 +22,0 @@ deletes lines 20 and 21
+    hunk_map = HunkMap([(10, 9), (11, 13), (20, 21), (22, 21)])
+
+    assert hunk_map.map_range(10, 10) == (10, 10)
+    assert hunk_map.map_range(11, 11) == (14, 14)
+    assert hunk_map.map_range(20, 21) is None
+    assert hunk_map.map_range(25, 26) == (26, 27)
+    assert hunk_map.new_ranges() == [(11, 13)]
+
+
+def test_tracker_follows_shifts_and_renames():
+    tracker = LineShiftTracker()
+
+    tracker.apply_commit('first', {'a.py': [(10, 10), (10, 10)]})
+    # @@ -2,0 +3,2 @@ inserts two lines after line 2
+    tracker.apply_commit('insert', {'a.py': [(2, 1), (3, 4)]})
+    tracker.apply_commit('rename', {'a.py': [], 'b.py': []}, renames=[('a.py', 'b.py')])
+    # @@ -1 +0,0 @@ deletes the first line
+    tracker.apply_commit('delete', {'b.py': [(1, 1), (0, -1)]})
+
+    changes = tracker.changes_by_commit()
+    assert changes['first'] == {'b.py': [(11, 11)]}
+    assert changes['insert'] == {'b.py': [(2, 3)]}
+    assert 'rename' not in changes
+
+
+def test_tracker_drops_lines_that_were_removed():
+    tracker = LineShiftTracker()
+
+    tracker.apply_commit('first', {'a.py': [(5, 6), (5, 6)]})
+    tracker.apply_commit('delete', {'a.py': [(4, 7), (3, 2)]})
+
+    assert 'first' not in tracker.changes_by_commit()
+
+
+def test_shifted_and_renamed_change_is_found(tmp_path):
+    repo = GitRepo(tmp_path)
+    repo.write('app.py', numbered(100))
+    repo.commit('Initial version')
+    repo.replace('app.py', {50: 'changed 50'})
+    original = repo.commit('Change line 50')
+    repo.insert('app.py', 5, numbered(10, 'inserted'))
+    repo.commit('Insert ten lines near the top')
+    repo.rename('app.py', 'core.py')
+    repo.delete('core.py', 20, 22)
+    repo.commit('Rename and delete three lines')
+    repo.replace('core.py', {80: 'changed far away'})
+    repo.commit('Change an unrelated line')
+    # The line changed in the second commit is now line 57 of core.py
+    assert repo.read('core.py')[56] == 'changed 50'
+    repo.replace('core.py', {57: 'changed again'})
+    target = repo.commit('Change the same line again')
+
+    raw = repo.analyze(target)
+    tracked = repo.analyze(target, track_lines=True)
+
+    assert original not in [dependency['full_hash'] for dependency in raw.dependencies]
+    assert [dependency['full_hash'] for dependency in tracked.dependencies] == [original]
+    assert tracked.dependencies[0]['overlap_lines'] == {'core.py': [(54, 60)]}
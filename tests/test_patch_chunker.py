@@ -0,0 +1,102 @@
+"""
+Tests for splitting patches into token-budgeted chunks: no chunk exceeds the
+budget, no diff line is lost, and pieces of a split file repeat the file and
+commit headers so each chunk can be analyzed on its own.
+"""
+from gemini_helper import plan_analysis, split_patch
+from patch_chunker import chunk_patch, estimate_tokens
+
+SHA = 'c' * 40
+
+
+def file_diff(path, hunks=1, lines=5, width=40):
+    text = f'diff --git a/{path} b/{path}\nindex 1111111..2222222 100644\n--- a/{path}\n+++ b/{path}\n'
+    for hunk in range(hunks):
+        start = hunk * 100 + 1
+        text += f'@@ -{start},{lines} +{start},{lines} @@\n'
+        text += ''.join(f'+{path} hunk {hunk} line {n} '.ljust(width, 'x') + '\n' for n in range(lines))
+    return text
+
+
+def make_patch(*diffs):
+    return f'commit {SHA}\nAuthor: Dev <dev@example.com>\n\n    Holiday rules\n\n' + ''.join(diffs)
+
+
+def diff_lines(text):
+    return [line for line in text.splitlines() if line.startswith(('+', '@@')) and not line.startswith('+++')]
+
+
+def test_small_patch_is_one_chunk():
+    patch = make_patch(file_diff('app.py'), file_diff('rules.py'))
+
+    chunks = chunk_patch(patch, max_tokens=10_000)
+
+    assert [(chunk.text, chunk.files) for chunk in chunks] == [(patch, ['app.py', 'rules.py'])]
+    assert split_patch(patch, chunk_tokens=10_000) == []
+
+
+def test_files_are_packed_within_the_budget():
+    patch = make_patch(*(file_diff(f'module_{n}.py', lines=8) for n in range(12)))
+    budget = 300
+
+    chunks = chunk_patch(patch, max_tokens=budget)
+
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= budget for chunk in chunks)
+    assert [chunk.index for chunk in chunks] == list(range(len(chunks)))
+    # Whole files stay together and appear in order, each in exactly one chunk
+    assert [path for chunk in chunks for path in chunk.files] == [f'module_{n}.py' for n in range(12)]
+    assert [line for chunk in chunks for line in diff_lines(chunk.text)] == diff_lines(patch)
+    # Every chunk says which commit its files belong to
+    assert all(chunk.text.startswith(f'commit {SHA}') for chunk in chunks)
+
+
+def test_large_file_is_split_between_hunks_with_headers_repeated():
+    patch = make_patch(file_diff('big.py', hunks=6, lines=10))
+    budget = 250
+
+    chunks = chunk_patch(patch, max_tokens=budget)
+
+    assert len(chunks) > 1
+    assert all(chunk.tokens <= budget and chunk.files == ['big.py'] for chunk in chunks)
+    for chunk in chunks[1:]:
+        assert chunk.text.startswith(f'commit {SHA} (continued)\ndiff --git a/big.py b/big.py\n')
+        # Pieces break at hunk boundaries
+        assert chunk.text.split('+++ b/big.py\n', 1)[1].startswith('@@ ')
+    assert [line for chunk in chunks for line in diff_lines(chunk.text)] == diff_lines(patch)
+
+
+def test_oversized_hunks_and_lines_are_cut():
+    minified = '+' + 'x' * 3000 + '\n'
+    patch = make_patch(file_diff('small.py'),
+                       'diff --git a/app.min.js b/app.min.js\n--- a/app.min.js\n+++ b/app.min.js\n'
+                       '@@ -1 +1 @@\n' + minified)
+    budget = 200
+
+    chunks = chunk_patch(patch, max_tokens=budget)
+
+    assert all(chunk.tokens <= budget for chunk in chunks)
+    minified_chunks = [chunk for chunk in chunks if 'app.min.js' in chunk.files]
+    assert len(minified_chunks) > 1
+    # Each piece of the hunk repeats its header; the line's content survives in order
+    assert all('@@ -1 +1 @@\n' in chunk.text for chunk in minified_chunks)
+    assert ''.join(chunk.text.split('@@ -1 +1 @@\n', 1)[1] for chunk in minified_chunks) == minified
+
+
+def test_plan_analysis_estimates_requests_for_each_mode():
+    brd = 'The booking system shall reject overlapping holidays.\n' * 20
+    small = make_patch(file_diff('app.py'))
+    large = make_patch(*(file_diff(f'module_{n}.py', lines=8) for n in range(12)))
+
+    chunks, estimate = plan_analysis(brd, small, chunk_tokens=10_000)
+    assert chunks == []
+    assert (estimate['mode'], estimate['requests'], estimate['chunks']) == ('single', 1, 0)
+    assert estimate['patch_tokens'] == estimate_tokens(small)
+    assert estimate['input_tokens'] > estimate['brd_tokens'] + estimate['patch_tokens']
+
+    chunks, estimate = plan_analysis(brd, large, chunk_tokens=300)
+    assert len(chunks) > 1
+    assert estimate['mode'] == 'map_reduce'
+    assert estimate['requests'] == len(chunks) + 1
+    assert estimate['chunk_tokens'] == [chunk.tokens for chunk in chunks]
+    assert max(estimate['chunk_tokens']) <= estimate['chunk_budget'] == 300
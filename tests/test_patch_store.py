@@ -0,0 +1,108 @@
+"""
+Tests for the content-addressed patch artifact store: identical patches are
+stored once, revisions are looked up by full or abbreviated hash, and garbage
+collection only removes unreferenced artifacts older than the grace period.
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from patch_store import PatchArtifactStore, open_artifact
+
+REPO_URL = 'https://github.com/example/holidays.git'
+SHA_A = 'a' * 40
+SHA_B = 'b' * 40
+
+
+@pytest.fixture
+def feature(web):
+    feature = web.Feature(name='Holiday booking')
+    web.db.session.add(feature)
+    web.db.session.commit()
+    return feature
+
+
+def make_store(web, tmp_path, **options):
+    return PatchArtifactStore(web.db, web.PatchArtifact, web.PatchArtifactSource, web.FeaturePatchArtifact,
+                              str(tmp_path / 'artifacts'), **options)
+
+
+def write_patch(tmp_path, name, sha, body='+added line\n'):
+    path = tmp_path / name
+    path.write_text(f'commit {sha}\nAuthor: Dev <dev@example.com>\n\n{body}')
+    return str(path)
+
+
+def stored_files(store):
+    return sorted(name for _, _, names in os.walk(store.root_dir) for name in names)
+
+
+def test_identical_patches_are_stored_once(web, tmp_path):
+    store = make_store(web, tmp_path)
+    patch = write_patch(tmp_path, 'first.patch', SHA_A)
+    copy = tmp_path / 'copy.patch'
+    copy.write_bytes(open(patch, 'rb').read())
+
+    first = store.add('git', REPO_URL, 'main', patch)
+    second = store.add('git', REPO_URL.replace('.git', ''), SHA_A[:7], str(copy))
+    web.db.session.commit()
+
+    assert first.content_hash == second.content_hash
+    assert stored_files(store) == [f'{first.content_hash}.patch']
+    assert web.PatchArtifact.query.count() == 1
+    # The branch name is not recorded; the hash from the patch header and the abbreviation are
+    assert sorted(source.revision for source in web.PatchArtifactSource.query) == [SHA_A[:7], SHA_A]
+
+
+def test_lookup_by_full_and_abbreviated_hash(web, tmp_path):
+    store = make_store(web, tmp_path)
+    artifact = store.add('git', REPO_URL, 'main', write_patch(tmp_path, 'a.patch', SHA_A))
+    web.db.session.commit()
+
+    assert store.lookup('git', REPO_URL, SHA_A) is artifact
+    assert store.lookup('git', 'https://GitHub.com/example/holidays', SHA_A[:10].upper()) is artifact
+    assert store.lookup('git', REPO_URL, 'main') is None
+    assert store.lookup('git', REPO_URL, SHA_B) is None
+
+    os.remove(artifact.storage_path)
+    assert store.lookup('git', REPO_URL, SHA_A) is None
+
+
+def test_compressed_artifacts_read_back(web, tmp_path):
+    store = make_store(web, tmp_path, compression='gzip')
+    patch = write_patch(tmp_path, 'a.patch', SHA_A, body='+café\n' * 200)
+
+    artifact = store.add('git', REPO_URL, SHA_A, patch)
+    web.db.session.commit()
+
+    assert artifact.storage_path.endswith('.patch.gz')
+    assert artifact.size == os.path.getsize(patch)
+    assert artifact.stored_size < artifact.size
+    with open_artifact(artifact.storage_path, text=True) as stream:
+        assert stream.read() == open(patch, encoding='utf-8').read()
+
+
+def test_garbage_collection_keeps_referenced_and_recent_artifacts(web, tmp_path, feature):
+    store = make_store(web, tmp_path, gc_grace_seconds=60)
+    kept = store.add('git', REPO_URL, SHA_A, write_patch(tmp_path, 'a.patch', SHA_A))
+    orphan = store.add('git', REPO_URL, SHA_B, write_patch(tmp_path, 'b.patch', SHA_B, body='+other\n'))
+    store.add_reference(feature.id, [kept.content_hash, kept.content_hash])
+    web.db.session.commit()
+
+    # Both were stored just now: the orphan may be about to be referenced by a running job
+    assert store.collect_garbage() == []
+    assert len(stored_files(store)) == 2
+
+    orphan.created_at = datetime.utcnow() - timedelta(seconds=120)
+    kept.created_at = datetime.utcnow() - timedelta(seconds=120)
+    web.db.session.commit()
+    orphan_hash, orphan_path = orphan.content_hash, orphan.storage_path
+
+    assert store.collect_garbage() == [orphan_hash]
+    assert not os.path.exists(orphan_path)
+    assert not os.path.exists(os.path.dirname(orphan_path))
+    assert stored_files(store) == [f'{kept.content_hash}.patch']
+    assert store.lookup('git', REPO_URL, SHA_B) is None
+    assert store.lookup('git', REPO_URL, SHA_A) is kept
+    assert store.reference_counts() == {kept.content_hash: 1}
@@ -0,0 +1,62 @@
+"""
+Tests for page-by-page PDF extraction: the process pool must return the
+same text as reading the pages in this process, and a character budget must
+stop parsing early.
+"""
+import pytest
+
+import pdf_extractor
+from pdf_extractor import extract_pdf_text
+
+
+def write_pdf(path, pages, lines=5):
+    """Write a minimal PDF with one Helvetica text line per row on every page."""
+    objects = [b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    pages_id = 2 * pages + 2
+    for page in range(pages):
+        text = b'BT /F1 10 Tf 40 800 Td 12 TL ' + b''.join(
+            b'(Page %d line %d) Tj T* ' % (page + 1, line) for line in range(lines)) + b'ET'
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(text), text))
+        objects.append(b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] '
+                       b'/Resources << /Font << /F1 1 0 R >> >> /Contents %d 0 R >>' % (pages_id, len(objects)))
+    kids = b' '.join(b'%d 0 R' % (3 + 2 * page) for page in range(pages))
+    objects.append(b'<< /Type /Pages /Kids [%s] /Count %d >>' % (kids, pages))
+    objects.append(b'<< /Type /Catalog /Pages %d 0 R >>' % pages_id)
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, len(objects), xref)
+    path.write_bytes(bytes(out))
+    return str(path)
+
+
+@pytest.fixture
+def pdf_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(pdf_extractor, 'PDF_PARALLEL_MIN_PAGES', 4)
+    return write_pdf(tmp_path / 'document.pdf', pages=40)
+
+
+def test_worker_pool_matches_serial_extraction(pdf_path):
+    serial = extract_pdf_text(pdf_path, workers=1)
+    parallel = extract_pdf_text(pdf_path, workers=2)
+
+    assert serial[1:] == (40, 40, False)
+    assert 'Page 1 line 0' in serial[0] and 'Page 40 line 4' in serial[0]
+    assert parallel == serial
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_character_budget_stops_early(pdf_path, workers):
+    full_text = extract_pdf_text(pdf_path, workers=1)[0]
+
+    text, pages_read, total, truncated = extract_pdf_text(pdf_path, max_chars=200, workers=workers)
+
+    assert truncated and total == 40
+    assert pages_read < total
+    assert text == full_text[:200]
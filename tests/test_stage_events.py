@@ -0,0 +1,104 @@
+"""
+Tests for the stage progress event stream: it sends a 'progress' event each
+time the latest job changes, a final 'done' event, 'idle' when there is no
+job, and ends after EVENT_STREAM_MAX_SECONDS so the browser reconnects.
+"""
+import json
+import time
+from datetime import datetime
+
+import pytest
+from sqlalchemy import update
+
+from job_queue import JOB_RUNNING, JOB_SUCCEEDED
+
+STAGE_INDEX = 0
+
+
+@pytest.fixture
+def client(web, monkeypatch):
+    monkeypatch.setattr(web, 'EVENT_POLL_SECONDS', 0.02)
+    return web.app.test_client()
+
+
+@pytest.fixture
+def feature(web):
+    feature = web.Feature(name='Holiday booking')
+    web.db.session.add(feature)
+    web.db.session.commit()
+    return feature
+
+
+def add_job(web, feature, **fields):
+    fields.setdefault('status', JOB_RUNNING)
+    job = web.Job(feature_id=feature.id, stage_name=web.WORKFLOW_STAGES[STAGE_INDEX], action='analyze',
+                  updated_at=datetime.utcnow(), **fields)
+    web.db.session.add(job)
+    web.db.session.commit()
+    return job
+
+
+def update_job(web, job, **fields):
+    """Commit a change on its own connection, as the worker running the job would."""
+    with web.db.engine.begin() as connection:
+        connection.execute(update(web.Job).where(web.Job.id == job.id)
+                           .values(updated_at=datetime.utcnow(), **fields))
+
+
+def iter_events(response):
+    """Yield (event, data) for each Server-Sent Event of a streamed response."""
+    buffer = ''
+    for chunk in response.response:
+        buffer += chunk.decode('utf-8') if isinstance(chunk, bytes) else chunk
+        while '\n\n' in buffer:
+            block, buffer = buffer.split('\n\n', 1)
+            fields = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+            if 'event' in fields:
+                yield fields['event'], json.loads(fields['data'])
+
+
+def open_stream(client, feature):
+    response = client.get(f'/feature/{feature.id}/stage/{STAGE_INDEX}/events', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    return response
+
+
+def test_idle_without_a_job(client, feature):
+    response = open_stream(client, feature)
+
+    assert list(iter_events(response)) == [('idle', {})]
+
+
+def test_progress_events_until_done(web, client, feature):
+    job = add_job(web, feature, progress=30, message='Listing commits')
+    response = open_stream(client, feature)
+    events = iter_events(response)
+
+    event, data = next(events)
+    assert (event, data['progress'], data['message']) == ('progress', 30, 'Listing commits')
+
+    update_job(web, job, progress=60, message='Scanning')
+    event, data = next(events)
+    assert (event, data['progress']) == ('progress', 60)
+
+    update_job(web, job, status=JOB_SUCCEEDED, progress=100, result=json.dumps({'dependencies': 2}))
+    event, data = next(events)
+    assert (event, data['done'], data['result']) == ('done', True, {'dependencies': 2})
+    assert list(events) == []
+    response.close()
+
+
+def test_stream_ends_after_its_time_limit(web, client, feature, monkeypatch):
+    monkeypatch.setattr(web, 'EVENT_STREAM_MAX_SECONDS', 0.3)
+    add_job(web, feature, progress=10)
+
+    started = time.monotonic()
+    events = list(iter_events(open_stream(client, feature)))
+
+    assert [event for event, _ in events] == ['progress']
+    assert time.monotonic() - started < 2
+
+
+def test_unknown_stage_is_not_found(client, feature):
+    assert client.get(f'/feature/{feature.id}/stage/99/events').status_code == 404
+    assert client.get('/feature/9999/stage/0/events').status_code == 404
@@ -1,60 +1,214 @@
 import subprocess
 import os
+import re
 import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, List, Optional, Sequence, Tuple
+from git_mirror_pool import GitProgressCallback, get_mirror_pool
 
 logger = logging.getLogger(__name__)
 
-def generate_git_patch(repo_url: str, commit_hash: str, output_path: str) -> None:
+# Start of each commit in multi-commit `git show` output; message lines are always indented
+GIT_SHOW_COMMIT_HEADER = re.compile(rb'^commit ([0-9a-f]{40,64})\b')
+
+# svn has no multi-revision diff, so batches run this many `svn diff` processes at once
+SVN_DIFF_CONCURRENCY = 4
+
+# Largest patch written for a single commit; bigger ones fail instead of filling the disk
+PATCH_MAX_BYTES = int(os.environ.get('PATCH_MAX_BYTES', str(256 * 1024 * 1024)))
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+class PatchTooLargeError(Exception):
+    """Raised when a commit's patch exceeds the configured size cap."""
+
+def _read_stderr(stderr_file: BinaryIO) -> str:
+    stderr_file.seek(0)
+    return stderr_file.read().decode('utf-8', errors='replace').strip()
+
+def _remove_files(paths: Sequence[str]) -> None:
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def generate_git_patch(repo_url: str, commit_hash: str, output_path: str,
+                       progress: Optional[GitProgressCallback] = None,
+                       max_bytes: int = PATCH_MAX_BYTES) -> None:
+    """
+    Write the `git show` output of commit_hash in repo_url to output_path.
+    
+    The commit is read from a shared bare mirror of the repository (see
+    git_mirror_pool), which is cloned on first use and fetched only when
+    the commit is missing. If given, progress(phase, percent) is called for
+    each clone or fetch phase reported by git and for the final steps.
+    """
+    generate_git_patches(repo_url, [(commit_hash, output_path)], progress, max_bytes)
+
+def _stream_git_show(process: subprocess.Popen, outputs: Dict[str, List[str]], max_bytes: int) -> List[str]:
+    """
+    Copy multi-commit `git show` output from process.stdout into each commit's
+    files line by line, as raw bytes. Returns the SHAs that produced output.
+    """
+    written = []
+    files: List[BinaryIO] = []
+    sha = None
+    size = 0
+    # git separates consecutive commits with one blank line, which belongs to neither
+    held_blank = b''
+    
     try:
-        temp_dir = f"/tmp/git_clone_{commit_hash}"
-        
-        if os.path.exists(temp_dir):
-            subprocess.run(['rm', '-rf', temp_dir], check=True)
+        for line in process.stdout:
+            match = GIT_SHOW_COMMIT_HEADER.match(line)
+            if match and match.group(1).decode('ascii') in outputs:
+                for f in files:
+                    f.close()
+                sha = match.group(1).decode('ascii')
+                files = [open(path, 'wb') for path in outputs[sha]]
+                written.append(sha)
+                size = 0
+                held_blank = b''
+            elif line == b'\n':
+                line, held_blank = held_blank, line
+            else:
+                line, held_blank = held_blank + line, b''
+            
+            if not files or not line:
+                continue
+            size += len(line)
+            if size > max_bytes:
+                raise PatchTooLargeError(f"Patch for commit {sha} exceeds the {max_bytes} byte limit")
+            for f in files:
+                f.write(line)
         
-        logger.info(f"Cloning repository: {repo_url}")
-        subprocess.run(['git', 'clone', repo_url, temp_dir], check=True, capture_output=True, text=True)
-        
-        logger.info(f"Generating patch for commit: {commit_hash}")
-        result = subprocess.run(
-            ['git', 'show', commit_hash],
-            cwd=temp_dir,
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result.stdout)
-        
-        subprocess.run(['rm', '-rf', temp_dir], check=True)
+        for f in files:
+            f.write(held_blank)
+    finally:
+        for f in files:
+            f.close()
+    
+    return written
+
+def generate_git_patches(repo_url: str, patches: Sequence[Tuple[str, str]],
+                         progress: Optional[GitProgressCallback] = None,
+                         max_bytes: int = PATCH_MAX_BYTES) -> None:
+    """
+    Write the `git show` output of several commits of repo_url, each to its own file.
+    
+    patches is a sequence of (commit_hash, output_path) pairs. The mirror is
+    checked out and, if needed, fetched once for the whole batch, and every
+    patch comes from a single `git show` invocation streamed straight to
+    disk. A patch larger than max_bytes fails the whole batch.
+    """
+    commit_hashes = [commit_hash for commit_hash, _ in patches]
+    output_paths = [output_path for _, output_path in patches]
+    try:
+        with get_mirror_pool().checkout(repo_url, commit_hashes, progress) as mirror_path:
+            if progress is not None:
+                progress('Generating patches' if len(patches) > 1 else 'Generating patch', None)
+            
+            shas = subprocess.run(
+                ['git', 'rev-parse'] + [f'{commit_hash}^{{commit}}' for commit_hash in commit_hashes],
+                cwd=mirror_path,
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout.split()
+            outputs: Dict[str, List[str]] = {}
+            for sha, output_path in zip(shas, output_paths):
+                outputs.setdefault(sha, []).append(output_path)
+            
+            logger.info(f"Generating patches for {len(outputs)} commit(s): {', '.join(commit_hashes)}")
+            cmd = ['git', 'show'] + list(outputs) + ['--']
+            with tempfile.TemporaryFile() as stderr_file:
+                process = subprocess.Popen(cmd, cwd=mirror_path, stdout=subprocess.PIPE, stderr=stderr_file,
+                                           bufsize=STREAM_CHUNK_SIZE)
+                try:
+                    written = _stream_git_show(process, outputs, max_bytes)
+                finally:
+                    process.stdout.close()
+                    if process.poll() is None:
+                        process.kill()
+                    returncode = process.wait()
+                
+                if returncode != 0:
+                    raise subprocess.CalledProcessError(returncode, cmd, stderr=_read_stderr(stderr_file))
         
-        logger.info(f"Patch saved to: {output_path}")
+        missing = [sha for sha in outputs if sha not in written]
+        if missing:
+            raise Exception(f"Failed to generate Git patch: no output for commit(s) {', '.join(missing)}")
         
+        for commit_hash, output_path in patches:
+            logger.info(f"Patch for {commit_hash} saved to: {output_path}")
+    
     except subprocess.CalledProcessError as e:
+        _remove_files(output_paths)
         logger.error(f"Git command failed: {e.stderr if e.stderr else str(e)}")
         raise Exception(f"Failed to generate Git patch: {e.stderr if e.stderr else str(e)}")
     except Exception as e:
+        _remove_files(output_paths)
         logger.error(f"Error generating Git patch: {str(e)}")
         raise
 
-def generate_svn_patch(repo_url: str, revision: str, output_path: str) -> None:
+def generate_svn_patch(repo_url: str, revision: str, output_path: str,
+                       max_bytes: int = PATCH_MAX_BYTES) -> None:
     try:
         logger.info(f"Generating SVN patch for revision: {revision}")
-        result = subprocess.run(
-            ['svn', 'diff', '-c', revision, repo_url],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(result.stdout)
+        cmd = ['svn', 'diff', '-c', revision, repo_url]
+        with tempfile.TemporaryFile() as stderr_file:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr_file)
+            try:
+                size = 0
+                with open(output_path, 'wb') as f:
+                    for chunk in iter(lambda: process.stdout.read(STREAM_CHUNK_SIZE), b''):
+                        size += len(chunk)
+                        if size > max_bytes:
+                            raise PatchTooLargeError(f"Patch for revision {revision} exceeds the {max_bytes} byte limit")
+                        f.write(chunk)
+            finally:
+                process.stdout.close()
+                if process.poll() is None:
+                    process.kill()
+                returncode = process.wait()
+            
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, cmd, stderr=_read_stderr(stderr_file))
         
         logger.info(f"SVN patch saved to: {output_path}")
-        
+    
     except subprocess.CalledProcessError as e:
+        _remove_files([output_path])
         logger.error(f"SVN command failed: {e.stderr if e.stderr else str(e)}")
         raise Exception(f"Failed to generate SVN patch: {e.stderr if e.stderr else str(e)}")
     except Exception as e:
+        _remove_files([output_path])
         logger.error(f"Error generating SVN patch: {str(e)}")
         raise
+
+def generate_svn_patches(repo_url: str, patches: Sequence[Tuple[str, str]],
+                         max_bytes: int = PATCH_MAX_BYTES) -> None:
+    """
+    Write the `svn diff -c` output of several revisions of repo_url, each to its own file.
+    
+    patches is a sequence of (revision, output_path) pairs. svn diff takes a
+    single change per invocation, so the diffs are requested concurrently
+    (up to SVN_DIFF_CONCURRENCY at a time) rather than one after another.
+    """
+    if len(patches) == 1:
+        generate_svn_patch(repo_url, *patches[0], max_bytes=max_bytes)
+        return
+    
+    with ThreadPoolExecutor(max_workers=min(SVN_DIFF_CONCURRENCY, len(patches))) as executor:
+        futures = [executor.submit(generate_svn_patch, repo_url, revision, output_path, max_bytes)
+                   for revision, output_path in patches]
+        errors: List[Exception] = []
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+    
+    if errors:
+        raise errors[0]